@@ -1,8 +1,26 @@
-from typing import List
+from typing import List, Iterator, Dict, Tuple
 
-from database_objects import Table, Database, FieldType, KeyType
+from database_objects import Table, Database, FieldType, KeyType, Key, DataException
+from definition_cache import DefinitionCache
+from definition_stream import DefinitionReader, DefinitionWriter
 from naming import Naming
-from serializer import serializer_instance
+from phases import phases
+
+
+class TableOrder(object):
+    """ Tables grouped into levels - a table only depends on tables in earlier levels, so the tables of one level
+    can be created or loaded in any order. Foreign keys that close a cycle are left out of the ordering and listed
+    in deferred_keys, they have to be added once all the tables exist """
+
+    def __init__(self):
+        self.levels: List[List[Table]] = []
+        self.cycles: List[List[Table]] = []
+        self.deferred_keys: List[Key] = []
+        # depth first - each table right after the tables it references, in definition order
+        self.tables: List[Table] = []
+
+    def get_tables(self) -> List[Table]:
+        return self.tables
 
 
 class Adaptor(object):
@@ -10,51 +28,209 @@ class Adaptor(object):
         self.connection = connection
         self.naming = naming
 
-    def import_schema(self, db_name: str) -> Database:
+    def get_database_name(self, db_name: str) -> str:
+        return db_name
+
+    def connect(self):
+        """ A DB-API connection to the database in the connection string """
         pass
 
+    def import_tables(self, db_name: str) -> Iterator[Table]:
+        pass
+
+    def import_schema(self, db_name: str) -> Database:
+        db_name = self.get_database_name(db_name)
+        database = Database(self.naming.string_to_name(db_name))
+        database.tables.extend(self.import_tables(db_name))
+        return database
+
+    def export_schema_definition(self, db_name: str, definition_file: str):
+        """ Writes each table to the definition as soon as it has been introspected """
+        db_name = self.get_database_name(db_name)
+        with DefinitionWriter(definition_file, self.naming.string_to_name(db_name)) as writer:
+            for table in self.import_tables(db_name):
+                writer.write_table(table)
+
     @staticmethod
     def generate_schema_definition(database: Database, definition_file: str):
-        with open(definition_file, 'w') as output_file:
-            output_file.write(serializer_instance.serialize(database, True))
-            output_file.flush()
+        with DefinitionWriter(definition_file, database.name) as writer:
+            for table in database.tables:
+                writer.write_table(table)
 
     @staticmethod
-    def import_definition(definition_file: str, naming: Naming) -> Database:
-        text = ""
-        with open(definition_file, 'r') as input_file:
-            lines = input_file.readlines()
-            for line in lines:
-                text = text + line
-
-        database = serializer_instance.de_serialize(text, naming)
-        Adaptor._process_foreign_keys(database)
+    def import_definition(definition_file: str, naming: Naming, use_cache: bool = False) -> Database:
+        cache = DefinitionCache(definition_file, naming) if use_cache else None
+        if cache is not None:
+            with phases.phase("definition_cache"):
+                database = cache.load()
+            if database is not None:
+                naming.add_names(DefinitionCache.get_names(database))
+                return database
+
+        with DefinitionReader(definition_file, naming) as reader:
+            tables = list(reader)
+            database = Database(reader.name)
+        database.tables = tables
+        with phases.phase("foreign_keys"):
+            Adaptor._process_foreign_keys(database)
+
+        if cache is not None:
+            with phases.phase("definition_cache"):
+                cache.save(database)
         return database
 
     @staticmethod
     def _process_foreign_keys(database: Database):
         for foreign_table in database.tables:
-            for foreign_key in [key for key in foreign_table.keys if key.key_type == KeyType.ForeignKey]:
+            for foreign_key in foreign_table.get_keys(KeyType.ForeignKey):
                 primary_table = database.get_table(foreign_key.primary_table)
                 primary_table.foreign_keys.append(foreign_key)
 
     @staticmethod
-    def _add_dependant_tables(database: Database, table: Table, table_list: List[Table]):
-        if table not in table_list:
-            for fk in [key for key in table.keys if key.key_type == KeyType.ForeignKey]:
+    def get_table_order(database: Database, key_types: Tuple[KeyType, ...] = (KeyType.ForeignKey,)) -> TableOrder:
+        """ Orders the tables level by level (Kahn), keeping definition order within a level - by their foreign keys,
+        or the keys of key_types. Self references don't affect the order, and when only cycles are left one key per
+        cycle is deferred """
+        tables = database.tables
+        position = {id(table): i for i, table in enumerate(tables)}
+
+        # dependencies[i] maps each table that table i references to the keys doing it
+        dependencies: List[Dict[int, List[Key]]] = [dict() for _ in tables]
+        dependants: List[List[int]] = [[] for _ in tables]
+        for i, table in enumerate(tables):
+            for fk in [key for key_type in key_types for key in table.get_keys(key_type)]:
                 primary_table = database.get_table(fk.primary_table)
-                Adaptor._add_dependant_tables(database, primary_table, table_list)
-            if table not in table_list:
-                table_list.append(table)
+                if primary_table is None:
+                    raise DataException(f"Key {fk.name.raw()} references unknown table {fk.primary_table}")
+                j = position[id(primary_table)]
+                if j == i:
+                    continue
+                if j not in dependencies[i]:
+                    dependencies[i][j] = []
+                    dependants[j].append(i)
+                dependencies[i][j].append(fk)
+
+        order = TableOrder()
+        remaining = [len(references) for references in dependencies]
+        placed = [False] * len(tables)
+        ready = [i for i in range(len(tables)) if remaining[i] == 0]
+        placed_count = 0
+        while placed_count < len(tables):
+            if len(ready) == 0:
+                ready = Adaptor._defer_cycles(tables, dependencies, dependants, remaining, placed, order)
+
+            order.levels.append([tables[i] for i in ready])
+            placed_count += len(ready)
+            next_ready: List[int] = []
+            for i in ready:
+                placed[i] = True
+                for dependant in dependants[i]:
+                    remaining[dependant] -= 1
+                    if remaining[dependant] == 0:
+                        next_ready.append(dependant)
+            ready = sorted(next_ready)
+
+        order.tables = [tables[i] for i in Adaptor._depth_first(dependencies)]
+        return order
 
     @staticmethod
-    def get_ordered_table_list(database: Database) -> List[Table]:
-        # find references and push in front
-        tables: List[Table] = []
-        for table in database.tables:
-            Adaptor._add_dependant_tables(database, table, tables)
+    def _depth_first(dependencies: List[Dict[int, List[Key]]]) -> List[int]:
+        # iterative, so long chains don't hit the recursion limit - the deferred keys are gone from dependencies, so
+        # what is left has no cycles
+        result: List[int] = []
+        visited = [False] * len(dependencies)
+        for root in range(len(dependencies)):
+            if visited[root]:
+                continue
+            visited[root] = True
+            work = [(root, iter(dependencies[root]))]
+            while len(work) > 0:
+                node, references = work[-1]
+                for reference in references:
+                    if not visited[reference]:
+                        visited[reference] = True
+                        work.append((reference, iter(dependencies[reference])))
+                        break
+                else:
+                    work.pop()
+                    result.append(node)
+        return result
+
+    @staticmethod
+    def _defer_cycles(tables: List[Table], dependencies: List[Dict[int, List[Key]]], dependants: List[List[int]],
+                      remaining: List[int], placed: List[bool], order: TableOrder) -> List[int]:
+        # every table left is in a cycle or waits on one - break each cycle at its first table in definition order
+        for cycle in Adaptor._find_cycles(dependencies, placed):
+            # breaking a cycle at one table can leave a smaller cycle among the rest, which was reported already
+            members = {id(tables[i]) for i in cycle}
+            if not any(members.issubset({id(table) for table in reported}) for reported in order.cycles):
+                order.cycles.append([tables[i] for i in cycle])
+            first = cycle[0]
+            for j in cycle:
+                if j in dependencies[first]:
+                    order.deferred_keys.extend(dependencies[first].pop(j))
+                    dependants[j].remove(first)
+                    remaining[first] -= 1
 
-        return tables
+        return [i for i in range(len(tables)) if not placed[i] and remaining[i] == 0]
+
+    @staticmethod
+    def _find_cycles(dependencies: List[Dict[int, List[Key]]], placed: List[bool]) -> List[List[int]]:
+        """ Strongly connected components with more than one table among the tables not placed yet (iterative
+        Tarjan, so long chains don't hit the recursion limit) """
+        index: Dict[int, int] = dict()
+        low: Dict[int, int] = dict()
+        stack: List[int] = []
+        on_stack = set()
+        cycles: List[List[int]] = []
+
+        for root in range(len(dependencies)):
+            if placed[root] or root in index:
+                continue
+
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(dependencies[root]))]
+            while len(work) > 0:
+                node, references = work[-1]
+                advanced = False
+                for reference in references:
+                    if placed[reference]:
+                        continue
+                    if reference not in index:
+                        index[reference] = low[reference] = len(index)
+                        stack.append(reference)
+                        on_stack.add(reference)
+                        work.append((reference, iter(dependencies[reference])))
+                        advanced = True
+                        break
+                    if reference in on_stack:
+                        low[node] = min(low[node], index[reference])
+                if advanced:
+                    continue
+
+                work.pop()
+                if len(work) > 0:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component: List[int] = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1:
+                        cycles.append(sorted(component))
+
+        return sorted(cycles)
+
+    @staticmethod
+    def get_ordered_table_list(database: Database) -> List[Table]:
+        # referenced tables always come before the tables that reference them
+        return Adaptor.get_table_order(database).get_tables()
 
     def escape_field_list(self, values: List[str]) -> List[str]:
         pass
@@ -74,6 +250,40 @@ class Adaptor(object):
     def generate_insert_script(self, table: Table) -> str:
         pass
 
+    def generate_bulk_insert_script(self, table: Table) -> str:
+        """ Insert of every field, auto increment ones included, with positional parameters """
+        pass
+
+    def begin_bulk_load(self):
+        """ Runs once before any table is loaded - returns what end_bulk_load needs to undo it """
+        return None
+
+    def end_bulk_load(self, state):
+        pass
+
+    def prepare_bulk_load(self, connection):
+        pass
+
+    def finish_table_load(self, connection, table: Table):
+        """ Runs once a table's rows are all inserted, before the last commit """
+        pass
+
+    def count_rows(self, connection, table: Table) -> int:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(self.generate_count_script(table))
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    def insert_rows(self, connection, table: Table, rows: List[tuple]):
+        """ Inserts the rows, each a tuple of every field's value in table order, without committing """
+        cursor = connection.cursor()
+        try:
+            cursor.executemany(self.generate_bulk_insert_script(table), rows)
+        finally:
+            cursor.close()
+
     def generate_update_script(self, table: Table) -> str:
         pass
 
@@ -86,6 +296,14 @@ class Adaptor(object):
     def generate_item_exists_script(self, table: Table) -> str:
         pass
 
+    def generate_fetch_by_key_script(self, table: Table, key: Key) -> str:
+        """ The rows with the given values in the fields of the key, such as the rows belonging to a row of the table
+        a foreign key references """
+        columns = ", ".join(self.escape_field_list([f.name.raw() for f in table.fields]))
+        table_name = self.escape_field_list([table.name.raw()])[0]
+        where = " and ".join([f"{self.escape_field_list([f])[0]} = ::{f}::" for f in key.fields])
+        return self.replace_parameters(f"select {columns} from {table_name} where {where};")
+
     def get_field_type(self, field_type: FieldType) -> str:
         pass
 
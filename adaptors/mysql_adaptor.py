@@ -1,10 +1,46 @@
 import re
-from typing import List
+from typing import Dict, List, Iterator, Tuple
 
 import mysql.connector
 
 from adaptors.adaptor import Adaptor
-from database_objects import Database, Table, KeyType, FieldType, Key, Field, DataException, DatatypeException
+from database_objects import Table, KeyType, FieldType, Key, Field, DataException, DatatypeException
+from phases import phases
+from type_registry import type_registry
+
+mysql_types = type_registry.register_dialect(
+    "mysql",
+    parse={
+        "integer": (FieldType.Integer, 4), "int": (FieldType.Integer, 4),
+        "bigint": (FieldType.Integer, 8),
+        "tinyint": (FieldType.Integer, 1),
+        "smallint": (FieldType.Integer, 2),
+        "mediumint": (FieldType.Integer, 3),
+        "float": (FieldType.Float, 4), "real": (FieldType.Float, 4),
+        "double": (FieldType.Float, 8),
+        "boolean": (FieldType.Boolean, 1), "bool": (FieldType.Boolean, 1),
+        "decimal": (FieldType.Decimal, "precision"), "money": (FieldType.Decimal, "precision"),
+        "string": (FieldType.String, "length"), "varchar": (FieldType.String, "length"),
+        "char": (FieldType.String, "length"),
+        "datetime": (FieldType.Datetime, 0), "date": (FieldType.Datetime, 0),
+        "none": (FieldType.Undefined, 0), "undefined": (FieldType.Undefined, 0)
+    },
+    render={
+        (FieldType.Integer, 1): "TINYINT",
+        (FieldType.Integer, 2): "SMALLINT",
+        (FieldType.Integer, 3): "MEDIUMINT",
+        (FieldType.Integer, 4): "INT",
+        (FieldType.Integer, 8): "BIGINT",
+        (FieldType.String, None): "VARCHAR",
+        (FieldType.Float, 4): "FLOAT",
+        (FieldType.Float, 8): "DOUBLE",
+        (FieldType.Decimal, None): "DECIMAL",
+        (FieldType.Datetime, None): "DATETIME",
+        (FieldType.Boolean, None): "TINYINT"
+    },
+    remap={
+        FieldType.Boolean: FieldType.Integer
+    })
 
 
 class MySqlAdaptor(Adaptor):
@@ -23,79 +59,128 @@ class MySqlAdaptor(Adaptor):
         else:
             raise DataException("Invalid connection string")
 
-    def import_schema(self, db_name: str) -> Database:
-        connection = mysql.connector.connect(user=self.user, password=self.password, host=self.hostname,
-                                             database=self.database)
-
+    def get_database_name(self, db_name: str) -> str:
         if db_name is None:
             db_name = self.database
+        return db_name
+
+    def connect(self):
+        return mysql.connector.connect(user=self.user, password=self.password, host=self.hostname,
+                                       database=self.database)
+
+    def import_tables(self, db_name: str) -> Iterator[Table]:
+        """ Reads the whole schema in four catalog queries and groups the rows by table in memory, so the number of
+        round trips doesn't grow with the number of tables """
+        connection = self.connect()
+        try:
+            cursor = connection.cursor(buffered=True)
+            with phases.phase("catalog_tables"):
+                cursor.execute("select TABLE_NAME from INFORMATION_SCHEMA.tables where TABLE_SCHEMA = %s and "
+                               "TABLE_TYPE = 'BASE TABLE'", (db_name,))
+                table_names = [self.get_text(row[0]) for row in cursor.fetchall()]
+
+            with phases.phase("catalog_columns"):
+                cursor.execute("select TABLE_NAME, COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, EXTRA, "
+                               "IS_NULLABLE, NUMERIC_PRECISION, NUMERIC_SCALE, COLUMN_DEFAULT "
+                               "from INFORMATION_SCHEMA.columns where TABLE_SCHEMA = %s "
+                               "order by TABLE_NAME, ORDINAL_POSITION", (db_name,))
+                field_rows = self.group_rows(cursor.fetchall())
+
+            with phases.phase("catalog_keys"):
+                cursor.execute("select kcu.TABLE_NAME, kcu.CONSTRAINT_NAME, kcu.REFERENCED_TABLE_NAME, "
+                               "kcu.COLUMN_NAME, kcu.REFERENCED_COLUMN_NAME "
+                               "from information_schema.referential_constraints fks "
+                               "join information_schema.key_column_usage kcu "
+                               "on fks.constraint_schema = kcu.table_schema "
+                               "and fks.table_name = kcu.table_name "
+                               "and fks.constraint_name = kcu.constraint_name "
+                               "where fks.constraint_schema = %s "
+                               "order by kcu.TABLE_NAME, kcu.CONSTRAINT_NAME, kcu.POSITION_IN_UNIQUE_CONSTRAINT",
+                               (db_name,))
+                foreign_key_rows = self.group_rows(cursor.fetchall())
+
+                cursor.execute("select s.TABLE_NAME, s.INDEX_NAME, s.COLUMN_NAME, case when "
+                               "c.CONSTRAINT_TYPE = 'FOREIGN KEY' then 'INDEX' when c.CONSTRAINT_TYPE is null "
+                               "then 'INDEX' else c.CONSTRAINT_TYPE end as `type` "
+                               "from INFORMATION_SCHEMA.STATISTICS s left join "
+                               "INFORMATION_SCHEMA.table_constraints c on s.TABLE_SCHEMA = c.TABLE_SCHEMA and "
+                               "s.TABLE_NAME = c.TABLE_NAME and s.INDEX_NAME = c.CONSTRAINT_NAME "
+                               "where s.TABLE_SCHEMA = %s "
+                               "order by s.TABLE_NAME, s.INDEX_NAME, s.SEQ_IN_INDEX", (db_name,))
+                index_rows = self.group_rows(cursor.fetchall())
+        finally:
+            connection.close()
+
+        # segment every name of the schema in one batch
+        names = [db_name] + table_names
+        for rows in field_rows.values():
+            names.extend(self.get_text(row[1]) for row in rows)
+        for rows in list(foreign_key_rows.values()) + list(index_rows.values()):
+            names.extend(self.get_text(row[1]) for row in rows)
+        self.naming.string_to_names(names)
+
+        for table_name in table_names:
+            with phases.phase("catalog_table", table_name):
+                table = self.get_table(table_name, field_rows.get(table_name, []),
+                                       foreign_key_rows.get(table_name, []), index_rows.get(table_name, []))
+            yield table
 
-        database = Database(self.naming.string_to_name(db_name))
-        cursor = connection.cursor(buffered=True)
-        print("Processing tables...")
-        cursor.execute("select TABLE_NAME from INFORMATION_SCHEMA.tables where TABLE_SCHEMA = 'test' and "
-                       "TABLE_TYPE = 'BASE TABLE'")
-        for row in cursor.fetchall():
-            table = Table(self.naming.string_to_name(row[0]))
-            database.tables.append(table)
-
-        for table in database.tables:
-            print(f"Processing fields for {table.name.raw()}...")
-            cursor.execute("select COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, EXTRA, IS_NULLABLE, "
-                           "NUMERIC_PRECISION, NUMERIC_SCALE, COLUMN_DEFAULT  from INFORMATION_SCHEMA.columns where "
-                           f"TABLE_SCHEMA = '{db_name}' and TABLE_NAME='{table.name.raw()}' order by ORDINAL_POSITION")
-
-            for row in cursor.fetchall():
-                field = Field(self.naming.string_to_name(str(row[0])),
-                              auto_increment=True if "auto_increment" in str(row[3]).lower() else False,
-                              required=str(row[4]).lower() != "yes")
-                self.get_field_type_defaults(row[1].decode("utf-8"), field, row[2] if row[2] is not None else 0, row[5],
-                                             row[6], row[7])
-
-                table.fields.append(field)
-
-            print("Processing indexes and keys")
-
-            cursor.execute("select fks.constraint_name as constraint_name, fks.referenced_table_name as primary_table, "
-                           "group_concat(kcu.column_name order by position_in_unique_constraint separator ', ') as "
-                           "local_columns, group_concat(kcu.referenced_column_name order by "
-                           "position_in_unique_constraint separator ', ') as reference_columns, 0 as NON_UNIQUE, "
-                           "'FOREIGN KEY' as type from information_schema.referential_constraints fks "
-                           "join information_schema.key_column_usage kcu "
-                           "on fks.constraint_schema = kcu.table_schema "
-                           "and fks.table_name = kcu.table_name "
-                           "and fks.constraint_name = kcu.constraint_name "
-                           f"where fks.constraint_schema = '{db_name}' and fks.table_name = '{table.name.raw()}' "
-                           "group by fks.constraint_name, fks.referenced_table_name "
-                           "union "
-                           "select s.INDEX_NAME as constraint_name, null as primary_table, "
-                           "group_concat(s.COLUMN_NAME  order by s.SEQ_IN_INDEX separator ', ') as local_columns, "
-                           "null as reference_columns, s.NON_UNIQUE, case when c.CONSTRAINT_TYPE = 'FOREIGN KEY' "
-                           "then 'INDEX' when c.CONSTRAINT_TYPE is null then 'INDEX' else c.CONSTRAINT_TYPE end as "
-                           "`type` from INFORMATION_SCHEMA.STATISTICS s left join "
-                           "INFORMATION_SCHEMA.table_constraints c on s.TABLE_SCHEMA = c.TABLE_SCHEMA and "
-                           "s.TABLE_NAME = c.TABLE_NAME and s.INDEX_NAME = c.CONSTRAINT_NAME "
-                           f"where s.TABLE_SCHEMA = '{db_name}' and s.TABLE_NAME = '{table.name.raw()}' "
-                           "group by s.INDEX_NAME, s.NON_UNIQUE, c.CONSTRAINT_TYPE ")
-            for row in cursor.fetchall():
-                key = Key(self.naming.string_to_name(row[0]))
-                key.referenced_table = table.name.raw()
-                key_type = row[5].lower()
-                key.key_type = KeyType.get_keytype(key_type)
-
-                key.fields = [f.strip() for f in row[2].split(",")]
-
-                if key.key_type == KeyType.ForeignKey:
-                    key.primary_table = row[1]
-                    key.primary_fields = [f.strip() for f in row[3].split(",")]
-
-                if key.key_type == KeyType.PrimaryKey:
-                    table.pk = key
-                else:
-                    table.keys.append(key)
+    @staticmethod
+    def get_text(value) -> str:
+        # some catalog columns come back as bytes
+        return value.decode("utf-8") if isinstance(value, (bytes, bytearray)) else str(value)
+
+    def group_rows(self, rows: List[tuple]) -> Dict[str, List[tuple]]:
+        """ Catalog rows by the table name in their first column, in the order they came """
+        result: Dict[str, List[tuple]] = dict()
+        for row in rows:
+            table_name = self.get_text(row[0])
+            if table_name not in result:
+                result[table_name] = []
+            result[table_name].append(row)
+        return result
 
-        connection.close()
-        return database
+    def get_table(self, table_name: str, field_rows: List[tuple], foreign_key_rows: List[tuple],
+                  index_rows: List[tuple]) -> Table:
+        table = Table(self.naming.string_to_name(table_name))
+        for row in field_rows:
+            field = Field(self.naming.string_to_name(self.get_text(row[1])),
+                          auto_increment=True if "auto_increment" in str(row[4]).lower() else False,
+                          required=str(row[5]).lower() != "yes")
+            self.get_field_type_defaults(self.get_text(row[2]), field, row[3] if row[3] is not None else 0,
+                                         row[6], row[7], row[8])
+            table.fields.append(field)
+
+        # one row per column of a key, grouped into the keys in column order
+        keys: Dict[Tuple[str, str], Key] = dict()
+        for row in foreign_key_rows:
+            name = self.get_text(row[1])
+            key = keys.get((name, "foreign key"))
+            if key is None:
+                key = Key(self.naming.string_to_name(name), KeyType.ForeignKey, self.get_text(row[2]))
+                key.referenced_table = table.name.raw()
+                keys[(name, "foreign key")] = key
+            key.fields.append(self.get_text(row[3]))
+            key.primary_fields.append(self.get_text(row[4]))
+
+        for row in index_rows:
+            name = self.get_text(row[1])
+            key_type = self.get_text(row[3]).lower()
+            key = keys.get((name, key_type))
+            if key is None:
+                key = Key(self.naming.string_to_name(name), KeyType.get_keytype(key_type))
+                key.referenced_table = table.name.raw()
+                keys[(name, key_type)] = key
+            column = self.get_text(row[2])
+            if column not in key.fields:
+                key.fields.append(column)
+
+        for key in keys.values():
+            if key.key_type == KeyType.PrimaryKey:
+                table.pk = key
+            else:
+                table.keys.append(key)
+        return table
 
     @staticmethod
     def get_field_size(field: Field) -> str:
@@ -126,7 +211,7 @@ class MySqlAdaptor(Adaptor):
         if table.pk:
             sql.append(f"PRIMARY KEY ({','.join(table.pk.fields)})")
 
-        for fk in [key for key in table.keys if key.key_type == KeyType.ForeignKey]:
+        for fk in table.get_keys(KeyType.ForeignKey):
             sql.append(f"FOREIGN KEY ({','.join(self.escape_field_list(fk.fields))}) REFERENCES "
                        f"{fk.primary_table}({','.join(self.escape_field_list(fk.primary_fields))})")
         joiner = ',\n\t'
@@ -157,6 +242,12 @@ class MySqlAdaptor(Adaptor):
         result = f"insert into `{table.name.raw()}` ({params}) values ({values});"
         return result
 
+    def generate_bulk_insert_script(self, table: Table) -> str:
+        # executemany sends a plain insert like this one as multi row inserts
+        fields = ", ".join(self.escape_field_list([f.name.raw() for f in table.fields]))
+        values = ", ".join(["%s"] * len(table.fields))
+        return f"insert into `{table.name.raw()}` ({fields}) values ({values})"
+
     def generate_update_script(self, table: Table) -> str:
         fields = [f.name.raw() for f in table.fields if not f.auto_increment and f.name not in table.pk.fields]
         update_list = [f"`{f}` = %({f})s" for f in fields]
@@ -188,98 +279,30 @@ class MySqlAdaptor(Adaptor):
 
     @staticmethod
     def get_field_type_defaults(value: str, field: Field, size, precision, scale, default):
-        value = value.lower()
-        default = None if default is None else default.decode("utf-8")
-        if value == "integer" or value == "int":
-            field.type = FieldType.Integer
-            field.size = 4
-        elif value == "bigint":
-            field.type = FieldType.Integer
-            field.size = 8
-        elif value == "tinyint":
-            field.type = FieldType.Integer
-            field.size = 1
-        elif value == "smallint":
-            field.type = FieldType.Integer
-            field.size = 2
-        elif value == "mediumint":
-            field.type = FieldType.Integer
-            field.size = 3
-        elif value == "float" or value == "real":
-            field.type = FieldType.Float
-            field.size = 4
-        elif value == "double":
-            field.type = FieldType.Float
-            field.size = 8
-        elif value == "boolean" or value == "bool":
-            field.type = FieldType.Boolean
-            field.size = 1
-        elif value == "decimal" or value == "money":
-            field.type = FieldType.Decimal
+        result = mysql_types.parse(value)
+        if result is None:
+            raise DatatypeException("Unknown field type {}".format(value.lower()))
+        field.type, field_size = result
+        if field_size == "precision":
             field.size = precision
             field.scale = scale
-        elif value == "string" or value == "varchar" or value == "char":
-            field.type = FieldType.String
+        elif field_size == "length":
             field.size = size
-        elif value == "datetime" or value == "date":
-            field.type = FieldType.Datetime
-            field.size = 0
-        elif value == "none" or value == "undefined":
-            field.type = FieldType.Undefined
-            field.size = 0
         else:
-            raise DatatypeException("Unknown field type {}".format(value))
-        field.default = default
+            field.size = field_size
+        field.default = None if default is None else MySqlAdaptor.get_text(default)
 
     def get_field_type(self, field_type: FieldType, size: int = 0, scale: int = 0) -> str:
-        if field_type == FieldType.Integer:
-            if size == 1:
-                return "TINYINT"
-            elif size == 2:
-                return "SMALLINT"
-            elif size == 3:
-                return "MEDIUMINT"
-            elif size == 4:
-                return "INT"
-            elif size == 8:
-                return "BIGINT"
-            else:
-                raise DatatypeException("Unknown field size")
-
-        elif field_type == FieldType.String:
-            return "VARCHAR"
-        elif field_type == FieldType.Float:
-            if size == 4:
-                return "FLOAT"
-            elif size == 8:
-                return "DOUBLE"
-            else:
-                raise DatatypeException("Unknown float size")
-
-        elif field_type == FieldType.Decimal:
-            return "DECIMAL"
-        elif field_type == FieldType.Datetime:
-            return "DATETIME"
-        elif field_type == FieldType.Boolean:
-            return "TINYINT"
-        else:
-            raise DatatypeException("Unknown field type ")
+        result = mysql_types.render(field_type, size)
+        if result is None:
+            raise DatatypeException("Unknown field size" if mysql_types.is_sized(field_type) else "Unknown field type ")
+        return result
 
     def must_remap_field(self, field_type: FieldType) -> tuple[bool, FieldType]:
-        if field_type == FieldType.Integer:
-            return False, FieldType.Integer
-        elif field_type == FieldType.String:
-            return False, FieldType.String
-        elif field_type == FieldType.Float:
-            return False, FieldType.Float
-        elif field_type == FieldType.Decimal:
-            return False, FieldType.Decimal
-        elif field_type == FieldType.Datetime:
-            return False, FieldType.Datetime
-        elif field_type == FieldType.Boolean:
-            return True, FieldType.Integer
-        else:
+        result = mysql_types.remap(field_type)
+        if result is None:
             raise DatatypeException("Unknown field type ")
+        return result
 
     def replace_parameters(self, query: str) -> str:
         return re.sub(r"::(\w+)::", r"%(\1)s", query)
@@ -1,10 +1,46 @@
 import re
-from typing import List
+from typing import List, Iterator
 
 import psycopg2
+import psycopg2.extras
 
 from adaptors.adaptor import Adaptor
-from database_objects import Database, Table, KeyType, FieldType, Key, Field, DataException, DatatypeException
+from database_objects import Table, KeyType, FieldType, Key, Field, DataException, DatatypeException
+from phases import phases
+from type_registry import type_registry
+
+pgsql_types = type_registry.register_dialect(
+    "pgsql",
+    parse={
+        "integer": (FieldType.Integer, 4), "int": (FieldType.Integer, 4),
+        "bigint": (FieldType.Integer, 8),
+        "smallint": (FieldType.Integer, 2),
+        "float": (FieldType.Float, 4), "real": (FieldType.Float, 4),
+        "double": (FieldType.Float, 8),
+        "boolean": (FieldType.Boolean, 1), "bool": (FieldType.Boolean, 1),
+        "decimal": (FieldType.Decimal, "precision"), "money": (FieldType.Decimal, "precision"),
+        "numeric": (FieldType.Decimal, "precision"),
+        "string": (FieldType.String, "length"), "varchar": (FieldType.String, "length"),
+        "char": (FieldType.String, "length"),
+        "uuid": (FieldType.String, 36),
+        "timestamp": (FieldType.Datetime, 0), "date": (FieldType.Datetime, 0),
+        "none": (FieldType.Undefined, 0), "undefined": (FieldType.Undefined, 0)
+    },
+    render={
+        (FieldType.Integer, 1): "SMALLINT",
+        (FieldType.Integer, 2): "SMALLINT",
+        (FieldType.Integer, 4): "INT",
+        (FieldType.Integer, 8): "BIGINT",
+        (FieldType.String, None): "VARCHAR",
+        (FieldType.Float, 4): "FLOAT",
+        (FieldType.Float, 8): "DOUBLE",
+        (FieldType.Decimal, None): "NUMERIC",
+        (FieldType.Datetime, None): "TIMESTAMP",
+        (FieldType.Boolean, None): "SMALLINT"
+    },
+    remap={
+        FieldType.Boolean: FieldType.Integer
+    })
 
 
 class PgSqlAdaptor(Adaptor):
@@ -23,79 +59,90 @@ class PgSqlAdaptor(Adaptor):
         else:
             raise DataException("Invalid connection string")
 
-    def import_schema(self, db_name: str) -> Database:
-        connection = psycopg2.connect(user=self.user, password=self.password, host=self.hostname,
-                                      database=self.database)
-
+    def get_database_name(self, db_name: str) -> str:
         if db_name is None:
             db_name = self.database
-
-        database = Database(self.naming.string_to_name(db_name))
-        cursor = connection.cursor()
-        print("Processing tables...")
-        cursor.execute("select TABLE_NAME from INFORMATION_SCHEMA.tables where TABLE_SCHEMA = 'test' and "
-                       "TABLE_TYPE = 'BASE TABLE'")
-        for row in cursor.fetchall():
-            table = Table(self.naming.string_to_name(row[0]))
-            database.tables.append(table)
-
-        for table in database.tables:
-            print(f"Processing fields for {table.name.raw()}...")
-            cursor.execute("select COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, EXTRA, IS_NULLABLE, "
-                           "NUMERIC_PRECISION, NUMERIC_SCALE, COLUMN_DEFAULT  from INFORMATION_SCHEMA.columns where "
-                           f"TABLE_SCHEMA = '{db_name}' and TABLE_NAME='{table.name.raw()}' order by ORDINAL_POSITION")
-
-            for row in cursor.fetchall():
-                field = Field(self.naming.string_to_name(str(row[0])),
-                              auto_increment=True if "auto_increment" in str(row[3]).lower() else False,
-                              required=str(row[4]).lower() != "yes")
-                self.get_field_type_defaults(row[1].decode("utf-8"), field, row[2] if row[2] is not None else 0, row[5],
-                                             row[6], row[7])
-
-                table.fields.append(field)
-
-            print("Processing indexes and keys")
-
-            cursor.execute("select fks.constraint_name as constraint_name, fks.referenced_table_name as primary_table, "
-                           "group_concat(kcu.column_name order by position_in_unique_constraint separator ', ') as "
-                           "local_columns, group_concat(kcu.referenced_column_name order by "
-                           "position_in_unique_constraint separator ', ') as reference_columns, 0 as NON_UNIQUE, "
-                           "'FOREIGN KEY' as type from information_schema.referential_constraints fks "
-                           "join information_schema.key_column_usage kcu "
-                           "on fks.constraint_schema = kcu.table_schema "
-                           "and fks.table_name = kcu.table_name "
-                           "and fks.constraint_name = kcu.constraint_name "
-                           f"where fks.constraint_schema = '{db_name}' and fks.table_name = '{table.name.raw()}' "
-                           "group by fks.constraint_name, fks.referenced_table_name "
-                           "union "
-                           "select s.INDEX_NAME as constraint_name, null as primary_table, "
-                           "group_concat(s.COLUMN_NAME  order by s.SEQ_IN_INDEX separator ', ') as local_columns, "
-                           "null as reference_columns, s.NON_UNIQUE, case when c.CONSTRAINT_TYPE = 'FOREIGN KEY' "
-                           "then 'INDEX' when c.CONSTRAINT_TYPE is null then 'INDEX' else c.CONSTRAINT_TYPE end as "
-                           "`type` from INFORMATION_SCHEMA.STATISTICS s left join "
-                           "INFORMATION_SCHEMA.table_constraints c on s.TABLE_SCHEMA = c.TABLE_SCHEMA and "
-                           "s.TABLE_NAME = c.TABLE_NAME and s.INDEX_NAME = c.CONSTRAINT_NAME "
-                           f"where s.TABLE_SCHEMA = '{db_name}' and s.TABLE_NAME = '{table.name.raw()}' "
-                           "group by s.INDEX_NAME, s.NON_UNIQUE, c.CONSTRAINT_TYPE ")
-            for row in cursor.fetchall():
-                key = Key(self.naming.string_to_name(row[0]))
-                key.referenced_table = table.name.raw()
-                key_type = row[5].lower()
-                key.key_type = KeyType.get_keytype(key_type)
-
-                key.fields = [f.strip() for f in row[2].split(",")]
-
-                if key.key_type == KeyType.ForeignKey:
-                    key.primary_table = row[1]
-                    key.primary_fields = [f.strip() for f in row[3].split(",")]
-
-                if key.key_type == KeyType.PrimaryKey:
-                    table.pk = key
-                else:
-                    table.keys.append(key)
-
-        connection.close()
-        return database
+        return db_name
+
+    def connect(self):
+        return psycopg2.connect(user=self.user, password=self.password, host=self.hostname, database=self.database)
+
+    def import_tables(self, db_name: str) -> Iterator[Table]:
+        connection = self.connect()
+        try:
+            cursor = connection.cursor()
+            with phases.phase("catalog_tables"):
+                cursor.execute("select TABLE_NAME from INFORMATION_SCHEMA.tables where TABLE_SCHEMA = 'test' and "
+                               "TABLE_TYPE = 'BASE TABLE'")
+                table_names = [row[0] for row in cursor.fetchall()]
+            self.naming.string_to_names([db_name] + table_names)
+
+            for table_name in table_names:
+                with phases.phase("catalog_table", table_name):
+                    cursor.execute("select COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, EXTRA, IS_NULLABLE, "
+                                   "NUMERIC_PRECISION, NUMERIC_SCALE, COLUMN_DEFAULT  from INFORMATION_SCHEMA.columns "
+                                   f"where TABLE_SCHEMA = '{db_name}' and TABLE_NAME='{table_name}' "
+                                   "order by ORDINAL_POSITION")
+                    field_rows = cursor.fetchall()
+
+                    cursor.execute("select fks.constraint_name as constraint_name, fks.referenced_table_name as "
+                                   "primary_table, group_concat(kcu.column_name order by "
+                                   "position_in_unique_constraint separator ', ') as local_columns, "
+                                   "group_concat(kcu.referenced_column_name order by position_in_unique_constraint "
+                                   "separator ', ') as reference_columns, 0 as NON_UNIQUE, 'FOREIGN KEY' as type "
+                                   "from information_schema.referential_constraints fks "
+                                   "join information_schema.key_column_usage kcu "
+                                   "on fks.constraint_schema = kcu.table_schema "
+                                   "and fks.table_name = kcu.table_name "
+                                   "and fks.constraint_name = kcu.constraint_name "
+                                   f"where fks.constraint_schema = '{db_name}' and fks.table_name = '{table_name}' "
+                                   "group by fks.constraint_name, fks.referenced_table_name "
+                                   "union "
+                                   "select s.INDEX_NAME as constraint_name, null as primary_table, "
+                                   "group_concat(s.COLUMN_NAME  order by s.SEQ_IN_INDEX separator ', ') as "
+                                   "local_columns, null as reference_columns, s.NON_UNIQUE, case when "
+                                   "c.CONSTRAINT_TYPE = 'FOREIGN KEY' then 'INDEX' when c.CONSTRAINT_TYPE is null "
+                                   "then 'INDEX' else c.CONSTRAINT_TYPE end as "
+                                   "`type` from INFORMATION_SCHEMA.STATISTICS s left join "
+                                   "INFORMATION_SCHEMA.table_constraints c on s.TABLE_SCHEMA = c.TABLE_SCHEMA and "
+                                   "s.TABLE_NAME = c.TABLE_NAME and s.INDEX_NAME = c.CONSTRAINT_NAME "
+                                   f"where s.TABLE_SCHEMA = '{db_name}' and s.TABLE_NAME = '{table_name}' "
+                                   "group by s.INDEX_NAME, s.NON_UNIQUE, c.CONSTRAINT_TYPE ")
+                    key_rows = cursor.fetchall()
+
+                # segment the names of the table in one batch
+                self.naming.string_to_names([str(row[0]) for row in field_rows] + [row[0] for row in key_rows])
+
+                table = Table(self.naming.string_to_name(table_name))
+                for row in field_rows:
+                    field = Field(self.naming.string_to_name(str(row[0])),
+                                  auto_increment=True if "auto_increment" in str(row[3]).lower() else False,
+                                  required=str(row[4]).lower() != "yes")
+                    self.get_field_type_defaults(row[1].decode("utf-8"), field, row[2] if row[2] is not None else 0,
+                                                 row[5], row[6], row[7])
+
+                    table.fields.append(field)
+
+                for row in key_rows:
+                    key = Key(self.naming.string_to_name(row[0]))
+                    key.referenced_table = table.name.raw()
+                    key_type = row[5].lower()
+                    key.key_type = KeyType.get_keytype(key_type)
+
+                    key.fields = [f.strip() for f in row[2].split(",")]
+
+                    if key.key_type == KeyType.ForeignKey:
+                        key.primary_table = row[1]
+                        key.primary_fields = [f.strip() for f in row[3].split(",")]
+
+                    if key.key_type == KeyType.PrimaryKey:
+                        table.pk = key
+                    else:
+                        table.keys.append(key)
+
+                yield table
+        finally:
+            connection.close()
 
     @staticmethod
     def get_field_size(field: Field) -> str:
@@ -127,7 +174,7 @@ class PgSqlAdaptor(Adaptor):
         if table.pk:
             sql.append(f"PRIMARY KEY ({','.join(table.pk.fields)})")
 
-        for fk in [key for key in table.keys if key.key_type == KeyType.ForeignKey]:
+        for fk in table.get_keys(KeyType.ForeignKey):
             sql.append(f"FOREIGN KEY ({','.join(self.escape_field_list(fk.fields))}) REFERENCES "
                        f"{fk.primary_table}({','.join(self.escape_field_list(fk.primary_fields))})")
         joiner = ',\n\t'
@@ -158,6 +205,41 @@ class PgSqlAdaptor(Adaptor):
         result = f"insert into `{table.name.raw()}` ({params}) values ({values});"
         return result
 
+    def generate_bulk_insert_script(self, table: Table) -> str:
+        # identity columns only take the generated values unless they are overridden
+        fields = ", ".join(self.escape_field_list([f.name.raw() for f in table.fields]))
+        return f"insert into \"{table.name.raw()}\" ({fields}) OVERRIDING SYSTEM VALUE values %s"
+
+    def insert_rows(self, connection, table: Table, rows: List[tuple]):
+        # executemany runs one statement per row, execute_values sends them a page at a time
+        cursor = connection.cursor()
+        try:
+            psycopg2.extras.execute_values(cursor, self.generate_bulk_insert_script(table), rows, page_size=1000)
+        finally:
+            cursor.close()
+
+    def count_rows(self, connection, table: Table) -> int:
+        # the count script of the generated repositories quotes like mysql
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f"select count(*) from \"{table.name.raw()}\"")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    def finish_table_load(self, connection, table: Table):
+        # the rows overrode the identity values, so the sequences would hand out ids that are taken already
+        cursor = connection.cursor()
+        try:
+            table_name = f"\"{table.name.raw()}\""
+            for field in table.fields:
+                if field.auto_increment:
+                    cursor.execute(f"select setval(pg_get_serial_sequence(%s, %s), "
+                                   f"coalesce(max(\"{field.name.raw()}\"), 0) + 1, false) from {table_name}",
+                                   (table_name, field.name.raw()))
+        finally:
+            cursor.close()
+
     def generate_update_script(self, table: Table) -> str:
         fields = [f.name.raw() for f in table.fields if not f.auto_increment and f.name not in table.pk.fields]
         update_list = [f"`{f}` = %({f})s" for f in fields]
@@ -189,88 +271,30 @@ class PgSqlAdaptor(Adaptor):
 
     @staticmethod
     def get_field_type_defaults(value: str, field: Field, size, precision, scale, default):
-        value = value.lower()
-        default = None if default is None else default.decode("utf-8")
-        if value == "integer" or value == "int":
-            field.type = FieldType.Integer
-            field.size = 4
-        elif value == "bigint":
-            field.type = FieldType.Integer
-            field.size = 8
-        elif value == "smallint":
-            field.type = FieldType.Integer
-            field.size = 2
-        elif value == "float" or value == "real":
-            field.type = FieldType.Float
-            field.size = 4
-        elif value == "double":
-            field.type = FieldType.Float
-            field.size = 8
-        elif value == "boolean" or value == "bool":
-            field.type = FieldType.Boolean
-            field.size = 1
-        elif value == "decimal" or value == "money" or value == "numeric":
-            field.type = FieldType.Decimal
+        result = pgsql_types.parse(value)
+        if result is None:
+            raise DatatypeException("Unknown field type {}".format(value.lower()))
+        field.type, field_size = result
+        if field_size == "precision":
             field.size = precision
             field.scale = scale
-        elif value == "string" or value == "varchar" or value == "char":
-            field.type = FieldType.String
+        elif field_size == "length":
             field.size = size
-        elif value == "timestamp" or value == "date":
-            field.type = FieldType.Datetime
-            field.size = 0
-        elif value == "none" or value == "undefined":
-            field.type = FieldType.Undefined
-            field.size = 0
         else:
-            raise DatatypeException("Unknown field type {}".format(value))
-        field.default = default
+            field.size = field_size
+        field.default = None if default is None else default.decode("utf-8")
 
     def get_field_type(self, field_type: FieldType, size: int = 0, scale: int = 0) -> str:
-        if field_type == FieldType.Integer:
-            if size == 1 or size == 2:
-                return "SMALLINT"
-            elif size == 4:
-                return "INT"
-            elif size == 8:
-                return "BIGINT"
-            else:
-                raise DatatypeException("Unknown field size")
-
-        elif field_type == FieldType.String:
-            return "VARCHAR"
-        elif field_type == FieldType.Float:
-            if size == 4:
-                return "FLOAT"
-            elif size == 8:
-                return "DOUBLE"
-            else:
-                raise DatatypeException("Unknown float size")
-
-        elif field_type == FieldType.Decimal:
-            return "NUMERIC"
-        elif field_type == FieldType.Datetime:
-            return "TIMESTAMP"
-        elif field_type == FieldType.Boolean:
-            return "SMALLINT"
-        else:
-            raise DatatypeException("Unknown field type ")
+        result = pgsql_types.render(field_type, size)
+        if result is None:
+            raise DatatypeException("Unknown field size" if pgsql_types.is_sized(field_type) else "Unknown field type ")
+        return result
 
     def must_remap_field(self, field_type: FieldType) -> tuple[bool, FieldType]:
-        if field_type == FieldType.Integer:
-            return False, FieldType.Integer
-        elif field_type == FieldType.String:
-            return False, FieldType.String
-        elif field_type == FieldType.Float:
-            return False, FieldType.Float
-        elif field_type == FieldType.Decimal:
-            return False, FieldType.Decimal
-        elif field_type == FieldType.Datetime:
-            return False, FieldType.Datetime
-        elif field_type == FieldType.Boolean:
-            return True, FieldType.Integer
-        else:
+        result = pgsql_types.remap(field_type)
+        if result is None:
             raise DatatypeException("Unknown field type ")
+        return result
 
     def replace_parameters(self, query: str) -> str:
         return re.sub(r"::(\w+)::", r"%(\1)s", query)
@@ -1,11 +1,28 @@
 import re
 import sqlite3
-from typing import Union, List
+from typing import Union, List, Iterator
 
 from adaptors.adaptor import Adaptor
-from database_objects import Database, Table, KeyType, FieldType, Key, Field, DatatypeException, DataException
+from database_objects import Table, KeyType, FieldType, Key, Field, DatatypeException, DataException
+from phases import phases
+from type_registry import type_registry
 from utils import get_fullname, clean_string, find_in_list, get_filename
 
+sqlite_types = type_registry.register_dialect(
+    "sqlite",
+    render={
+        (FieldType.Integer, None): "INTEGER",
+        (FieldType.String, None): "TEXT",
+        (FieldType.Float, None): "REAL",
+        (FieldType.Decimal, None): "REAL",
+        (FieldType.Datetime, None): "REAL",
+        (FieldType.Boolean, None): "INTEGER"
+    },
+    remap={
+        FieldType.Datetime: FieldType.Float,
+        FieldType.Boolean: FieldType.Integer
+    })
+
 
 class SqliteAdaptor(Adaptor):
     """ Connection string is sqlite://filename or sqlite://memory """
@@ -18,27 +35,35 @@ class SqliteAdaptor(Adaptor):
         else:
             self.connection = get_fullname(connection_string)
 
-    def import_schema(self, db_name: str) -> Database:
-        connection = sqlite3.connect(self.connection)
+    def get_database_name(self, db_name: str) -> str:
         if db_name is None:
             db_name = get_filename(self.connection)
-
-        database = Database(self.naming.string_to_name(db_name))
-
-        cursor = connection.execute("SELECT sql FROM sqlite_master WHERE type='table'", [])
-        for row in cursor.fetchall():
-            create_script = row[0]
-            table = self.parse_create_script(create_script)
-            if table is not None:
-                database.tables.append(table)
-
-        cursor.close()
-
-        return database
+        return db_name
+
+    def connect(self):
+        # parallel loads wait for each other's writes instead of failing on a locked database
+        return sqlite3.connect(self.connection, timeout=600)
+
+    def import_tables(self, db_name: str) -> Iterator[Table]:
+        connection = self.connect()
+        try:
+            with phases.phase("catalog_tables"):
+                rows = connection.execute("SELECT sql FROM sqlite_master WHERE type='table'", []).fetchall()
+            for row in rows:
+                create_script = row[0]
+                with phases.phase("catalog_table"):
+                    table = self.parse_create_script(create_script)
+                if table is not None:
+                    yield table
+        finally:
+            connection.close()
 
     def escape_field_list(self, values: List[str]) -> List[str]:
         return ["\"" + value + "\"" for value in values]
 
+    def generate_drop_script(self, table: Table) -> str:
+        return f"drop table \"{table.name.raw()}\";"
+
     def generate_create_script(self, table: Table) -> str:
         sql: list[str] = []
         for field in table.fields:
@@ -46,7 +71,7 @@ class SqliteAdaptor(Adaptor):
         if table.pk:
             sql.append(f"PRIMARY KEY ({','.join(self.escape_field_list(table.pk.fields))})")
 
-        for fk in [key for key in table.keys if key.key_type == KeyType.ForeignKey]:
+        for fk in table.get_keys(KeyType.ForeignKey):
             sql.append(f"FOREIGN KEY ({','.join(self.escape_field_list(fk.fields))}) REFERENCES "
                        f"\"{fk.primary_table}\"({','.join(self.escape_field_list(fk.primary_fields))})")
 
@@ -77,6 +102,33 @@ class SqliteAdaptor(Adaptor):
         result = f"insert into \\\"{table.name.raw()}\\\" ({params}) values ({values});"
         return result
 
+    def generate_bulk_insert_script(self, table: Table) -> str:
+        fields = ", ".join(self.escape_field_list([f.name.raw() for f in table.fields]))
+        values = ", ".join(["?"] * len(table.fields))
+        return f"insert into \"{table.name.raw()}\" ({fields}) values ({values})"
+
+    def begin_bulk_load(self):
+        # WAL lets a load read the tables it references while others write - the journal mode is stored in the
+        # database file, so the one it had is put back afterwards
+        connection = self.connect()
+        try:
+            journal_mode = connection.execute("PRAGMA journal_mode").fetchone()[0]
+            connection.execute("PRAGMA journal_mode=WAL")
+        finally:
+            connection.close()
+        return journal_mode
+
+    def end_bulk_load(self, state):
+        connection = self.connect()
+        try:
+            connection.execute(f"PRAGMA journal_mode={state}")
+        finally:
+            connection.close()
+
+    def prepare_bulk_load(self, connection):
+        # a lost load is simply generated again, so it doesn't have to survive a crash
+        connection.execute("PRAGMA synchronous=OFF")
+
     def generate_update_script(self, table: Table) -> str:
         fields = [f.name.raw() for f in table.fields if not f.auto_increment and f.name not in table.pk.fields]
         update_list = [f"\\\"{f}\\\" = :{f}" for f in fields]
@@ -107,32 +159,16 @@ class SqliteAdaptor(Adaptor):
         return result
 
     def get_field_type(self, field_type: FieldType) -> str:
-        if field_type == FieldType.Integer:
-            return "INTEGER"
-        elif field_type == FieldType.String:
-            return "TEXT"
-        elif field_type == FieldType.Float or field_type == FieldType.Decimal:
-            return "REAL"
-        elif field_type == FieldType.Datetime:
-            return "REAL"
-        elif field_type == FieldType.Boolean:
-            return "INTEGER"
-        else:
+        result = sqlite_types.render(field_type)
+        if result is None:
             raise DatatypeException("Unknown field type ")
+        return result
 
     def must_remap_field(self, field_type: FieldType) -> tuple[bool, FieldType]:
-        if field_type == FieldType.Integer:
-            return False, FieldType.Integer
-        elif field_type == FieldType.String:
-            return False, FieldType.String
-        elif field_type == FieldType.Float or field_type == FieldType.Decimal:
-            return False, FieldType.Float
-        elif field_type == FieldType.Datetime:
-            return True, FieldType.Float
-        elif field_type == FieldType.Boolean:
-            return True, FieldType.Integer
-        else:
+        result = sqlite_types.remap(field_type)
+        if result is None:
             raise DatatypeException("Unknown field type ")
+        return result
 
     def parse_create_script(self, create_script: str) -> Union[Table, None]:
         table: Table
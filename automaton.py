@@ -0,0 +1,177 @@
+from bisect import bisect_left
+from typing import List, Dict
+
+from snapshot import SnapshotWriter
+
+
+class WordAutomaton(object):
+    """ Aho-Corasick automaton over a fixed list of words - finds every occurrence of every word in one pass """
+    __section_count__ = 9
+
+    def __init__(self, words: List[str]):
+        self.words = words
+        self._goto: List[Dict[str, int]] = [dict()]
+        self._fail: List[int] = [0]
+        self._output: List[int] = [-1]
+        self._output_link: List[int] = [0]
+
+        for index in range(len(words)):
+            self._add_word(words[index], index)
+
+        self._build_links()
+
+    def _add_word(self, word: str, index: int):
+        if word == "":
+            return
+
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append(dict())
+                self._fail.append(0)
+                self._output.append(-1)
+                self._output_link.append(0)
+                self._goto[state][char] = next_state
+            state = next_state
+
+        # first occurrence wins on duplicate words
+        if self._output[state] == -1:
+            self._output[state] = index
+
+    def _build_links(self):
+        # breadth first, so the fail state of a node is always finished before the node itself
+        queue = list(self._goto[0].values())
+        position = 0
+        while position < len(queue):
+            state = queue[position]
+            position += 1
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                self._output_link[next_state] = fail if self._output[fail] != -1 else self._output_link[fail]
+
+    def find_all(self, text: str) -> Dict[int, List[int]]:
+        """ Returns the start positions of every word found in text, keyed by word index, in ascending order """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        output_link = self._output_link
+        words = self.words
+        matches: Dict[int, List[int]] = dict()
+
+        state = 0
+        for position in range(len(text)):
+            char = text[position]
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            node = state if output[state] != -1 else output_link[state]
+            while node:
+                index = output[node]
+                start = position - len(words[index]) + 1
+                if index in matches:
+                    matches[index].append(start)
+                else:
+                    matches[index] = [start]
+                node = output_link[node]
+
+        return matches
+
+    def write_sections(self, writer: SnapshotWriter):
+        """ Flattens the automaton into the sections MappedWordAutomaton expects """
+        edge_start: List[int] = [0]
+        edge_char: List[int] = []
+        edge_target: List[int] = []
+        for goto in self._goto:
+            for char in sorted(goto.keys()):
+                edge_char.append(ord(char))
+                edge_target.append(goto[char])
+            edge_start.append(len(edge_char))
+
+        word_offset: List[int] = [0]
+        blob: List[bytes] = []
+        for word in self.words:
+            data = word.encode("utf-8")
+            blob.append(data)
+            word_offset.append(word_offset[-1] + len(data))
+
+        writer.add_array(edge_start)
+        writer.add_array(edge_char)
+        writer.add_array(edge_target)
+        writer.add_array(self._fail)
+        writer.add_array(self._output)
+        writer.add_array(self._output_link)
+        writer.add_array([len(word) for word in self.words])
+        writer.add_array(word_offset)
+        writer.add_bytes(b"".join(blob))
+
+
+class MappedWords(object):
+    """ Read only list of the words in a snapshot, decoded on first access """
+
+    def __init__(self, offsets: memoryview, blob: memoryview):
+        self._offsets = offsets
+        self._blob = blob
+        self._decoded: Dict[int, str] = dict()
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        word = self._decoded.get(index)
+        if word is None:
+            word = bytes(self._blob[self._offsets[index]:self._offsets[index + 1]]).decode("utf-8")
+            self._decoded[index] = word
+        return word
+
+
+class MappedWordAutomaton(object):
+    """ WordAutomaton read straight from snapshot sections - transitions are binary searched in place """
+
+    def __init__(self, sections: List[memoryview]):
+        self._edge_start, self._edge_char, self._edge_target, self._fail, self._output, self._output_link, \
+            self._word_length, word_offset, blob = sections
+        self.words = MappedWords(word_offset, blob)
+
+    def find_all(self, text: str) -> Dict[int, List[int]]:
+        edge_start = self._edge_start
+        edge_char = self._edge_char
+        edge_target = self._edge_target
+        fail = self._fail
+        output = self._output
+        output_link = self._output_link
+        word_length = self._word_length
+        matches: Dict[int, List[int]] = dict()
+
+        state = 0
+        for position in range(len(text)):
+            char = ord(text[position])
+            while True:
+                low = edge_start[state]
+                high = edge_start[state + 1]
+                edge = bisect_left(edge_char, char, low, high)
+                if edge < high and edge_char[edge] == char:
+                    state = edge_target[edge]
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+
+            node = state if output[state] != -1 else output_link[state]
+            while node:
+                index = output[node]
+                start = position - word_length[index] + 1
+                if index in matches:
+                    matches[index].append(start)
+                else:
+                    matches[index] = [start]
+                node = output_link[node]
+
+        return matches
@@ -0,0 +1,54 @@
+import json
+import os
+from typing import List
+
+from database_objects import DataException
+from utils import get_fullname
+
+
+class BatchJob(object):
+    """ One definition of a batch - generate-dal into output_folder, and its DDL into ddl_file """
+
+    def __init__(self, name: str, definition_file: str, output_folder: str, db_type: str, language: str,
+                 ddl_file: str = None, template_folder: str = None):
+        self.name = name
+        self.definition_file = definition_file
+        self.output_folder = output_folder
+        self.db_type = db_type
+        self.language = language
+        self.ddl_file = os.path.join(output_folder, "schema.sql") if ddl_file is None else ddl_file
+        # None for the templates shipped with the generator
+        self.template_folder = template_folder
+
+
+class BatchResult(object):
+    def __init__(self, job: BatchJob):
+        self.job = job
+        self.error: str = ""
+        self.generated_count = 0
+        self.table_count = 0
+        self.seconds = 0.0
+
+
+def load_batch_manifest(manifest_file: str) -> List[BatchJob]:
+    """ Reads {"jobs": [{"definition_file", "output_folder", "db_type", "language", optional "name", "ddl_file"
+    and "template_folder"}]} - relative paths are relative to the manifest """
+    manifest_file = get_fullname(manifest_file)
+    folder = os.path.dirname(manifest_file)
+    with open(manifest_file, 'r') as input_file:
+        obj = json.load(input_file)
+
+    jobs: List[BatchJob] = []
+    for i, job in enumerate(obj.get("jobs", [])):
+        for key in ("definition_file", "output_folder", "db_type", "language"):
+            if key not in job:
+                raise DataException(f"Batch job {i} has no {key}")
+
+        ddl_file = os.path.join(folder, get_fullname(job["ddl_file"])) if "ddl_file" in job else None
+        template_folder = os.path.join(folder, get_fullname(job["template_folder"])) if "template_folder" in job \
+            else None
+        jobs.append(BatchJob(job.get("name", job["definition_file"]),
+                             os.path.join(folder, get_fullname(job["definition_file"])),
+                             os.path.join(folder, get_fullname(job["output_folder"])), job["db_type"], job["language"],
+                             ddl_file, template_folder))
+    return jobs
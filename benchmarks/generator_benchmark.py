@@ -0,0 +1,216 @@
+# run from the repository root: python -m benchmarks.generator_benchmark
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from adaptors.adaptor import Adaptor
+from adaptors.adaptor_factory import AdaptorFactory
+from database_objects import Database, Table, Field, Key, CustomQuery, Parameter, FieldType, KeyType, QueryType
+from definition_stream import DefinitionReader
+from generators.generator_factory import GeneratorFactory
+from main import get_ddl
+from naming import Naming, Name
+
+# words that are all in dictionary.txt, so every synthetic name can be segmented
+entity_words = ["customer", "account", "invoice", "order", "product", "address", "payment", "employee", "warehouse",
+                "shipment", "contract", "project", "user", "group", "role", "permission", "document", "note",
+                "comment", "message", "event", "schedule", "vendor", "branch", "department", "location", "inventory",
+                "item", "batch", "refund", "discount", "coupon", "campaign", "session", "report", "audit"]
+attribute_words = ["code", "name", "email", "phone", "city", "country", "description", "amount", "balance",
+                   "quantity", "price", "total", "value", "number", "date", "created", "updated", "reference", "active"]
+lookup_tables = ["status", "category", "region", "currency", "priority"]
+field_types = [(FieldType.Integer, 4, 0), (FieldType.String, 255, 0), (FieldType.Float, 8, 0),
+               (FieldType.Decimal, 10, 2), (FieldType.Datetime, 0, 0), (FieldType.Boolean, 1, 0)]
+
+
+def make_name(raw: str) -> Name:
+    name = Name(raw)
+    name.words = raw.split("_")
+    return name
+
+
+def make_table(raw: str) -> Table:
+    table = Table(make_name(raw))
+    table.fields.append(Field(make_name("id"), FieldType.Integer, 4, auto_increment=True, required=True))
+    table.pk = Key(make_name(f"pk_{raw}"), KeyType.PrimaryKey)
+    table.pk.fields.append("id")
+    return table
+
+
+def add_reference(table: Table, primary_table: Table, key_type: KeyType, prefix: str):
+    field_name = f"{primary_table.name.raw()}_id"
+    table.fields.append(Field(make_name(field_name), FieldType.Integer, 4, required=True))
+    key = Key(make_name(f"{prefix}_{table.name.raw()}_{primary_table.name.raw()}"), key_type,
+              primary_table.name.raw())
+    key.fields.append(field_name)
+    key.primary_fields = ["id"]
+    key.referenced_table = table.name.raw()
+    table.keys.append(key)
+
+
+def build_schema(table_count: int, seed: int) -> Database:
+    """ Synthetic schema with dictionary friendly names - a few lookup tables, and tables whose foreign keys favour
+    the earlier tables, so some become hubs with a large fan-out, the way real schemas grow """
+    generator = random.Random(seed)
+    database = Database(make_name("synthetic"))
+    for raw in lookup_tables[:table_count]:
+        table = make_table(raw)
+        table.fields.append(Field(make_name("name"), FieldType.String, 50, required=True))
+        database.tables.append(table)
+    entity_start = len(database.tables)
+
+    used = set(lookup_tables)
+    while len(database.tables) < table_count:
+        raw = "_".join(generator.sample(entity_words, 2 if generator.random() < 0.5 else 3))
+        if raw in used:
+            continue
+        used.add(raw)
+        table = make_table(raw)
+
+        for attribute in generator.sample(attribute_words, generator.randint(4, 12)):
+            field_type, size, scale = generator.choice(field_types)
+            table.fields.append(Field(make_name(attribute), field_type, size, scale,
+                                      required=generator.random() < 0.5))
+
+        entity_count = len(database.tables) - entity_start
+        if entity_count > 0:
+            primary_tables = {database.tables[entity_start + int(entity_count * generator.random() ** 3)]
+                              for _ in range(generator.randint(0, 3))}
+            for primary_table in sorted(primary_tables, key=lambda t: t.name.raw()):
+                add_reference(table, primary_table, KeyType.ForeignKey, "fk")
+        for raw_lookup in generator.sample(lookup_tables[:entity_start], generator.randint(0, min(2, entity_start))):
+            add_reference(table, database.get_table(raw_lookup), KeyType.Lookup, "lookup")
+
+        for field in generator.sample(table.fields[1:], min(len(table.fields) - 1, generator.randint(0, 2))):
+            index = Key(make_name(f"ix_{raw}_{field.name.raw()}"), KeyType.Index)
+            index.fields.append(field.name.raw())
+            index.referenced_table = raw
+            table.keys.append(index)
+
+            custom_query = CustomQuery(make_name(f"get_by_{field.name.raw()}"))
+            custom_query.parameters.append(Parameter(make_name(field.name.raw()), field.type))
+            custom_query.query_type = QueryType.FetchAll
+            custom_query.query = f"select * from __table_name__ where {field.name.raw()} = ::{field.name.raw()}::"
+            table.custom_queries.append(custom_query)
+
+        database.tables.append(table)
+    return database
+
+
+def timed(results: Dict[str, float], stage: str, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    results[stage] = time.perf_counter() - start
+    return result
+
+
+def run_size(table_count: int, args) -> Dict[str, float]:
+    """ Seconds per stage for one schema size, keyed by stage (and db type for the adaptor dependent stages) """
+    results: Dict[str, float] = dict()
+    with tempfile.TemporaryDirectory() as folder:
+        definition_file = os.path.join(folder, "definition.json")
+        Adaptor.generate_schema_definition(build_schema(table_count, args.seed), definition_file)
+
+        def load_dictionary() -> Naming:
+            naming = Naming(args.dictionary, args.big_dictionary)
+            return naming if naming.automaton is not None else None
+
+        def load_definition() -> Database:
+            with DefinitionReader(definition_file, naming) as reader:
+                tables = list(reader)
+                database = Database(reader.name)
+            database.tables = tables
+            return database
+
+        naming = timed(results, "dictionary_load", load_dictionary)
+        database = timed(results, "definition_load", load_definition)
+        timed(results, "foreign_keys", Adaptor._process_foreign_keys, database)
+        timed(results, "table_order", Adaptor.get_table_order, database)
+
+        generator = GeneratorFactory.get_generator(args.language, naming)
+        for db_type in args.db_types:
+            adaptor = AdaptorFactory.get_adaptor_for_dbtype(db_type, naming)
+            output_folder = os.path.join(folder, db_type)
+            timed(results, f"{db_type}/entities", generator.generate_entities, database,
+                  os.path.join(output_folder, "entities"), adaptor, naming)
+            timed(results, f"{db_type}/repositories", generator.generate_repositories, database,
+                  os.path.join(output_folder, "repositories"), adaptor, naming)
+            timed(results, f"{db_type}/ddl", get_ddl, database, adaptor)
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float, min_seconds: float) -> List[str]:
+    """ Stages that are slower than the baseline by more than the threshold - stages too short to time reliably
+    are only reported once they slow down by more than min_seconds """
+    regressions: List[str] = []
+    for key, seconds in results.items():
+        base_seconds = baseline.get(key)
+        if base_seconds is None:
+            continue
+        if seconds > base_seconds * (1 + threshold) and seconds - base_seconds > min_seconds:
+            regressions.append(f"{key}: {base_seconds:.3f}s -> {seconds:.3f}s "
+                               f"(+{(seconds / base_seconds - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each stage of generation over synthetic schemas - run it from "
+                                                 "the repository root with python -m benchmarks.generator_benchmark")
+    parser.add_argument("--sizes", dest="sizes", type=str, default="10,1000,10000", required=False,
+                        help="Comma separated table counts")
+    parser.add_argument("--db-types", dest="db_types", type=str, default="sqlite,mysql,pgsql", required=False)
+    parser.add_argument("--language", dest="language", type=str, default="python", required=False)
+    parser.add_argument("--dictionary", dest="dictionary", type=str, default="dictionary.txt", required=False)
+    parser.add_argument("--big-dictionary", dest="big_dictionary", type=str, default="bigworddictionary.txt",
+                        required=False)
+    parser.add_argument("--seed", dest="seed", type=int, default=1, required=False)
+    parser.add_argument("--repeat", dest="repeat", type=int, default=1, required=False,
+                        help="Runs per size - the fastest time of each stage is kept")
+    parser.add_argument("--output", dest="output", type=str, default="not_set", required=False,
+                        help="Json file the results are written to")
+    parser.add_argument("--baseline", dest="baseline", type=str, default="not_set", required=False,
+                        help="Json results of an earlier run - exits with 1 when a stage regressed")
+    parser.add_argument("--threshold", dest="threshold", type=float, default=0.2, required=False,
+                        help="Fraction a stage may be slower than the baseline")
+    parser.add_argument("--min-seconds", dest="min_seconds", type=float, default=0.01, required=False,
+                        help="Slowdowns smaller than this are never regressions")
+    args = parser.parse_args()
+    args.db_types = [db_type for db_type in args.db_types.split(",") if db_type != ""]
+
+    results: Dict[str, float] = dict()
+    for table_count in [int(size) for size in args.sizes.split(",") if size != ""]:
+        for _ in range(args.repeat):
+            for stage, seconds in run_size(table_count, args).items():
+                key = f"{table_count}/{stage}"
+                results[key] = min(seconds, results.get(key, seconds))
+        for key in [key for key in results if key.startswith(f"{table_count}/")]:
+            print(f"{key:<40} {results[key]:10.3f}s")
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "results": results
+    }
+    if args.output != "not_set":
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent="\t")
+
+    if args.baseline != "not_set":
+        with open(args.baseline, 'r') as input_file:
+            baseline = json.load(input_file)["results"]
+        regressions = compare(results, baseline, args.threshold, args.min_seconds)
+        for regression in regressions:
+            print(f"regression {regression}")
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
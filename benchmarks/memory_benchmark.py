@@ -0,0 +1,73 @@
+# run from the repository root: python -m benchmarks.memory_benchmark
+import argparse
+import tracemalloc
+
+from database_objects import Database, Table, Field, Key, FieldType, KeyType
+from naming import Name
+
+
+names = dict()
+
+
+def make_name(*words: str) -> Name:
+    """ Shared per raw name, the way Naming hands them out """
+    raw = "_".join(words)
+    name = names.get(raw)
+    if name is None:
+        name = Name(raw)
+        name.words = list(words)
+        names[raw] = name
+    return name
+
+
+def build_schema(table_count: int, field_count: int, index_count: int) -> Database:
+    """ Synthetic schema - every table has an id, a foreign key to the previous table, and a few indexes """
+    database = Database(make_name("synthetic"))
+    for t in range(table_count):
+        table = Table(make_name("table", str(t)))
+        table.fields.append(Field(make_name("id"), FieldType.Integer, 4, auto_increment=True, required=True))
+        for f in range(field_count - 1):
+            table.fields.append(Field(make_name("field", str(f)), FieldType.String, 255))
+
+        table.pk = Key(make_name("pk", "table", str(t)), KeyType.PrimaryKey)
+        table.pk.fields.append("id")
+        for i in range(index_count):
+            index = Key(make_name("ix", "table", str(t), str(i)), KeyType.Index)
+            index.fields.append(f"field_{i}")
+            index.referenced_table = table.name.raw()
+            table.keys.append(index)
+
+        if t > 0:
+            fk = Key(make_name("fk", "table", str(t)), KeyType.ForeignKey, f"table_{t - 1}")
+            fk.fields.append("field_0")
+            fk.primary_fields = ["id"]
+            fk.referenced_table = table.name.raw()
+            table.keys.append(fk)
+            database.tables[-1].foreign_keys.append(fk)
+
+        database.tables.append(table)
+    return database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory used by the schema object model - run it from the "
+                                                 "repository root with python -m benchmarks.memory_benchmark")
+    parser.add_argument("--tables", dest="tables", type=int, default=1000, required=False)
+    parser.add_argument("--fields", dest="fields", type=int, default=20, required=False)
+    parser.add_argument("--indexes", dest="indexes", type=int, default=3, required=False)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    database = build_schema(args.tables, args.fields, args.indexes)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    fields = sum(len(table.fields) for table in database.tables)
+    keys = sum(len(table.keys) + 1 for table in database.tables)
+    print(f"{len(database.tables)} tables, {fields} fields, {keys} keys")
+    print(f"model: {current / 1024 / 1024:.2f} MiB ({current / fields:.0f} bytes per field), "
+          f"peak {peak / 1024 / 1024:.2f} MiB")
+
+
+if __name__ == '__main__':
+    main()
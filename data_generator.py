@@ -0,0 +1,345 @@
+import gc
+import multiprocessing
+import random
+import string
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Set, Tuple, Union
+
+from adaptors.adaptor import Adaptor
+from database_objects import Database, Table, Field, FieldType, Key, KeyType, DataException
+from phases import phases
+
+# dates are counted in seconds from here
+start_date = datetime(2000, 1, 1)
+# random values are drawn from a pool per field, which is far cheaper than making every value
+_pool_size = 1024
+_date_range = 10 * 365 * 24 * 3600
+_letters = string.ascii_lowercase
+
+
+class ReferencePlan(object):
+    """ Which row of the primary table each row of a foreign key or lookup points at - a random one, or with a
+    stride every combination in turn, for unique keys made only of references """
+
+    def __init__(self, key: Key, primary_table: Table, primary_rows: int):
+        self.key = key
+        self.primary_table = primary_table
+        self.primary_rows = primary_rows
+        self.stride = 0
+        self.self_reference = False
+        # a key of a cycle whose primary rows aren't there yet, or of a table that gets no rows, left null
+        self.null = False
+
+
+class TablePlan(object):
+    """ How the rows of a table are made - keyed fields are a function of the row number, so they are unique and any
+    other table can work out their value in a row, reference fields take the keyed values of a row of the primary
+    table, and the rest are drawn from random values """
+
+    def __init__(self, table: Table, rows: int):
+        self.table = table
+        self.rows = rows
+        self.references: List[ReferencePlan] = []
+        # lower case field name to the index of its reference and the primary field
+        self.field_references: Dict[str, Tuple[int, Field]] = dict()
+        self.keyed: Set[str] = set()
+        # tables that have to be filled first
+        self.dependencies: Set[str] = set()
+
+
+class DataGenerator(object):
+    """ Fills the tables of a definition with synthetic rows, streamed into the database in batches - the same seed,
+    row counts and definition always give the same rows """
+
+    def __init__(self, database: Database, adaptor: Adaptor, rows: int, lookup_rows: int, seed: int = 1,
+                 batch_size: int = 10000):
+        self.database = database
+        self.adaptor = adaptor
+        self.seed = seed
+        self.batch_size = batch_size
+        # lookups have to be filled first too, so they order the tables as well as foreign keys
+        order = adaptor.get_table_order(database, (KeyType.ForeignKey, KeyType.Lookup))
+        self.tables = order.get_tables()
+        self.deferred_keys = {id(key) for key in order.deferred_keys}
+        self.plans = self.get_plans(rows, lookup_rows)
+
+    def get_plans(self, rows: int, lookup_rows: int) -> Dict[str, TablePlan]:
+        names = [table.name.raw() for table in self.tables]
+
+        # tables only ever looked up get lookup_rows, and the fields other tables point at must be keyed
+        foreign_tables: Set[str] = set()
+        lookup_tables: Set[str] = set()
+        referenced: Set[Tuple[str, str]] = set()
+        for table in self.tables:
+            for key in table.get_keys(KeyType.ForeignKey) + table.get_keys(KeyType.Lookup):
+                primary_table = self.database.get_table(key.primary_table)
+                if primary_table is None:
+                    raise DataException(f"Key {key.name.raw()} references unknown table {key.primary_table}")
+                (foreign_tables if key.key_type == KeyType.ForeignKey else lookup_tables).add(key.primary_table)
+                referenced.update((key.primary_table, field.lower()) for field in self.get_primary_fields(key))
+
+        row_counts = {name: lookup_rows if name in lookup_tables and name not in foreign_tables else rows
+                      for name in names}
+        plans: Dict[str, TablePlan] = dict()
+        for table in self.tables:
+            name = table.name.raw()
+            plan = TablePlan(table, row_counts[name])
+            plans[name] = plan
+
+            for key in table.get_keys(KeyType.ForeignKey) + table.get_keys(KeyType.Lookup):
+                primary_table = self.database.get_table(key.primary_table)
+                primary_fields = self.get_primary_fields(key)
+                if len(primary_fields) != len(key.fields):
+                    raise DataException(f"Key {key.name.raw()} of {name} doesn't match the key of "
+                                        f"{key.primary_table}")
+                reference = ReferencePlan(key, primary_table, row_counts[key.primary_table])
+                reference.self_reference = primary_table is table
+                required = any(table.find_field(field).required for field in key.fields)
+                if reference.primary_rows == 0:
+                    if required:
+                        raise DataException(f"Key {key.name.raw()} of {name} references {key.primary_table}, "
+                                            f"which gets no rows")
+                    reference.null = True
+                elif id(key) in self.deferred_keys:
+                    # the key closes a cycle, so its primary table is filled later
+                    if required:
+                        raise DataException(f"Key {key.name.raw()} of {name} closes a cycle with "
+                                            f"{key.primary_table} and is required, so {name} can't be filled first")
+                    reference.null = True
+                elif not reference.self_reference:
+                    plan.dependencies.add(key.primary_table)
+
+                for field_name, primary_field_name in zip(key.fields, primary_fields):
+                    if field_name.lower() not in plan.field_references:
+                        plan.field_references[field_name.lower()] = (len(plan.references),
+                                                                     primary_table.find_field(primary_field_name))
+                plan.references.append(reference)
+
+            self.plan_unique_keys(plan)
+            for field in table.fields:
+                if (name, field.name.raw().lower()) in referenced and \
+                        field.name.raw().lower() not in plan.field_references:
+                    plan.keyed.add(field.name.raw().lower())
+            for field in table.fields:
+                if field.name.raw().lower() in plan.keyed and self.get_capacity(field) < plan.rows:
+                    raise DataException(f"Field {field.name.raw()} of {name} can't hold {plan.rows} distinct values")
+        return plans
+
+    def get_primary_fields(self, key: Key) -> List[str]:
+        # lookups may leave the primary fields out, and point at the primary key
+        if len(key.primary_fields) > 0:
+            return key.primary_fields
+        primary_table = self.database.get_table(key.primary_table)
+        return [] if primary_table.pk is None else primary_table.pk.fields
+
+    @staticmethod
+    def plan_unique_keys(plan: TablePlan):
+        """ Every row of a unique key differs in a keyed field, or, when the key is only references, in the
+        combination of primary rows """
+        table = plan.table
+        for key in ([table.pk] if table.pk is not None else []) + table.get_keys(KeyType.Unique):
+            own_fields = [field.lower() for field in key.fields if field.lower() not in plan.field_references]
+            if len(own_fields) > 0:
+                plan.keyed.add(own_fields[0])
+                continue
+
+            combinations = 1
+            for index in sorted({plan.field_references[field.lower()][0] for field in key.fields}):
+                reference = plan.references[index]
+                if reference.stride == 0 and not reference.self_reference:
+                    reference.stride = combinations
+                combinations *= reference.primary_rows
+            if combinations < plan.rows:
+                raise DataException(f"Unique key {key.name.raw()} of {table.name.raw()} can only hold "
+                                    f"{combinations} rows")
+
+    @staticmethod
+    def get_capacity(field: Field) -> int:
+        """ The number of distinct keyed values the field can hold """
+        if field.type == FieldType.Integer and 0 < field.size <= 8:
+            return 2 ** (8 * field.size - 1) - 1
+        if field.type == FieldType.String and field.size > 0:
+            return 10 ** field.size - 1
+        if field.type == FieldType.Decimal and field.size > 0:
+            return 10 ** max(field.size - field.scale, 0) - 1
+        if field.type == FieldType.Boolean:
+            return 2
+        return sys.maxsize
+
+    def remap(self, field: Field, values: List[Any]) -> List[Any]:
+        must_remap, to_type = self.adaptor.must_remap_field(field.type)
+        if not must_remap:
+            return values
+        if field.type == FieldType.Datetime and to_type == FieldType.Float:
+            return [None if value is None else value.timestamp() for value in values]
+        if field.type == FieldType.Boolean and to_type == FieldType.Integer:
+            return [None if value is None else int(value) for value in values]
+        raise DataException(f"Can't remap {field.type} to {to_type}")
+
+    def get_key_values(self, field: Field, rows: Sequence[int]) -> List[Any]:
+        """ The values of a keyed field in the rows, numbered from 1 """
+        if field.type == FieldType.Integer:
+            return list(rows)
+        if field.type == FieldType.String:
+            return list(map(str, rows))
+        if field.type == FieldType.Float or field.type == FieldType.Decimal:
+            return list(map(float, rows))
+        if field.type == FieldType.Datetime:
+            return self.remap(field, [start_date + timedelta(seconds=row) for row in rows])
+        if field.type == FieldType.Boolean:
+            return self.remap(field, [row % 2 == 1 for row in rows])
+        raise DataException(f"Field {field.name.raw()} has no type to generate values for")
+
+    def get_random_values(self, field: Field, rng: random.Random) -> List[Any]:
+        """ The pool a field's random values are drawn from - about one in ten is null when the field isn't
+        required """
+        if field.type == FieldType.String:
+            longest = min(field.size, 24) if field.size > 0 else 24
+            values = ["".join(rng.choices(_letters, k=rng.randint(min(longest, 4), longest)))
+                      for _ in range(_pool_size)]
+        elif field.type == FieldType.Integer:
+            highest = min(self.get_capacity(field), 1000000)
+            values = [rng.randint(0, highest) for _ in range(_pool_size)]
+        elif field.type == FieldType.Float:
+            values = [round(rng.uniform(0, 10000), 4) for _ in range(_pool_size)]
+        elif field.type == FieldType.Decimal:
+            digits = min(field.size - field.scale, 9) if field.size > 0 else 6
+            highest = 10 ** max(digits, 0) - 10 ** -field.scale
+            values = [round(rng.uniform(0, highest), field.scale) for _ in range(_pool_size)]
+        elif field.type == FieldType.Datetime:
+            values = [start_date + timedelta(seconds=rng.randrange(_date_range)) for _ in range(_pool_size)]
+        elif field.type == FieldType.Boolean:
+            values = [rng.random() < 0.5 for _ in range(_pool_size)]
+        else:
+            raise DataException(f"Field {field.name.raw()} has no type to generate values for")
+
+        values = self.remap(field, values)
+        if not field.required:
+            values.extend([None] * (_pool_size // 9))
+        return values
+
+    def get_rng(self, table: Table, name: str) -> random.Random:
+        # every field and reference has its own generator, so values don't depend on the batch size
+        return random.Random(f"{self.seed}:{table.name.raw()}:{name}")
+
+    def get_picker(self, plan: TablePlan, reference: ReferencePlan) -> Callable[[range], List[Any]]:
+        if reference.null:
+            return lambda rows: [None] * len(rows)
+        primary_rows = reference.primary_rows
+        if reference.stride > 0:
+            stride = reference.stride
+            return lambda rows: [(row - 1) // stride % primary_rows + 1 for row in rows]
+
+        rng = self.get_rng(plan.table, reference.key.name.raw())
+        if reference.self_reference:
+            # only rows inserted before, or the row itself
+            return lambda rows: [int(rng.random() * row) + 1 for row in rows]
+        population = range(1, primary_rows + 1)
+        return lambda rows: rng.choices(population, k=len(rows))
+
+    def get_column(self, plan: TablePlan, field: Field) -> Callable[[range, List[List[Any]]], List[Any]]:
+        name = field.name.raw().lower()
+        if name in plan.field_references:
+            index, primary_field = plan.field_references[name]
+            if plan.references[index].null:
+                return lambda rows, picks: picks[index]
+            return lambda rows, picks: self.get_key_values(primary_field, picks[index])
+        if name in plan.keyed:
+            return lambda rows, picks: self.get_key_values(field, rows)
+
+        rng = self.get_rng(plan.table, field.name.raw())
+        pool = self.get_random_values(field, rng)
+        return lambda rows, picks: rng.choices(pool, k=len(rows))
+
+    def generate_rows(self, table_name: str) -> Iterator[List[tuple]]:
+        """ The rows of a table, a batch at a time - each row is a tuple of every field in table order """
+        plan = self.plans[table_name]
+        pickers = [self.get_picker(plan, reference) for reference in plan.references]
+        columns = [self.get_column(plan, field) for field in plan.table.fields]
+        for first in range(1, plan.rows + 1, self.batch_size):
+            rows = range(first, min(first + self.batch_size, plan.rows + 1))
+            picks = [picker(rows) for picker in pickers]
+            yield list(zip(*[column(rows, picks) for column in columns]))
+
+    def fill_table(self, table_name: str) -> Tuple[str, int, float]:
+        """ Streams the rows of a table into the database, committing each batch - returns the table name, the
+        number of rows and the seconds it took """
+        start = time.perf_counter()
+        plan = self.plans[table_name]
+        connection = self.adaptor.connect()
+        try:
+            self.adaptor.prepare_bulk_load(connection)
+            for rows in self.generate_rows(table_name):
+                self.adaptor.insert_rows(connection, plan.table, rows)
+                connection.commit()
+            self.adaptor.finish_table_load(connection, plan.table)
+            connection.commit()
+        finally:
+            connection.close()
+        return table_name, plan.rows, time.perf_counter() - start
+
+    def check_empty(self):
+        """ The keyed values of every table start at 1, so rows already there would clash with them """
+        connection = self.adaptor.connect()
+        try:
+            for table in self.tables:
+                if self.adaptor.count_rows(connection, table) > 0:
+                    raise DataException(f"{table.name.raw()} already has rows - only empty tables can be filled")
+        finally:
+            connection.close()
+
+    def fill_tables(self, jobs: int = 1) -> List[Tuple[str, int, float]]:
+        """ Fills every table after the tables it references - with jobs > 1 the tables that don't depend on each
+        other are filled side by side, each by its own forked worker process. The tables have to be empty """
+        names = [table.name.raw() for table in self.tables]
+        self.check_empty()
+        state = self.adaptor.begin_bulk_load()
+        try:
+            if jobs <= 1 or len(names) < 2 or "fork" not in multiprocessing.get_all_start_methods():
+                results: List[Tuple[str, int, float]] = []
+                for name in names:
+                    with phases.phase("fill_table", name):
+                        results.append(self.fill_table(name))
+                return results
+            return self.fill_tables_in_pool(names, jobs)
+        finally:
+            self.adaptor.end_bulk_load(state)
+
+    def fill_tables_in_pool(self, names: List[str], jobs: int) -> List[Tuple[str, int, float]]:
+        # forked workers share the plans copy-on-write, spawned ones would have to pickle the adaptor and its naming
+        context = multiprocessing.get_context("fork")
+        filled: Dict[str, Tuple[str, int, float]] = dict()
+        waiting = list(names)
+        gc.freeze()
+        try:
+            with phases.phase("fill_tables", f"{len(names)} tables, {jobs} jobs"), \
+                    ProcessPoolExecutor(jobs, mp_context=context, initializer=_init_worker,
+                                        initargs=(self,)) as executor:
+                running: Dict[Future, str] = dict()
+                while len(waiting) > 0 or len(running) > 0:
+                    ready = [name for name in waiting if self.plans[name].dependencies.issubset(filled)]
+                    for name in ready:
+                        waiting.remove(name)
+                        running[executor.submit(_fill_table, name)] = name
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        filled[running.pop(future)] = future.result()
+        finally:
+            gc.unfreeze()
+        return [filled[name] for name in names]
+
+
+# process pool workers for DataGenerator.fill_tables
+_worker_state: Union[DataGenerator, None] = None
+
+
+def _init_worker(data_generator: DataGenerator):
+    global _worker_state
+    _worker_state = data_generator
+
+
+def _fill_table(table_name: str) -> Tuple[str, int, float]:
+    return _worker_state.fill_table(table_name)
@@ -1,8 +1,9 @@
 from enum import Enum
-from typing import Any, Union, List
+from typing import Any, Union, List, Dict, Callable
 
 from naming import Name
 from serializer import serializer_instance, Serializer
+from type_registry import type_registry
 
 
 class DataException(Exception):
@@ -13,6 +14,37 @@ class DatatypeException(DataException):
     pass
 
 
+class ListIndex(object):
+    """ Groups the items of a list by key - items appended to the list are indexed on the next lookup, and the index
+    is rebuilt if the list is replaced or shrinks """
+    __slots__ = ("_key", "_items", "_count", "_index")
+
+    def __init__(self, key: Callable[[Any], Any]):
+        self._key = key
+        self._items: Union[List, None] = None
+        self._count = 0
+        self._index: Union[Dict[Any, List], None] = None
+
+    def get(self, items: List, value) -> List:
+        if items is not self._items or len(items) < self._count:
+            self._items = items
+            self._count = 0
+            self._index = dict()
+
+        key = self._key
+        index = self._index
+        for i in range(self._count, len(items)):
+            item = items[i]
+            item_key = key(item)
+            if item_key in index:
+                index[item_key].append(item)
+            else:
+                index[item_key] = [item]
+        self._count = len(items)
+
+        return index.get(value, [])
+
+
 class FieldType:
     pass
 
@@ -30,59 +62,58 @@ class FieldType(Enum):
 
     @classmethod
     def get_fieldtype(cls, value: str) -> FieldType:
-        value = value.lower()
-        if value == "integer" or value == "int" or value == "bigint" or value == "tinyint":
-            return FieldType.Integer
-        elif value == "string" or value == "varchar" or value == "char" or value == "text":
-            return FieldType.String
-        elif value == "float" or value == "real":
-            return FieldType.Float
-        elif value == "datetime" or value == "date":
-            return FieldType.Datetime
-        elif value == "boolean" or value == "bool":
-            return FieldType.Boolean
-        elif value == "decimal" or value == "money":
-            return FieldType.Decimal
-        elif value == "__item__":
-            return FieldType.Item
-        elif value == "[__item__]":
-            return FieldType.ListOfItem
-        elif value == "none":
-            return FieldType.Undefined
-        else:
-            raise DatatypeException(f"Unknown field type {value}")
+        result = field_types.parse(value)
+        if result is None:
+            raise DatatypeException(f"Unknown field type {value.lower()}")
+        return result[0]
 
     def __str__(self):
-        if self == FieldType.Integer:
-            return "Integer"
-        elif self == FieldType.String:
-            return "String"
-        elif self == FieldType.Float:
-            return "Float"
-        elif self == FieldType.Datetime:
-            return "Datetime"
-        elif self == FieldType.Boolean:
-            return "Boolean"
-        elif self == FieldType.Decimal:
-            return "Decimal"
-        elif self == FieldType.Item:
-            return "__Item__"
-        elif self == FieldType.ListOfItem:
-            return "[__Item__]"
-        elif self == FieldType.Undefined:
-            return "None"
-        else:
+        result = field_types.render(self)
+        if result is None:
             raise DatatypeException("Unknown field type ")
+        return result
 
     def map_to_dict(self, serializer: Serializer) -> str:
         return str(self)
 
 
+# field types as written in definition files
+field_types = type_registry.register_dialect(
+    "definition",
+    parse={
+        "integer": (FieldType.Integer, None), "int": (FieldType.Integer, None),
+        "bigint": (FieldType.Integer, None), "tinyint": (FieldType.Integer, None),
+        "string": (FieldType.String, None), "varchar": (FieldType.String, None), "char": (FieldType.String, None),
+        "text": (FieldType.String, None),
+        "float": (FieldType.Float, None), "real": (FieldType.Float, None),
+        "datetime": (FieldType.Datetime, None), "date": (FieldType.Datetime, None),
+        "boolean": (FieldType.Boolean, None), "bool": (FieldType.Boolean, None),
+        "decimal": (FieldType.Decimal, None), "money": (FieldType.Decimal, None),
+        "__item__": (FieldType.Item, None),
+        "[__item__]": (FieldType.ListOfItem, None),
+        "none": (FieldType.Undefined, None)
+    },
+    render={
+        (FieldType.Integer, None): "Integer",
+        (FieldType.String, None): "String",
+        (FieldType.Float, None): "Float",
+        (FieldType.Datetime, None): "Datetime",
+        (FieldType.Boolean, None): "Boolean",
+        (FieldType.Decimal, None): "Decimal",
+        (FieldType.Item, None): "__Item__",
+        (FieldType.ListOfItem, None): "[__Item__]",
+        (FieldType.Undefined, None): "None"
+    })
+
+serializer_instance.register_parser(FieldType, lambda value, extra: FieldType.get_fieldtype(value))
+
+
 class Field(object):
     pass
 
 
 class Field(object):
+    __slots__ = ("name", "type", "size", "scale", "auto_increment", "default", "required")
     name: Name
     type: FieldType
     size: int
@@ -132,37 +163,39 @@ class KeyType(Enum):
 
     @classmethod
     def get_keytype(cls, value: str) -> KeyType:
-        value = value.lower()
-        if value == "undefined":
-            return KeyType.Undefined
-        elif value == "primarykey" or value == "primary key":
-            return KeyType.PrimaryKey
-        elif value == "index":
-            return KeyType.Index
-        elif value == "unique":
-            return KeyType.Unique
-        elif value == "foreignkey" or value == "foreign key":
-            return KeyType.ForeignKey
-        elif value == "lookup":
-            return KeyType.Lookup
-        else:
-            raise DatatypeException(f"Unknown key type {value}")
+        result = key_types.parse(value)
+        if result is None:
+            raise DatatypeException(f"Unknown key type {value.lower()}")
+        return result[0]
 
     def __str__(self):
-        if self == KeyType.Undefined:
-            return "Undefined"
-        elif self == KeyType.PrimaryKey:
-            return "PrimaryKey"
-        elif self == KeyType.Index:
-            return "Index"
-        elif self == KeyType.Unique:
-            return "Unique"
-        elif self == KeyType.ForeignKey:
-            return "ForeignKey"
-        elif self == KeyType.Lookup:
-            return "Lookup"
-        else:
+        result = key_types.render(self)
+        if result is None:
             raise DatatypeException("Unknown key type ")
+        return result
+
+
+# key types as written in definition files and reported by the database catalogs
+key_types = type_registry.register_dialect(
+    "key",
+    parse={
+        "undefined": (KeyType.Undefined, None),
+        "primarykey": (KeyType.PrimaryKey, None), "primary key": (KeyType.PrimaryKey, None),
+        "index": (KeyType.Index, None),
+        "unique": (KeyType.Unique, None),
+        "foreignkey": (KeyType.ForeignKey, None), "foreign key": (KeyType.ForeignKey, None),
+        "lookup": (KeyType.Lookup, None)
+    },
+    render={
+        (KeyType.Undefined, None): "Undefined",
+        (KeyType.PrimaryKey, None): "PrimaryKey",
+        (KeyType.Index, None): "Index",
+        (KeyType.Unique, None): "Unique",
+        (KeyType.ForeignKey, None): "ForeignKey",
+        (KeyType.Lookup, None): "Lookup"
+    })
+
+serializer_instance.register_parser(KeyType, lambda value, extra: KeyType.get_keytype(value))
 
 
 class Table(object):
@@ -174,6 +207,7 @@ class Key(object):
 
 
 class Key(object):
+    __slots__ = ("name", "fields", "primary_table", "primary_fields", "referenced_table", "key_type")
     name: Name
     fields: List[str]
     primary_table: str
@@ -185,6 +219,7 @@ class Key(object):
         self.name = name
         self.fields: List[str] = list()
         self.primary_table = primary_table
+        # only foreign keys and lookups have primary fields
         self.primary_fields: List[str] = list()
         self.key_type = key_type
         self.referenced_table = ""
@@ -197,7 +232,7 @@ class Key(object):
         self.name = naming.string_to_name(obj["name"])
         self.fields = serializer.map_to_object(obj["fields"], extra=naming)
         self.primary_table = "" if "primary_table" not in obj else str(obj["primary_table"])
-        self.primary_fields = "" if "primary_fields" not in obj else serializer.map_to_object(
+        self.primary_fields = list() if "primary_fields" not in obj else serializer.map_to_object(
             obj["primary_fields"], extra=naming)
         self.key_type = KeyType.get_keytype(obj["key_type"])
         self.referenced_table = "" if "referenced_table" not in obj else str(obj["referenced_table"])
@@ -243,6 +278,9 @@ class TransformType(Enum):
             raise DatatypeException(f"Unknown transform type {value}")
 
 
+serializer_instance.register_parser(TransformType, lambda value, extra: TransformType.get_transformtype(value))
+
+
 class QueryType:
     pass
 
@@ -271,7 +309,11 @@ class QueryType(Enum):
             raise DatatypeException("Unknown query type {}".format(value))
 
 
+serializer_instance.register_parser(QueryType, lambda value, extra: QueryType.get_querytype(value))
+
+
 class Parameter(object):
+    __slots__ = ("name", "type")
     name: Name
     type: FieldType
 
@@ -288,6 +330,7 @@ serializer_instance.register_class(Parameter)
 
 
 class CustomQuery(object):
+    __slots__ = ("name", "parameters", "return_type", "transform", "query_type", "query")
     name: Name
     parameters: List[Parameter]
     return_type: FieldType
@@ -318,7 +361,20 @@ class CustomQuery(object):
 serializer_instance.register_class(CustomQuery)
 
 
+def _lower_name(item) -> str:
+    return item.name.raw().lower()
+
+
+def _raw_name(item) -> str:
+    return item.name.raw()
+
+
+def _key_type(key) -> KeyType:
+    return key.key_type
+
+
 class Table(object):
+    __slots__ = ("name", "fields", "pk", "keys", "foreign_keys", "custom_queries", "_field_index", "_key_index")
     name: Name
     fields: List[Field]
     pk: Union[Key, None]
@@ -333,14 +389,20 @@ class Table(object):
         self.keys: List[Key] = list()
         self.foreign_keys: List[Key] = list()
         self.custom_queries: List[CustomQuery] = list()
+        self._field_index = ListIndex(_lower_name)
+        self._key_index = ListIndex(_key_type)
 
     def find_field(self, name: str) -> Field:
-        found_fields = [f for f in self.fields if f.name.raw().lower() == name.lower()]
+        found_fields = self._field_index.get(self.fields, name.lower())
         if len(found_fields) > 0:
             return found_fields[0]
         else:
             raise DataException("Could not find field")
 
+    def get_keys(self, key_type: KeyType) -> List[Key]:
+        """ Keys of one type, in definition order - the list is shared, so it must not be changed """
+        return self._key_index.get(self.keys, key_type)
+
     def __str__(self):
         return str(self.name)
 
@@ -370,19 +432,21 @@ class Database(object):
 
 
 class Database(object):
+    __slots__ = ("name", "tables", "_table_index")
     name: Name
     tables: List[Table]
 
     def __init__(self, name: Name = None):
         self.name = name
         self.tables: List[Table] = []
+        self._table_index = ListIndex(_raw_name)
 
     def map_to_object(self, obj, serializer, naming):
         self.name = naming.string_to_name(obj["name"])
         self.tables = serializer.map_to_object(obj["tables"], extra=naming)
 
     def get_table(self, table_name: str):
-        result = [table for table in self.tables if table.name.raw() == table_name]
+        result = self._table_index.get(self.tables, table_name)
         if len(result) > 0:
             return result[0]
         return None
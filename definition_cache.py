@@ -0,0 +1,68 @@
+import gc
+import os
+import pickle
+from typing import Union, Iterator
+
+from database_objects import Database
+from naming import Naming, Name
+
+
+class DefinitionCache(object):
+    """ Pickled, fully resolved Database kept next to its definition file - used while neither the definition nor the
+    dictionaries have changed """
+    __cache_version__ = 3
+
+    def __init__(self, definition_file: str, naming: Naming, cache_file: str = None):
+        self.cache_file = DefinitionCache.get_cache_filename(definition_file) if cache_file is None else cache_file
+        self.source_hash = Naming.hash_files([definition_file])
+        self.dictionary_hash = naming.dictionary_hash
+
+    @staticmethod
+    def get_cache_filename(definition_file: str) -> str:
+        return definition_file + ".cache"
+
+    def load(self) -> Union[Database, None]:
+        """ Returns the cached database, or None when there is no cache or it is stale """
+        if not os.path.exists(self.cache_file):
+            return None
+
+        try:
+            with open(self.cache_file, 'rb') as input_file:
+                # the header is a separate pickle, so a stale cache is rejected without loading the model
+                header = pickle.load(input_file)
+                if header != (DefinitionCache.__cache_version__, self.source_hash, self.dictionary_hash):
+                    return None
+                # nothing in the model being rebuilt is garbage, so collection passes while loading only cost time
+                gc_enabled = gc.isenabled()
+                gc.disable()
+                try:
+                    database = pickle.load(input_file)
+                finally:
+                    if gc_enabled:
+                        gc.enable()
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError, ValueError):
+            return None
+
+        return database if isinstance(database, Database) else None
+
+    def save(self, database: Database):
+        header = (DefinitionCache.__cache_version__, self.source_hash, self.dictionary_hash)
+        temp_file = self.cache_file + ".tmp"
+        with open(temp_file, 'wb') as output_file:
+            pickle.dump(header, output_file, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(database, output_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, self.cache_file)
+
+    @staticmethod
+    def get_names(database: Database) -> Iterator[Name]:
+        """ Every Name in the model, so Naming can be primed without segmenting them again """
+        yield database.name
+        for table in database.tables:
+            yield table.name
+            yield from (field.name for field in table.fields)
+            yield from (key.name for key in table.keys)
+            if table.pk is not None:
+                yield table.pk.name
+            for custom_query in table.custom_queries:
+                yield custom_query.name
+                yield from (parameter.name for parameter in custom_query.parameters)
@@ -0,0 +1,166 @@
+import json
+import os
+from typing import Iterator, List
+
+from database_objects import Table, DataException
+from naming import Naming, Name
+from phases import phases
+from serializer import serializer_instance
+
+
+def collect_table_names(obj) -> List[str]:
+    """ Every name in a serialized table that will be segmented while loading it or generating from it """
+    names: List[str] = [obj["name"]]
+    names.extend(field["name"] for field in obj.get("fields", []))
+    for key in obj.get("keys", []) + ([obj["pk"]] if obj.get("pk") else []):
+        names.append(key["name"])
+        names.extend(key.get("fields", []))
+        if key.get("primary_table"):
+            names.append(key["primary_table"])
+            names.extend(key.get("primary_fields", []))
+        if key.get("referenced_table"):
+            names.append(key["referenced_table"])
+    for custom_query in obj.get("custom_queries", []):
+        names.append(custom_query["name"])
+        names.extend(parameter["name"] for parameter in custom_query["parameters"])
+    return names
+
+
+class DefinitionReader(object):
+    """ Reads a definition file one table at a time - only the json of the current table is held in memory """
+    __chunk_size__ = 65536
+
+    def __init__(self, definition_file: str, naming: Naming):
+        self.naming = naming
+        self.name: Name = None
+        self._file = open(definition_file, 'r')
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def __iter__(self) -> Iterator[Table]:
+        """ Yields each table as it is decoded - name is set once its key has been read """
+        self._expect("{")
+        if self._peek() == "}":
+            self._position += 1
+            return
+
+        while True:
+            key = self._read_value()
+            self._expect(":")
+            if key == "tables":
+                yield from self._read_tables()
+            else:
+                value = self._read_value()
+                if key == "name":
+                    self.name = self.naming.string_to_name(value)
+            if self._expect(",}") == "}":
+                break
+
+    def _read_tables(self) -> Iterator[Table]:
+        self._expect("[")
+        if self._peek() == "]":
+            self._position += 1
+            return
+
+        while True:
+            with phases.phase("deserialization"):
+                obj = self._read_value()
+                self.naming.string_to_names(collect_table_names(obj))
+                table = serializer_instance.decode(obj, Table, self.naming)
+            yield table
+            if self._expect(",]") == "]":
+                break
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        # grow the read with the buffer so a large table is decoded in a few attempts, not one per chunk
+        chunk = self._file.read(max(DefinitionReader.__chunk_size__, len(self._buffer) - self._position))
+        if chunk == "":
+            self._eof = True
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in " \t\r\n":
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill():
+                raise DataException("Unexpected end of definition")
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if char not in chars:
+            raise DataException(f"Invalid definition - expected one of '{chars}' but found '{char}'")
+        self._position += 1
+        return char
+
+    def _read_value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+                # a value that runs to the end of the buffer may still be cut short (numbers, literals)
+                if end < len(self._buffer) or self._eof:
+                    self._position = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+
+class DefinitionWriter(object):
+    """ Writes a definition file one table at a time - byte for byte what Serializer.serialize(database, True) gives.
+    The tables go to a temporary file that only replaces the definition once it is complete, so a failure half way
+    leaves the definition as it was """
+
+    def __init__(self, definition_file: str, name: Name):
+        self.definition_file = definition_file
+        self._temp_file = definition_file + ".tmp"
+        self._file = open(self._temp_file, 'w')
+        self._count = 0
+        self._file.write(f"{{\n\t\"name\": {serializer_instance.serialize(name)},\n\t\"tables\": [")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write_table(self, table: Table):
+        with phases.phase("serialization", table.name.raw()):
+            text = serializer_instance.serialize(table, True)
+            self._file.write(("," if self._count > 0 else "") + "\n\t\t" + text.replace("\n", "\n\t\t"))
+        self._count += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.write("\n\t]\n}" if self._count > 0 else "]\n}")
+        self._file.close()
+        os.replace(self._temp_file, self.definition_file)
+
+    def abort(self):
+        """ Drops what was written, without touching the definition """
+        if self._file.closed:
+            return
+        self._file.close()
+        os.remove(self._temp_file)
@@ -0,0 +1,48 @@
+import os
+import time
+from typing import Dict, List, Tuple, Union
+
+
+class FileWatcher(object):
+    """ Polls files and folders for changes - a file counts as changed when its modification time or size differs,
+    a folder when any file below it does """
+    __poll_interval__ = 0.05
+
+    def __init__(self, paths: List[str]):
+        self.paths = paths
+        self._state = {path: FileWatcher.get_state(path) for path in paths}
+
+    @staticmethod
+    def get_state(path: str) -> Union[Dict[str, Tuple[int, int]], None]:
+        if not os.path.exists(path):
+            return None
+
+        files = [path]
+        if os.path.isdir(path):
+            files = [os.path.join(folder, filename) for folder, _, filenames in os.walk(path) for filename in filenames]
+
+        state: Dict[str, Tuple[int, int]] = dict()
+        for filename in files:
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            state[filename] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def get_changes(self) -> List[str]:
+        """ Watched paths that changed since the last call """
+        changes: List[str] = []
+        for path in self.paths:
+            state = FileWatcher.get_state(path)
+            if state != self._state[path]:
+                self._state[path] = state
+                changes.append(path)
+        return changes
+
+    def wait_for_changes(self) -> List[str]:
+        while True:
+            changes = self.get_changes()
+            if len(changes) > 0:
+                return changes
+            time.sleep(FileWatcher.__poll_interval__)
@@ -0,0 +1,48 @@
+import json
+import os
+from typing import Dict
+
+
+class GenerationManifest(object):
+    """ Hash of the inputs every table was last generated from, kept in the output folder so a later run only
+    regenerates the tables whose inputs changed. A change of settings (generator, adaptor, dictionaries) makes every
+    table stale """
+    __manifest_file__ = ".dalgen-manifest.json"
+    __manifest_version__ = 1
+
+    def __init__(self, output_folder: str, settings: str):
+        self.filename = os.path.join(output_folder, GenerationManifest.__manifest_file__)
+        self.settings = settings
+        self.tables: Dict[str, str] = dict()
+        self._previous: Dict[str, str] = dict()
+
+    def load(self):
+        if not os.path.exists(self.filename):
+            return
+
+        try:
+            with open(self.filename, 'r') as input_file:
+                obj = json.load(input_file)
+        except ValueError:
+            return
+
+        if obj.get("version") != GenerationManifest.__manifest_version__ or obj.get("settings") != self.settings:
+            return
+        self._previous = obj.get("tables", dict())
+
+    def is_current(self, table_name: str) -> bool:
+        """ True when the table's inputs are the same as in the last run """
+        table_hash = self.tables.get(table_name)
+        return table_hash is not None and self._previous.get(table_name) == table_hash
+
+    def save(self):
+        obj = {
+            "version": GenerationManifest.__manifest_version__,
+            "settings": self.settings,
+            "tables": self.tables
+        }
+        temp_file = self.filename + ".tmp"
+        with open(temp_file, 'w') as output_file:
+            json.dump(obj, output_file, indent="\t", sort_keys=True)
+        os.replace(temp_file, self.filename)
+        self._previous = dict(self.tables)
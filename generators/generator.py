@@ -1,13 +1,25 @@
+import gc
+import hashlib
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Union
 
 from adaptors.adaptor import Adaptor
 from database_objects import Database, Table, KeyType
+from generation_manifest import GenerationManifest
 from naming import Naming, Name
+from phases import phases
 from serializer import serializer_instance
-from source_writer import SourceWriter
+
+# the templates shipped with the generator, used unless a template folder is given
+default_template_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
 
 
 class Generator(object):
+    # bump when the generated code changes, so existing output is regenerated
+    __generator_version__ = 2
+
     def __init__(self, naming: Naming):
         self.naming = naming
 
@@ -15,32 +27,136 @@ class Generator(object):
         pass
 
     @staticmethod
-    def import_definition(definition_file: str, naming: Naming) -> Database:
-        return Adaptor.import_definition(definition_file, naming)
+    def import_definition(definition_file: str, naming: Naming, use_cache: bool = False) -> Database:
+        return Adaptor.import_definition(definition_file, naming, use_cache)
+
+    def load_templates(self, template_folder: str):
+        pass
+
+    def get_template_hash(self) -> str:
+        return ""
 
     def copy_templates(self, template_folder: str, output_folder: str):
         pass
 
-    def generate_entities(self, database: Database, folder: str, adaptor: Adaptor, naming: Naming):
+    @staticmethod
+    def get_table_hashes(database: Database) -> Dict[str, str]:
+        """ Hash of everything a table's generated code depends on - its own definition and the definitions of the
+        tables it references or is referenced by """
+        digests: Dict[str, str] = dict()
+        for table in database.tables:
+            text = serializer_instance.serialize(table)
+            digests[table.name.raw()] = hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+        result: Dict[str, str] = dict()
+        for table in database.tables:
+            neighbours = {key.primary_table for key in table.get_keys(KeyType.ForeignKey)}
+            neighbours.update(key.primary_table for key in table.get_keys(KeyType.Lookup))
+            neighbours.update(key.referenced_table for key in table.foreign_keys)
+            neighbours.discard(table.name.raw())
+
+            digest = hashlib.sha256(digests[table.name.raw()].encode("ascii"))
+            for neighbour in sorted(neighbours):
+                digest.update(f"\0{neighbour}\0{digests.get(neighbour, '')}".encode("utf-8"))
+            result[table.name.raw()] = digest.hexdigest()
+        return result
+
+    def get_manifest(self, database: Database, output_folder: str, adaptor: Adaptor,
+                     naming: Naming) -> GenerationManifest:
+        settings = f"{type(self).__name__}:{self.__generator_version__}:{type(adaptor).__name__}:" \
+                   f"{naming.dictionary_hash}:{self.get_template_hash()}"
+        manifest = GenerationManifest(output_folder, settings)
+        manifest.load()
+        manifest.tables = self.get_table_hashes(database)
+        return manifest
+
+    def get_changed_tables(self, database: Database, manifest: GenerationManifest, entity_folder: str,
+                           repository_folder: str) -> List[Table]:
+        """ Tables whose inputs changed since the manifest was saved, or whose output files are missing """
+        return [table for table in database.tables
+                if not manifest.is_current(table.name.raw()) or
+                not os.path.exists(os.path.join(entity_folder, self.get_filename(table.name))) or
+                not os.path.exists(os.path.join(repository_folder, self.get_filename(table.name, suffix="repository")))]
+
+    def generate_tables(self, database: Database, entity_folder: str, repository_folder: str, adaptor: Adaptor,
+                        naming: Naming, tables: List[Table] = None, jobs: int = 1):
+        """ Entities and repositories of the tables, spread over a process pool when jobs > 1 - each file only
+        depends on the model, so the output is the same either way. Without fork the tables are generated here, as
+        spawned workers would have to pickle the model and naming, and the names they segment would be lost """
+        tables = database.tables if tables is None else tables
+        if jobs <= 1 or len(tables) < 2 or "fork" not in multiprocessing.get_all_start_methods():
+            self.generate_entities(database, entity_folder, adaptor, naming, tables)
+            self.generate_repositories(database, repository_folder, adaptor, naming, tables)
+            return
+
+        for folder in (entity_folder, repository_folder):
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+        table_names = [table.name.raw() for table in tables]
+        chunk_size = -(-len(table_names) // (jobs * 4))
+        chunks = [table_names[i:i + chunk_size] for i in range(0, len(table_names), chunk_size)]
+
+        # forked workers share the loaded model and naming memo copy-on-write instead of re-parsing them - frozen
+        # objects are skipped by the workers' collections, which would otherwise copy the pages they touch
+        context = multiprocessing.get_context("fork")
+        # the phases of the tables happen in the workers, so only the pool as a whole is reported here
+        gc.freeze()
+        try:
+            with phases.phase("generate_tables", f"{len(tables)} tables, {jobs} jobs"), \
+                    ProcessPoolExecutor(jobs, mp_context=context, initializer=_init_worker,
+                                        initargs=(self, database, entity_folder, repository_folder, adaptor,
+                                                  naming)) as executor:
+                for _ in executor.map(_generate_tables, chunks):
+                    pass
+        finally:
+            gc.unfreeze()
+
+    def generate_entities(self, database: Database, folder: str, adaptor: Adaptor, naming: Naming,
+                          tables: List[Table] = None):
         if not os.path.exists(folder):
             os.makedirs(folder)
-        for table in database.tables:
-            self.generate_entity(table, database, os.path.join(folder, self.get_filename(table.name)),
-                                 adaptor, naming)
+        for table in database.tables if tables is None else tables:
+            with phases.phase("generate_entity", table.name.raw()):
+                self.generate_entity(table, database, os.path.join(folder, self.get_filename(table.name)),
+                                     adaptor, naming)
 
     def generate_entity(self, table: Table, database: Database, filename: str, adaptor: Adaptor, naming: Naming):
         pass
 
-    def generate_repositories(self, database: Database, folder: str, adaptor: Adaptor, naming: Naming):
+    def generate_repositories(self, database: Database, folder: str, adaptor: Adaptor, naming: Naming,
+                              tables: List[Table] = None):
         if not os.path.exists(folder):
             os.makedirs(folder)
-        for table in database.tables:
-            self.generate_repository(table, database,
-                                     os.path.join(folder, self.get_filename(table.name, suffix="repository")),
-                                     adaptor, naming)
+        for table in database.tables if tables is None else tables:
+            with phases.phase("generate_repository", table.name.raw()):
+                self.generate_repository(table, database,
+                                         os.path.join(folder, self.get_filename(table.name, suffix="repository")),
+                                         adaptor, naming)
 
     def generate_repository(self, table: Table, database: Database, filename: str, adaptor: Adaptor, naming: Naming):
         pass
 
-    def generate_mapper(self, table: Table, writer: SourceWriter, adaptor: Adaptor):
+    def generate_benchmark(self, database: Database, output_folder: str, adaptor: Adaptor, naming: Naming):
         pass
+
+
+# process pool workers for Generator.generate_tables - the state is handed over once per worker
+_worker_state: Union[tuple, None] = None
+
+
+def _init_worker(generator: Generator, database: Database, entity_folder: str, repository_folder: str,
+                 adaptor: Adaptor, naming: Naming):
+    global _worker_state
+    _worker_state = (generator, database, entity_folder, repository_folder, adaptor, naming)
+
+
+def _generate_tables(table_names: List[str]):
+    generator, database, entity_folder, repository_folder, adaptor, naming = _worker_state
+    for table_name in table_names:
+        table = database.get_table(table_name)
+        generator.generate_entity(table, database, os.path.join(entity_folder, generator.get_filename(table.name)),
+                                  adaptor, naming)
+        generator.generate_repository(table, database,
+                                      os.path.join(repository_folder,
+                                                   generator.get_filename(table.name, suffix="repository")),
+                                      adaptor, naming)
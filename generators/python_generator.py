@@ -1,31 +1,65 @@
 import glob
+import hashlib
+import json
 import os
-import shutil
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Tuple, Union
 
 from adaptors.adaptor import Adaptor
-from database_objects import Table, Field, FieldType, QueryType, KeyType, Database
-from generators.generator import Generator
+from database_objects import Table, Field, FieldType, QueryType, KeyType, Database, DataException
+from generators.generator import Generator, default_template_folder
 from naming import Naming, Name
 from source_writer import SourceWriter
+from template_engine import Template, load_template
+from type_registry import type_registry
+
+python_types = type_registry.register_dialect(
+    "python",
+    render={
+        (FieldType.String, None): "str",
+        (FieldType.Integer, None): "int",
+        (FieldType.Float, None): "float",
+        (FieldType.Decimal, None): "float",
+        (FieldType.Boolean, None): "bool",
+        (FieldType.Datetime, None): "datetime"
+    },
+    convert={
+        (FieldType.Boolean, FieldType.Integer): "TableBase.bool_to_int",
+        (FieldType.Integer, FieldType.Boolean): "TableBase.int_to_bool",
+        (FieldType.Datetime, FieldType.Float): "TableBase.datetime_to_float",
+        (FieldType.Float, FieldType.Datetime): "TableBase.float_to_datetime"
+    })
 
 
 class PythonGenerator(Generator):
     def __init__(self, naming: Naming):
         super().__init__(naming)
+        self.entity_template: Template = None
+        self.repository_template: Template = None
+        self.benchmark_template: Template = None
+        self.load_templates(default_template_folder)
 
     def get_filename(self, name: Name, prefix: str = "", suffix: str = "") -> str:
         return name.snake(prefix, suffix) + ".py"
 
-    def copy_templates(self, template_folder: str, output_folder: str):
+    def load_templates(self, template_folder: str):
         template_folder = os.path.join(template_folder, "python")
+        self.entity_template = load_template(os.path.join(template_folder, "entity.tpl"))
+        self.repository_template = load_template(os.path.join(template_folder, "repository.tpl"))
+        self.benchmark_template = load_template(os.path.join(template_folder, "benchmark.tpl"))
+
+    def get_template_hash(self) -> str:
+        return hashlib.sha256(f"{self.entity_template.hash}:{self.repository_template.hash}".encode("ascii")) \
+            .hexdigest()
+
+    def copy_templates(self, template_folder: str, output_folder: str):
+        """ The base runtime the entities and repositories import - written only when it changed """
         output_folder = os.path.join(output_folder, "base")
-        dir_path = os.path.join(template_folder, "*.txt")
-        for file in glob.glob(dir_path):
-            filename = Path(file).stem
-            new_filename = os.path.join(output_folder, filename + ".py")
-            shutil.copy(file, new_filename)
+        if not os.path.exists(output_folder):
+            os.makedirs(output_folder)
+        for file in sorted(glob.glob(os.path.join(template_folder, "python", "*.txt"))):
+            with SourceWriter(os.path.join(output_folder, Path(file).stem + ".py")) as writer:
+                writer.write(load_template(file).render({}))
 
     @staticmethod
     def read_custom_code(filename: str) -> List[str]:
@@ -46,65 +80,81 @@ class PythonGenerator(Generator):
         return custom_code
 
     def generate_entity(self, table: Table, database: Database, filename: str, adaptor: Adaptor, naming: Naming):
-        # find custom code
-        custom_code = PythonGenerator.read_custom_code(filename)
-
-        with SourceWriter(open(filename, 'w')) as writer:
-            writer.writeln("from datetime import datetime")
-            writer.writeln("from typing import List")
-            writer.writeln("from base.table_base import TableBase")
-            for key in table.foreign_keys:
-                ref_table = database.get_table(key.referenced_table)
-                writer.writeln(f"from entities.{ref_table.name.snake()} import {ref_table.name.pascal()}")
-
-            for key in [k for k in table.keys if k.key_type == KeyType.Lookup]:
-                ref_table = database.get_table(key.primary_table)
-                writer.writeln(f"from entities.{ref_table.name.snake()} import {ref_table.name.pascal()}")
-
-            writer.writeln()
-            writer.writeln()
-            writer.writeln(f"class {table.name.pascal()}(TableBase):")
-            writer.indent()
-            writer.writeln(f"__table_name__ = \"{table.name.raw()}\"")
-            writer.writeln(f"__drop_script__ = \"{adaptor.generate_drop_script(table)}\"")
-            writer.writeln(f"__create_script__ = \"{adaptor.generate_create_script(table)}\"")
-            writer.writeln(
-                f"__table_exists_script__ = \"{adaptor.generate_table_exists_script(table, database.name.raw())}\"")
-            writer.writeln(f"__table_count_script__ = \"{adaptor.generate_count_script(table)}\"")
-            writer.writeln(f"__insert_script__ = \"{adaptor.generate_insert_script(table)}\"")
-            writer.writeln(f"__update_script__ = \"{adaptor.generate_update_script(table)}\"")
-            writer.writeln(f"__delete_script__ = \"{adaptor.generate_delete_script(table)}\"")
-            writer.writeln(f"__fetch_by_id_script__ = \"{adaptor.generate_fetch_by_id_script(table)}\"")
-            writer.writeln(f"__item_exists_script__ = \"{adaptor.generate_item_exists_script(table)}\"")
-            writer.writeln()
-            self.generate_fields(table, database, writer, naming)
-            self.generate_init(table, writer, database, naming)
-            writer.writeln()
-            self.generate_mapper(table, writer, adaptor)
-            writer.writeln()
-            self.generate_get_params(table, writer, adaptor)
-            writer.unindent()
-            writer.writeln("# end-autogenerated")
-
-            for line in custom_code:
-                writer.writeln(line)
+        context = self.get_entity_context(table, database, adaptor, naming)
+        context["custom_code"] = PythonGenerator.read_custom_code(filename)
+        with SourceWriter(filename) as writer:
+            writer.write(self.entity_template.render(context))
+
+    def get_entity_context(self, table: Table, database: Database, adaptor: Adaptor,
+                           naming: Naming) -> Dict[str, Any]:
+        """ What entity.tpl fills in for a table """
+        fields = [(field.name.snake(), self.get_python_field_type(field), self.get_python_default_value(field))
+                  for field in table.fields]
+        foreign_tables = [database.get_table(key.referenced_table) for key in table.foreign_keys]
+        lookup_tables = [database.get_table(key.primary_table) for key in table.get_keys(KeyType.Lookup)]
+
+        lookups: List[Tuple[str, str, str]] = []
+        for lookup in table.get_keys(KeyType.Lookup):
+            primary_table = naming.string_to_name(lookup.primary_table)
+            lookups.append((primary_table.snake(), primary_table.pascal(), lookup.name.raw()))
+
+        row_values: List[Tuple[str, str]] = []
+        item_values: List[str] = []
+        for i, field in enumerate(table.fields):
+            row_value = f"row[{i}]"
+            item_value = f"self.{field.name.snake()}"
+            must_remap, to_type = adaptor.must_remap_field(field.type)
+            if must_remap:
+                row_value = self.get_remapper(to_type, field.type, row_value)
+                item_value = self.get_remapper(field.type, to_type, item_value)
+            row_values.append((field.name.snake(), row_value))
+            item_values.append(f"\"{field.name.raw()}\": {item_value}")
+
+        insert_values = [value for field, value in zip(table.fields, item_values) if not field.auto_increment]
+        update_values = [value for field, value in zip(table.fields, item_values) if
+                         field.name.name not in table.pk.fields] + \
+                        [value for field, value in zip(table.fields, item_values) if field.name.name in table.pk.fields]
+
+        return {
+            "imports": [(ref_table.name.snake(), ref_table.name.pascal()) for ref_table in
+                        foreign_tables + lookup_tables],
+            "entity": table.name.pascal(),
+            "table_name": table.name.raw(),
+            "drop_script": self.get_python_string(adaptor.generate_drop_script(table)),
+            "create_script": self.get_python_string(adaptor.generate_create_script(table)),
+            "table_exists_script": self.get_python_string(adaptor.generate_table_exists_script(table,
+                                                                                               database.name.raw())),
+            "table_count_script": self.get_python_string(adaptor.generate_count_script(table)),
+            "insert_script": self.get_python_string(adaptor.generate_insert_script(table)),
+            "update_script": self.get_python_string(adaptor.generate_update_script(table)),
+            "delete_script": self.get_python_string(adaptor.generate_delete_script(table)),
+            "fetch_by_id_script": self.get_python_string(adaptor.generate_fetch_by_id_script(table)),
+            "item_exists_script": self.get_python_string(adaptor.generate_item_exists_script(table)),
+            "fields": fields,
+            "lookups": lookups,
+            "children": [(foreign_table.name.snake(), foreign_table.name.pascal(), key.name.raw()) for
+                         key, foreign_table in zip(table.foreign_keys, foreign_tables)],
+            "init_parameters": ", ".join(["self"] + [f"{name}: {python_type} = {default}" for
+                                                     name, python_type, default in fields]),
+            "row_values": row_values,
+            "insert_parameters": f"{{{', '.join(insert_values)}}}",
+            "update_parameters": f"{{{', '.join(update_values)}}}"
+        }
+
+    @staticmethod
+    def get_python_string(script: Union[str, None]) -> str:
+        """ A script as a python string literal - some adaptors escape the double quotes of their scripts already,
+        others don't, and scripts can span lines """
+        if script is None:
+            return "None"
+        return json.dumps(script.replace("\\\"", "\""), ensure_ascii=False)
 
     @staticmethod
     def get_python_field_type(field: Field) -> str:
-        if field.type == FieldType.String:
-            return "str"
-        elif field.type == FieldType.Integer:
-            return "int"
-        elif field.type == FieldType.Float:
-            return "float"
-        elif field.type == FieldType.Decimal:
-            return "float"
-        elif field.type == FieldType.Boolean:
-            return "bool"
-        elif field.type == FieldType.Datetime:
-            return "datetime"
-        else:
+        result = python_types.render(field.type)
+        if result is None:
             raise Exception("Field type invalid")
+        return result
 
     @staticmethod
     def get_python_default_value(field: Field) -> str:
@@ -119,89 +169,12 @@ class PythonGenerator(Generator):
         else:
             raise Exception("Field type invalid")
 
-    def generate_fields(self, table: Table, database: Database, writer: SourceWriter, naming: Naming):
-        for field in table.fields:
-            writer.writeln(
-                f"{field.name.snake()}: {self.get_python_field_type(field)} = {self.get_python_default_value(field)}")
-
-            # lookups
-        writer.writeln()
-        for lookup in [key for key in table.keys if key.key_type == KeyType.Lookup]:
-            primary_table = naming.string_to_name(lookup.primary_table)
-            writer.writeln(f"{primary_table.snake()}: {primary_table.pascal()} #{lookup.name.raw()}")
-
-        # fk's
-
-        for foreign_key in table.foreign_keys:
-            foreign_table = database.get_table(foreign_key.referenced_table)
-            writer.writeln(
-                f"{foreign_table.name.snake()}: List[{foreign_table.name.pascal()}] # {foreign_key.name.raw()}")
-
-        writer.writeln()
-
-    def generate_init(self, table: Table, writer: SourceWriter, database: Database, naming: Naming):
-        param_list = ["self"]
-        for field in table.fields:
-            param_list.append(
-                f"{field.name.snake()}: {self.get_python_field_type(field)} = {self.get_python_default_value(field)}")
-        writer.writeln(f"def __init__({', '.join(param_list)}):")
-        writer.indent()
-        for field in table.fields:
-            writer.writeln(f"self.{field.name.snake()} = {field.name.snake()}")
-
-        for lookup in [key for key in table.keys if key.key_type == KeyType.Lookup]:
-            primary_table = naming.string_to_name(lookup.primary_table)
-            writer.writeln(f"self.{primary_table.snake()} = None")
-
-        for foreign_key in table.foreign_keys:
-            foreign_table = database.get_table(foreign_key.referenced_table)
-            writer.writeln(f"self.{foreign_table.name.snake()}: List[{foreign_table.name.pascal()}] = list()")
-
-        writer.unindent()
-
     @staticmethod
     def get_remapper(from_field_type: FieldType, to_field_type: FieldType, item: str) -> str:
-        if from_field_type == FieldType.Boolean and to_field_type == FieldType.Integer:
-            return f"TableBase.bool_to_int({item})"
-        elif from_field_type == FieldType.Integer and to_field_type == FieldType.Boolean:
-            return f"TableBase.int_to_bool({item})"
-        elif from_field_type == FieldType.Datetime and to_field_type == FieldType.Float:
-            return f"TableBase.datetime_to_float({item})"
-        elif from_field_type == FieldType.Float and to_field_type == FieldType.Datetime:
-            return f"TableBase.float_to_datetime({item})"
-        else:
+        conversion = python_types.convert(from_field_type, to_field_type)
+        if conversion is None:
             raise Exception("Unknown field type ")
-
-    def generate_mapper(self, table: Table, writer: SourceWriter, adaptor: Adaptor):
-        writer.writeln("def map_row(self, row) -> TableBase:")
-        writer.indent()
-        for i in range(len(table.fields)):
-            value = f"row[{i}]"
-            must_remap, to_type = adaptor.must_remap_field(table.fields[i].type)
-            if must_remap:
-                value = self.get_remapper(to_type, table.fields[i].type, value)
-
-            writer.writeln(f"self.{table.fields[i].name.snake()} = {value}")
-
-        writer.writeln("return self")
-
-        writer.unindent()
-
-    def generate_get_params(self, table: Table, writer: SourceWriter, adaptor: Adaptor):
-        writer.writeln("def get_insert_params(self) -> {}:")
-        writer.indent()
-        writer.writeln(
-            f"return {self.build_param_dict_from_item([f for f in table.fields if not f.auto_increment], adaptor)}")
-        writer.unindent()
-        writer.writeln()
-
-        writer.writeln("def get_update_params(self) -> {}:")
-        writer.indent()
-        params = [f for f in table.fields if f.name.name not in table.pk.fields] + \
-                 [f for f in table.fields if f.name.name in table.pk.fields]
-        writer.writeln(f"return {self.build_param_dict_from_item(params, adaptor)}")
-        writer.unindent()
-        writer.writeln()
+        return f"{conversion}({item})"
 
     def build_param_array_types(self, fields: [Field], prefix=None, suffix=None) -> []:
         if prefix is None:
@@ -213,23 +186,6 @@ class PythonGenerator(Generator):
         param_strs = [p for p in param_list if p != ""]
         return param_strs
 
-    def build_param_dict_from_item(self, fields: [Field], adaptor: Adaptor, prefix=None, suffix=None) -> str:
-        if suffix is None:
-            suffix = []
-        if prefix is None:
-            prefix = []
-        param_list = [] + prefix
-        for field in fields:
-            value = f"self.{field.name.snake()}"
-            must_remap, to_field = adaptor.must_remap_field(field.type)
-            if must_remap:
-                value = self.get_remapper(field.type, to_field, value)
-            param_list.append(f"\"{field.name.raw()}\": {value}")
-
-        param_list = param_list + suffix
-        param_strs = [p for p in param_list if p != ""]
-        return f"{{{', '.join(param_strs)}}}"
-
     def build_param_dict_from_params(self, fields: [Field], adaptor: Adaptor, prefix=None, suffix=None) -> str:
         if suffix is None:
             suffix = []
@@ -248,177 +204,148 @@ class PythonGenerator(Generator):
         return f"{{{','.join(param_strs)}}}"
 
     def generate_repository(self, table: Table, database: Database, filename: str, adaptor: Adaptor, naming: Naming):
-        # find custom code
-        custom_code = self.read_custom_code(filename)
-
-        with SourceWriter(open(filename, 'w')) as writer:
-            writer.writeln("from datetime import datetime")
-            writer.writeln("from typing import Optional")
-            writer.writeln()
-            writer.writeln("from base.table_base import TableBase")
-            writer.writeln("from base.session import Session")
-            writer.writeln("from base.repository_base import RepositoryBase")
-            writer.writeln("from config import Config")
-            writer.writeln(f"from entities.{table.name.snake()} import {table.name.pascal()}")
-
-            references = [key for key in table.keys if key.key_type == KeyType.Lookup] + table.foreign_keys
-            for ref in references:
-                if ref.key_type == KeyType.ForeignKey:
-                    ref_table = naming.string_to_name(ref.referenced_table)
-                else:
-                    ref_table = naming.string_to_name(ref.primary_table)
-                writer.writeln(
-                    f"from repositories.{ref_table.snake()}_repository import {ref_table.pascal()}Repository")
-            writer.writeln()
-            writer.writeln()
-            writer.writeln(f"class {table.name.pascal()}Repository(RepositoryBase):")
-            writer.indent()
-            writer.writeln(f"__table__ = {table.name.pascal()}")
-            # writer.writeln()
-
-            ref_list = []
-            for ref in references:
-                if ref.key_type == KeyType.ForeignKey:
-                    ref_table = naming.string_to_name(ref.referenced_table)
-                else:
-                    ref_table = naming.string_to_name(ref.primary_table)
-                ref_list.append(ref_table)
-
-            for ref_table in ref_list:
-                writer.writeln(f"{ref_table.snake()}_repo: {ref_table.pascal()}Repository")
-
-            params = ["self"] + [f"{ref_table.snake()}_repo: {ref_table.pascal()}Repository"]
-            writer.writeln()
-            writer.writeln(f"def __init__({', '.join(params)}):")
-            writer.indent()
-            for ref_table in ref_list:
-                writer.writeln(f"self.{ref_table.snake()}_repo = {ref_table.snake()}_repo")
-            writer.writeln()
-            writer.unindent()
-
-            repo_param_list: List[str] = ["self"]
-            repo_init_list: List[str] = []
-            for ref in references:
-                if ref.key_type == KeyType.ForeignKey:
-                    ref_table = naming.string_to_name(ref.referenced_table)
-                else:
-                    ref_table = naming.string_to_name(ref.primary_table)
-                repo_param_list.append(f"{ref_table.snake()}_repo: {ref_table.pascal()}Repository")
-                repo_init_list.append(f"self.{ref_table.snake()}_repo = {ref_table.snake()}_repo")
-
-            # writer.writeln(f"def bind({', '.join(repo_param_list)}):")
-            # writer.indent()
-            #
-            # for init in repo_init_list:
-            #     writer.writeln(init)
-            # if len(repo_init_list) == 0:
-            #     writer.writeln("pass")
-
-            # writer.unindent()
-            # writer.writeln()
-
-            f_list = [table.find_field(pk_field) for pk_field in table.pk.fields]
-            param_list = self.build_param_array_types(f_list, ["self", "session: Session"])
-            writer.writeln(f"def get_by_id({', '.join(param_list)}):")
-            writer.indent()
-            writer.writeln(f"item: {table.name.pascal()} = self._get_by_id(session, "
-                           f"{self.build_param_dict_from_params(f_list, adaptor)})")
-
-            for key in [key for key in table.keys if key.key_type == KeyType.Lookup]:
-                ref_table = naming.string_to_name(key.primary_table)
-                params = [f"item.{naming.string_to_name(field).snake()}" for field in key.fields]
-                writer.writeln(f"item.{ref_table.snake()} = self.{ref_table.snake()}"
-                               f"_repo.get_by_id(session, {', '.join(params)})")
-
-            for ref in table.foreign_keys:
-                ref_table = naming.string_to_name(ref.referenced_table)
-                ref_pk_list = ["item.{field_name}".format(field_name=naming.string_to_name(f).snake()) for f in
-                               ref.primary_fields]
-                writer.writeln(f"item.{ref_table.snake()} = self.{ref_table.snake()}_repo.get_for_{table.name.snake()}"
-                               f"(session, {', '.join(ref_pk_list)})")
-
-            writer.writeln("return item")
-            writer.writeln()
-            writer.unindent()
-            writer.writeln(f"def exists({', '.join(param_list)}):")
-            writer.indent()
-            writer.writeln(f"return self._item_exists(session, {self.build_param_dict_from_params(f_list, adaptor)})")
-            writer.writeln()
-            writer.unindent()
-            writer.writeln(f"def delete({', '.join(param_list)}):")
-            writer.indent()
-            writer.writeln(f"self._delete(session, {self.build_param_dict_from_params(f_list, adaptor)})")
-            writer.writeln()
-            writer.unindent()
-            writer.writeln(f"def add(self, session: Session, item: {table.name.pascal()}):")
-            writer.indent()
-
-            if len(f_list) == 1 and f_list[0].auto_increment:
-                writer.writeln(f"{f_list[0].name.snake()} = self._execute_lastrowid(session, item.__insert_script__, "
-                               f"item.get_insert_params())")
-                writer.writeln(f"item.{f_list[0].name.snake()} = {f_list[0].name.snake()}")
-            else:
-                writer.writeln("self._execute(session, item.__insert_script__, item.get_insert_params())")
-
-            for ref in table.foreign_keys:
-                ref_table = naming.string_to_name(ref.referenced_table)
-                writer.writeln(f"for {ref_table.snake()} in item.{ref_table.snake()}:")
-                writer.indent()
-                for i in range(len(ref.fields)):
-                    key_field = naming.string_to_name(ref.fields[i])
-                    ref_field = naming.string_to_name(ref.primary_fields[i])
-
-                    writer.writeln(f"{ref_table.snake()}.{key_field.snake()} = {ref_field.snake()}")
-                writer.unindent()
-                writer.writeln(f"self.{ref_table.snake()}_repo.add(session, {ref_table.snake()})")
-
-            writer.unindent()
-            writer.writeln()
+        context = self.get_repository_context(table, database, adaptor, naming)
+        context["custom_code"] = self.read_custom_code(filename)
+        with SourceWriter(filename) as writer:
+            writer.write(self.repository_template.render(context))
+
+    def get_repository_context(self, table: Table, database: Database, adaptor: Adaptor,
+                               naming: Naming) -> Dict[str, Any]:
+        """ What repository.tpl fills in for a table """
+        ref_list = [naming.string_to_name(ref.primary_table) for ref in table.get_keys(KeyType.Lookup)] + \
+                   [naming.string_to_name(ref.referenced_table) for ref in table.foreign_keys]
+
+        f_list = [table.find_field(pk_field) for pk_field in table.pk.fields]
+        id_values = self.build_param_dict_from_params(f_list, adaptor)
+
+        lookup_loads: List[Tuple[str, str]] = []
+        for key in table.get_keys(KeyType.Lookup):
+            params = [f"item.{naming.string_to_name(field).snake()}" for field in key.fields]
+            lookup_loads.append((naming.string_to_name(key.primary_table).snake(), ", ".join(params)))
+
+        child_loads: List[Tuple[str, str]] = []
+        # each child is added with its foreign key fields set from the item
+        child_adds: List[Tuple[str, List[Tuple[str, str]]]] = []
+        for ref in table.foreign_keys:
+            ref_table = naming.string_to_name(ref.referenced_table)
+            ref_pk_list = [f"item.{naming.string_to_name(f).snake()}" for f in ref.primary_fields]
+            child_loads.append((ref_table.snake(), ", ".join(ref_pk_list)))
+            child_adds.append((ref_table.snake(), [(naming.string_to_name(ref.fields[i]).snake(),
+                                                    naming.string_to_name(ref.primary_fields[i]).snake())
+                                                   for i in range(len(ref.fields))]))
+
+        queries: List[Tuple[str, str, QueryType, str, str]] = []
+        for custom_query in table.custom_queries:
+            if custom_query.query_type not in (QueryType.Execute, QueryType.FetchScalar, QueryType.FetchOne,
+                                               QueryType.FetchAll):
+                raise Exception("Unknown query type")
+            query = custom_query.query.replace("__table_name__", table.name.raw())
+            query = adaptor.replace_parameters(query)
+            params = [parameter for parameter in custom_query.parameters]
+            queries.append((custom_query.name.snake(),
+                            ", ".join(["self", "session: Session"] + [p.name.snake() for p in params]),
+                            custom_query.query_type, self.get_python_string(query),
+                            self.build_param_dict_from_params(params, adaptor)))
+
+        # the rows of this table that belong to a row of the table a foreign key references
+        parents: List[Tuple[str, str, str, str]] = []
+        for foreign_key in table.get_keys(KeyType.ForeignKey):
+            primary_table = database.get_table(foreign_key.primary_table)
+            fields = [table.find_field(f) for f in foreign_key.fields]
+            query = adaptor.generate_fetch_by_key_script(table, foreign_key)
+            parents.append((primary_table.name.snake(), ", ".join([field.name.snake() for field in fields]),
+                            self.get_python_string(query), self.build_param_dict_from_params(fields, adaptor)))
+
+        return {
+            "QueryType": QueryType,
+            "entity_module": table.name.snake(),
+            "entity": table.name.pascal(),
+            "references": [(ref_table.snake(), ref_table.pascal()) for ref_table in ref_list],
+            "init_parameters": ", ".join(["self"] + [f"{ref_table.snake()}_repo: {ref_table.pascal()}Repository"
+                                                     for ref_table in ref_list]),
+            "id_parameters": ", ".join(self.build_param_array_types(f_list, ["self", "session: Session"])),
+            "id_values": id_values,
+            "lookup_loads": lookup_loads,
+            "child_loads": child_loads,
+            "auto_id": f_list[0].name.snake() if len(f_list) == 1 and f_list[0].auto_increment else None,
+            "child_adds": child_adds,
+            "queries": queries,
+            "parents": parents
+        }
+
+    def generate_benchmark(self, database: Database, output_folder: str, adaptor: Adaptor, naming: Naming):
+        with SourceWriter(os.path.join(output_folder, "benchmark.py")) as writer:
+            writer.write(self.benchmark_template.render(self.get_benchmark_context(database, adaptor, naming)))
+
+    @staticmethod
+    def get_field(table: Table, name: str) -> Union[Field, None]:
+        # find_field raises for names that aren't fields, like the parameters of some custom queries
+        try:
+            return table.find_field(name)
+        except DataException:
+            return None
+
+    @staticmethod
+    def get_sample_value(field_type: FieldType) -> str:
+        """ An expression for a value of the type that is different for every i """
+        if field_type == FieldType.String:
+            return "str(i)"
+        elif field_type == FieldType.Integer:
+            return "i"
+        elif field_type == FieldType.Float or field_type == FieldType.Decimal:
+            return "i + 0.5"
+        elif field_type == FieldType.Boolean:
+            return "i % 2 == 0"
+        elif field_type == FieldType.Datetime:
+            return "start_date + timedelta(seconds=i)"
+        else:
+            raise Exception("Field type invalid")
 
+    def get_benchmark_context(self, database: Database, adaptor: Adaptor, naming: Naming) -> Dict[str, Any]:
+        """ What benchmark.tpl fills in - the tables in the order their rows can be added """
+        tables: List[Dict[str, Any]] = []
+        for table in adaptor.get_table_order(database, (KeyType.ForeignKey, KeyType.Lookup)).get_tables():
+            # fields that reference another table take the value of a row already added to it
+            references: Dict[str, str] = dict()
+            for key in table.get_keys(KeyType.ForeignKey) + table.get_keys(KeyType.Lookup):
+                primary_table = database.get_table(key.primary_table)
+                if primary_table is None:
+                    continue
+                primary_fields = key.primary_fields if len(key.primary_fields) > 0 else primary_table.pk.fields
+                for field_name, primary_field_name in zip(key.fields, primary_fields):
+                    field = self.get_field(table, field_name)
+                    primary_field = self.get_field(primary_table, primary_field_name)
+                    if field is None or primary_field is None or field_name in references:
+                        continue
+                    references[field_name] = f"pick(added, \"{primary_table.name.raw()}\", " \
+                                             f"\"{primary_field.name.snake()}\", {self.get_sample_value(field.type)})"
+
+            update_fields = [field for field in table.fields if not field.auto_increment and
+                             field.name.raw() not in table.pk.fields and field.name.raw() not in references]
+            queries: List[Tuple[str, str]] = []
             for custom_query in table.custom_queries:
-                query = custom_query.query.replace("__table_name__", table.name.raw())
-                query = adaptor.replace_parameters(query)
-
-                params = [parameter for parameter in custom_query.parameters]
-
-                writer.writeln(f"def {custom_query.name.snake()}("
-                               f"{', '.join(['self', 'session: Session'] + [p.name.snake() for p in params])}):")
-                writer.indent()
-                if custom_query.query_type == QueryType.Execute:
-                    writer.writeln(f"self._execute(session, \"{query}\", "
-                                   f"parameters={self.build_param_dict_from_params(params, adaptor)})")
-                elif custom_query.query_type == QueryType.FetchScalar:
-                    writer.writeln(f"return self._fetch_scalar(session, \"{query}\", "
-                                   f"parameters={self.build_param_dict_from_params(params, adaptor)})")
-                elif custom_query.query_type == QueryType.FetchOne:
-                    writer.writeln(f"result = self.fetch_one(session, \"{query}\", "
-                                   f"parameters={self.build_param_dict_from_params(params, adaptor)})")
-                    writer.writeln("return result")
-                elif custom_query.query_type == QueryType.FetchAll:
-                    writer.writeln(f"result = self.fetch(session, \"{query}\", "
-                                   f"parameters={self.build_param_dict_from_params(params, adaptor)})")
-                    writer.writeln("return result")
-                else:
-                    raise Exception("Unknown query type")
-
-            writer.writeln()
-            # get foreign keys
-            for foreign_key in [key for key in table.keys if key.key_type == KeyType.ForeignKey]:
-                primary_table = database.get_table(foreign_key.primary_table)
-                fields = [naming.string_to_name(f).snake() for f in foreign_key.fields]
-                writer.writeln(f"def get_for_{primary_table.name.snake()}(self, session: Session, {','.join(fields)}):")
-                writer.indent()
-                fields = [f"`{f.name.raw()}`" for f in primary_table.fields]
-                params = [f"`{f}` = %({f})s" for f in primary_table.pk.fields]
-                writer.writeln(f"result = self.fetch(session, \"select {', '.join(fields)} from `{primary_table.name.raw()}` "
-                               f"where {' and '.join(params)};\")")
-                writer.writeln("return result")
-                writer.unindent()
-                writer.writeln()
-
-            writer.unindent()
-            writer.writeln()
-            writer.writeln("# end-autogenerated")
-
-            for line in custom_code:
-                writer.writeln(line)
+                arguments: List[str] = []
+                for parameter in custom_query.parameters:
+                    field = self.get_field(table, parameter.name.raw())
+                    arguments.append(f", item.{field.name.snake()}" if field is not None else
+                                     f", {self.get_sample_value(parameter.type)}")
+                # queries that change rows run after the ones that read them
+                queries.append((custom_query.query_type == QueryType.Execute, custom_query.name.snake(),
+                                "".join(arguments)))
+
+            tables.append({
+                "name": table.name.raw(),
+                "module": table.name.snake(),
+                "class_name": table.name.pascal(),
+                "references": [(ref_table.snake(), ref_table.raw()) for ref_table in
+                               [naming.string_to_name(ref.primary_table) for ref in table.get_keys(KeyType.Lookup)] +
+                               [naming.string_to_name(ref.referenced_table) for ref in table.foreign_keys]],
+                "arguments": [(field.name.snake(), references.get(field.name.raw(),
+                                                                  self.get_sample_value(field.type)))
+                              for field in table.fields if not field.auto_increment],
+                "id_fields": [table.find_field(field_name).name.snake() for field_name in table.pk.fields],
+                "update": None if len(update_fields) == 0 else
+                (update_fields[0].name.snake(), self.get_sample_value(update_fields[0].type)),
+                "queries": [(name, arguments) for _, name, arguments in sorted(queries, key=lambda query: query[0])]
+            })
+        return {"tables": tables}
@@ -0,0 +1,154 @@
+import re
+from typing import Dict, List, Union
+
+from database_objects import Database, Table, Key, KeyType
+from naming import Naming
+
+# a column, optionally quoted and qualified, and the comparison it is used in
+_comparison = re.compile(r"(?:[`\"\[]?\w+[`\"\]]?\.)?[`\"\[]?(\w+)[`\"\]]?\s*"
+                         r"(<>|!=|<=|>=|=|<|>|\bnot\s+in\b|\bin\b|\bnot\s+like\b|\blike\b|\bbetween\b|\bis\b)", re.I)
+_order_column = re.compile(r"^(?:[`\"\[]?\w+[`\"\]]?\.)?[`\"\[]?(\w+)[`\"\]]?(\s+(asc|desc))?$", re.I)
+_clause = re.compile(r"\b(where|group\s+by|order\s+by|limit|having|union|returning|for\s+update)\b", re.I)
+_string_literal = re.compile(r"'(?:[^']|'')*'")
+
+
+class QueryColumns(object):
+    """ The columns of a table a query filters on with equality, with a range, and sorts by """
+
+    def __init__(self):
+        self.equality: List[str] = []
+        self.ranges: List[str] = []
+        self.order: List[str] = []
+        self.limited = False
+
+
+class IndexProposal(object):
+    """ A key proposed for a table, and the custom queries and foreign keys it serves - the first equality_count
+    fields can be in any order """
+
+    def __init__(self, table: Table, key: Key, equality_count: int, reason: str):
+        self.table = table
+        self.key = key
+        self.equality_count = equality_count
+        self.reasons: List[str] = [reason]
+
+
+class IndexAdvisor(object):
+    """ Proposes the indexes the custom queries and foreign keys of a definition need - a query gets a composite
+    index of its equality columns, then the columns it sorts by, then its first range column, and every foreign key
+    an index for the get_for_ loaders and cascading deletes. Only ever plain indexes: that a query fetches one row
+    doesn't make its columns unique in the data """
+
+    def __init__(self, naming: Naming):
+        self.naming = naming
+
+    @staticmethod
+    def get_query_columns(table: Table, query: str) -> Union[QueryColumns, None]:
+        """ None when the query is beyond this simple parser - subqueries, or or'ed conditions """
+        text = _string_literal.sub("''", query)
+        if len(re.findall(r"\bselect\b", text, re.I)) > 1 or re.search(r"\bor\b", text, re.I):
+            return None
+
+        fields = {field.name.raw().lower(): field.name.raw() for field in table.fields}
+        sections: Dict[str, str] = dict()
+        matches = list(_clause.finditer(text))
+        for i, match in enumerate(matches):
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+            sections[re.sub(r"\s+", " ", match.group(1).lower())] = text[match.end():end]
+
+        columns = QueryColumns()
+        columns.limited = "limit" in sections
+        for match in _comparison.finditer(sections.get("where", "")):
+            column = fields.get(match.group(1).lower())
+            operator = re.sub(r"\s+", " ", match.group(2).lower())
+            if column is None or operator in ("<>", "!=", "not in", "not like"):
+                continue
+            if operator in ("=", "in", "is"):
+                if column not in columns.equality:
+                    columns.equality.append(column)
+            elif column not in columns.ranges:
+                columns.ranges.append(column)
+
+        for item in sections.get("order by", "").split(","):
+            match = _order_column.match(item.strip())
+            if match is not None and match.group(1).lower() in fields:
+                column = fields[match.group(1).lower()]
+                if column not in columns.order and column not in columns.equality:
+                    columns.order.append(column)
+        columns.ranges = [column for column in columns.ranges if column not in columns.equality]
+        return columns
+
+    @staticmethod
+    def is_covered(keys: List[Key], fields: List[str], equality_count: int) -> bool:
+        """ Whether one of the keys already serves the fields - it starts with them, the equality ones in any order,
+        or it is a primary or unique key on some of the equality fields, which leaves a single row """
+        lowered = [field.lower() for field in fields]
+        for key in keys:
+            key_fields = [field.lower() for field in key.fields]
+            if key.key_type in (KeyType.PrimaryKey, KeyType.Unique) and \
+                    set(key_fields).issubset(lowered[:equality_count]):
+                return True
+            if len(key_fields) >= len(lowered) and \
+                    set(key_fields[:equality_count]) == set(lowered[:equality_count]) and \
+                    key_fields[equality_count:len(lowered)] == lowered[equality_count:]:
+                return True
+        return False
+
+    def get_key_name(self, table: Table, fields: List[str]) -> str:
+        name = f"ix_{table.name.raw()}_{'_'.join(field.lower() for field in fields)}"
+        names = {key.name.raw() for key in table.keys}
+        result = name
+        i = 2
+        while result in names:
+            result = f"{name}_{i}"
+            i += 1
+        return result
+
+    def get_candidates(self, table: Table) -> List[IndexProposal]:
+        candidates: List[IndexProposal] = []
+        for foreign_key in table.get_keys(KeyType.ForeignKey):
+            candidates.append(self.get_proposal(table, foreign_key.fields, len(foreign_key.fields),
+                                                f"foreign key {foreign_key.name.raw()}"))
+
+        for custom_query in table.custom_queries:
+            query = custom_query.query.replace("__table_name__", table.name.raw())
+            columns = self.get_query_columns(table, query)
+            if columns is None or len(columns.equality) + len(columns.order) + len(columns.ranges) == 0:
+                continue
+            fields = columns.equality + columns.order + columns.ranges[:1]
+            candidates.append(self.get_proposal(table, fields, len(columns.equality),
+                                                f"query {custom_query.name.raw()}"))
+        return candidates
+
+    def get_proposal(self, table: Table, fields: List[str], equality_count: int, reason: str) -> IndexProposal:
+        key = Key(self.naming.string_to_name(self.get_key_name(table, fields)), KeyType.Index)
+        key.fields = list(fields)
+        key.referenced_table = table.name.raw()
+        return IndexProposal(table, key, equality_count, reason)
+
+    def advise(self, database: Database) -> List[IndexProposal]:
+        proposals: List[IndexProposal] = []
+        for table in database.tables:
+            keys = ([table.pk] if table.pk is not None else []) + table.get_keys(KeyType.Unique) + \
+                   table.get_keys(KeyType.Index)
+            accepted: List[IndexProposal] = []
+            # the longest first, so shorter proposals fold into the indexes that serve them too
+            candidates = sorted(self.get_candidates(table), key=lambda candidate: -len(candidate.key.fields))
+            for candidate in candidates:
+                fields = candidate.key.fields
+                if self.is_covered(keys, fields, candidate.equality_count):
+                    continue
+                serving = [proposal for proposal in accepted
+                           if self.is_covered([proposal.key], fields, candidate.equality_count)]
+                if len(serving) > 0:
+                    serving[0].reasons.extend(candidate.reasons)
+                    continue
+                accepted.append(candidate)
+            proposals.extend(accepted)
+        return proposals
+
+    @staticmethod
+    def apply(proposals: List[IndexProposal]):
+        """ Adds the proposed keys to their tables """
+        for proposal in proposals:
+            proposal.table.keys.append(proposal.key)
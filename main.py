@@ -1,42 +1,252 @@
 import argparse
 import os
-from typing import List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
 
+from adaptors.adaptor import Adaptor
 from adaptors.adaptor_factory import AdaptorFactory
-from database_objects import Table, KeyType, QueryType
+from batch_manifest import BatchJob, BatchResult, load_batch_manifest
+from data_generator import DataGenerator
+from database_objects import Database, Table, KeyType, QueryType
+from file_watcher import FileWatcher
+from generators.generator import default_template_folder
 from generators.generator_factory import GeneratorFactory
+from index_advisor import IndexAdvisor
 from naming import Naming
+from phases import phases, PhaseProfiler
+from query_plan_checker import QueryPlanChecker
+from source_writer import SourceWriter
 from utils import get_fullname
 
 
-def import_db(db_connection: str, definition_file: str, dictionary_file: str, big_dictionary_file: str):
-    naming = Naming(dictionary_file, big_dictionary_file)
+def import_db(db_connection: str, definition_file: str, dictionary_file: str, big_dictionary_file: str,
+              naming_cache: str = None, dictionary_snapshot: str = None):
+    naming = Naming(dictionary_file, big_dictionary_file, naming_cache, snapshot_file=dictionary_snapshot)
     adaptor = AdaptorFactory.get_adaptor_for_connection_string(db_connection, naming)
-    db = adaptor.import_schema(None)
-    adaptor.generate_schema_definition(db, definition_file)
+    adaptor.export_schema_definition(None, definition_file)
+    naming.save_cache()
 
 
 def generate_dal(definition_file: str, dictionary_file: str, big_dictionary_file: str, output_folder: str,
-                 template_folder: str, language: str, db_type: str):
-    naming = Naming(dictionary_file, big_dictionary_file)
+                 template_folder: str, language: str, db_type: str, naming_cache: str = None,
+                 dictionary_snapshot: str = None, definition_cache: bool = False, force: bool = False,
+                 jobs: int = 1, benchmark: bool = False, verify_queries: bool = False,
+                 verify_report: str = None) -> int:
+    """ Returns the number of statements whose query plans have issues, when they are verified """
+    naming = Naming(dictionary_file, big_dictionary_file, naming_cache, snapshot_file=dictionary_snapshot)
+    _, _, issue_count = generate_definition(naming, definition_file, output_folder, language, db_type,
+                                            definition_cache, force, jobs, template_folder=template_folder,
+                                            benchmark=benchmark, verify_queries=verify_queries,
+                                            verify_report=verify_report)
+    naming.save_cache()
+    return issue_count
+
+
+def generate_definition(naming: Naming, definition_file: str, output_folder: str, language: str, db_type: str,
+                        definition_cache: bool = False, force: bool = False, jobs: int = 1,
+                        ddl_file: str = None, template_folder: str = None, benchmark: bool = False,
+                        verify_queries: bool = False, verify_report: str = None) -> Tuple[int, int, int]:
+    """ generate-dal for one definition with an already loaded Naming, its DDL when ddl_file is set, the crud
+    benchmark module when benchmark is set and the query plan check when verify_queries is set - returns the number
+    of tables generated, the number in the definition and the number of statements with query plan issues """
+    template_folder = default_template_folder if template_folder is None else template_folder
     generator = GeneratorFactory.get_generator(language, naming)
+    generator.load_templates(template_folder)
     adaptor = AdaptorFactory.get_adaptor_for_dbtype(db_type, naming)
-    database = generator.import_definition(definition_file, naming)
-    # generator.copy_templates(template_folder, output_folder)
-    generator.generate_entities(database, os.path.join(output_folder, "entities"), adaptor, naming)
-    generator.generate_repositories(database, os.path.join(output_folder, "repositories"), adaptor, naming)
+    database = generator.import_definition(definition_file, naming, definition_cache)
+    entity_folder = os.path.join(output_folder, "entities")
+    repository_folder = os.path.join(output_folder, "repositories")
+
+    # only tables whose definition, neighbours or generation settings changed since the last run
+    with phases.phase("manifest"):
+        manifest = generator.get_manifest(database, output_folder, adaptor, naming)
+        tables = database.tables if force else generator.get_changed_tables(database, manifest, entity_folder,
+                                                                             repository_folder)
+    generator.generate_tables(database, entity_folder, repository_folder, adaptor, naming, tables, jobs)
+    generator.copy_templates(template_folder, output_folder)
+    if benchmark:
+        generator.generate_benchmark(database, output_folder, adaptor, naming)
+    manifest.save()
+
+    if ddl_file is not None:
+        with SourceWriter(ddl_file) as writer:
+            for line in get_ddl(database, adaptor):
+                writer.writeln(line)
+
+    issue_count = 0
+    if verify_queries:
+        with phases.phase("verify_queries"):
+            issue_count = verify_query_plans(database, naming, verify_report)
+
+    return len(tables), len(database.tables), issue_count
+
+
+def verify_query_plans(database: Database, naming: Naming, report_file: str = None) -> int:
+    """ Prints the statements whose SQLite query plans scan a table or sort into a temp b-tree, and returns how many
+    there are """
+    plans = QueryPlanChecker(naming).check(database)
+    for plan in plans:
+        for issue in plan.issues:
+            print(f"{plan.table_name}.{plan.name}: {issue}")
+        if plan.error != "":
+            print(f"{plan.table_name}.{plan.name}: not checked, {plan.error}")
+    if report_file is not None:
+        QueryPlanChecker.write_report(plans, report_file)
+
+    issue_count = len([plan for plan in plans if len(plan.issues) > 0])
+    print(f"{len(plans)} statements verified, {issue_count} with table scans or temp b-trees")
+    return issue_count
+
+
+def generate_ddl(definition_file: str, dictionary_file: str, big_dictionary_file: str, db_type: str,
+                 naming_cache: str = None, dictionary_snapshot: str = None, definition_cache: bool = False):
+    naming = Naming(dictionary_file, big_dictionary_file, naming_cache, snapshot_file=dictionary_snapshot)
+    adaptor = AdaptorFactory.get_adaptor_for_dbtype(db_type, naming)
+    database = adaptor.import_definition(definition_file, naming, definition_cache)
+    for line in get_ddl(database, adaptor):
+        print(line)
 
+    naming.save_cache()
 
-def generate_ddl(definition_file: str, dictionary_file: str, big_dictionary_file: str, db_type: str):
-    naming = Naming(dictionary_file, big_dictionary_file)
-    adaptor = AdaptorFactory.get_adaptor_for_dbtype(db_type, naming)
-    database = adaptor.import_definition(definition_file, naming)
 
+def get_ddl(database: Database, adaptor: Adaptor) -> List[str]:
     # find references and push in front
-    tables = adaptor.get_ordered_table_list(database)
-
-    for table in tables:
-        print(adaptor.generate_create_script(table))
+    with phases.phase("table_order"):
+        order = adaptor.get_table_order(database)
+
+    with phases.phase("ddl"):
+        lines = [adaptor.generate_create_script(table) for table in order.get_tables()]
+    for cycle in order.cycles:
+        lines.append(f"-- foreign key cycle between {', '.join([table.name.raw() for table in cycle])}")
+    for key in order.deferred_keys:
+        lines.append(f"-- foreign key {key.name.raw()} on {key.referenced_table} must be added after "
+                     f"{key.primary_table} is created")
+    return lines
+
+
+def generate_data(definition_file: str, dictionary_file: str, big_dictionary_file: str, db_connection: str, rows: int,
+                  lookup_rows: int, seed: int, batch_size: int, naming_cache: str = None,
+                  dictionary_snapshot: str = None, definition_cache: bool = False, jobs: int = 1):
+    """ Fills the tables of the definition, which must already exist in the database and be empty, with synthetic
+    rows """
+    naming = Naming(dictionary_file, big_dictionary_file, naming_cache, snapshot_file=dictionary_snapshot)
+    adaptor = AdaptorFactory.get_adaptor_for_connection_string(db_connection, naming)
+    database = adaptor.import_definition(definition_file, naming, definition_cache)
+    data_generator = DataGenerator(database, adaptor, rows, lookup_rows, seed, batch_size)
+
+    start = time.perf_counter()
+    results = data_generator.fill_tables(jobs)
+    seconds = time.perf_counter() - start
+    for table_name, row_count, table_seconds in results:
+        print(f"{table_name:<32}{row_count:>12} rows{table_seconds:>10.3f}s")
+    total = sum(row_count for _, row_count, _ in results)
+    print(f"{len(results)} tables, {total} rows, {seconds:.3f}s, {total / seconds if seconds > 0 else 0:.0f} rows/s")
+    naming.save_cache()
+
+
+def advise_indexes(definition_file: str, dictionary_file: str, big_dictionary_file: str, write_indexes: bool = False,
+                   naming_cache: str = None, dictionary_snapshot: str = None):
+    """ Prints the keys the custom queries and foreign keys need, and adds them to the definition when write_indexes
+    is set """
+    naming = Naming(dictionary_file, big_dictionary_file, naming_cache, snapshot_file=dictionary_snapshot)
+    database = Adaptor.import_definition(definition_file, naming)
+    proposals = IndexAdvisor(naming).advise(database)
+    for proposal in proposals:
+        print(f"{proposal.table.name.raw()}: {proposal.key.key_type} {proposal.key.name.raw()} "
+              f"({', '.join(proposal.key.fields)}) for {', '.join(proposal.reasons)}")
+    print(f"{len(proposals)} keys proposed")
+
+    if write_indexes and len(proposals) > 0:
+        IndexAdvisor.apply(proposals)
+        Adaptor.generate_schema_definition(database, definition_file)
+        print(f"Keys written to {definition_file}")
+    naming.save_cache()
+
+
+def watch(definition_file: str, dictionary_file: str, big_dictionary_file: str, output_folder: str,
+          template_folder: str, language: str, db_type: str, naming_cache: str = None,
+          dictionary_snapshot: str = None, jobs: int = 1):
+    """ Keeps the dictionaries and generator loaded, and regenerates whenever the definition, dictionaries or templates
+    change - only the tables whose inputs changed are written again, and the DDL goes to schema.sql """
+    watcher = FileWatcher([definition_file, dictionary_file, big_dictionary_file, template_folder])
+    entity_folder = os.path.join(output_folder, "entities")
+    repository_folder = os.path.join(output_folder, "repositories")
+    changes: List[str] = []
+    naming = generator = adaptor = None
+
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                if naming is None or dictionary_file in changes or big_dictionary_file in changes:
+                    naming = Naming(dictionary_file, big_dictionary_file, naming_cache,
+                                    snapshot_file=dictionary_snapshot)
+                    generator = GeneratorFactory.get_generator(language, naming)
+                    adaptor = AdaptorFactory.get_adaptor_for_dbtype(db_type, naming)
+
+                # only templates whose files changed are compiled again
+                generator.load_templates(template_folder)
+                database = generator.import_definition(definition_file, naming)
+                manifest = generator.get_manifest(database, output_folder, adaptor, naming)
+                tables = generator.get_changed_tables(database, manifest, entity_folder, repository_folder)
+                generator.generate_tables(database, entity_folder, repository_folder, adaptor, naming, tables, jobs)
+                generator.copy_templates(template_folder, output_folder)
+                with SourceWriter(os.path.join(output_folder, "schema.sql")) as writer:
+                    for line in get_ddl(database, adaptor):
+                        writer.writeln(line)
+                manifest.save()
+                naming.save_cache()
+                print(f"Regenerated {len(tables)} of {len(database.tables)} tables in "
+                      f"{(time.perf_counter() - start) * 1000:.0f} ms")
+            except Exception as ex:
+                # a definition saved half way, or with a mistake in it - wait for the next save
+                print(f"Generation failed: {ex}")
+
+            changes = watcher.wait_for_changes()
+    except KeyboardInterrupt:
+        pass
+
+
+def batch(manifest_file: str, dictionary_file: str, big_dictionary_file: str, naming_cache: str = None,
+          dictionary_snapshot: str = None, definition_cache: bool = False, force: bool = False,
+          max_workers: int = 1) -> bool:
+    """ generate-dal and the DDL of every job in the manifest, max_workers at a time - the jobs share one Naming, so
+    the dictionaries are loaded once and a name is only split by the first job that meets it """
+    jobs = load_batch_manifest(manifest_file)
+    naming = Naming(dictionary_file, big_dictionary_file, naming_cache, snapshot_file=dictionary_snapshot)
+
+    def run_job(job: BatchJob) -> BatchResult:
+        result = BatchResult(job)
+        start = time.perf_counter()
+        try:
+            with phases.phase("batch_job", job.name):
+                result.generated_count, result.table_count, _ = generate_definition(
+                    naming, job.definition_file, job.output_folder, job.language, job.db_type, definition_cache,
+                    force, ddl_file=job.ddl_file, template_folder=job.template_folder)
+        except Exception as ex:
+            result.error = str(ex)
+        result.seconds = time.perf_counter() - start
+        return result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max(1, max_workers)) as executor:
+        results = list(executor.map(run_job, jobs))
+    naming.save_cache()
+
+    for result in results:
+        status = f"failed: {result.error}" if result.error != "" else \
+            f"{result.generated_count} of {result.table_count} tables generated"
+        print(f"{result.job.name:<32}{result.seconds:>10.3f}s  {status}")
+    failed_count = len([result for result in results if result.error != ""])
+    print(f"{len(results)} jobs, {failed_count} failed, {time.perf_counter() - start:.3f}s")
+    return failed_count == 0
+
+
+def compile_dictionary(dictionary_file: str, big_dictionary_file: str, dictionary_snapshot: str = None):
+    naming = Naming(dictionary_file, big_dictionary_file, snapshot_file=dictionary_snapshot)
+    naming.compile_snapshot()
+    print(f"Dictionary snapshot written to {naming.snapshot_file}")
 
 
 def main():
@@ -48,7 +258,8 @@ def main():
     parser.add_argument("operation",
                         help="Operation",
                         type=str.lower,
-                        choices=["import-db", "generate-dal", "generate-ddl"])
+                        choices=["import-db", "generate-dal", "generate-ddl", "generate-data", "advise-indexes",
+                                 "compile-dictionary", "watch", "batch"])
     parser.add_argument("--db-connection",
                         help="DB Connection string",
                         dest="db_connection",
@@ -61,6 +272,12 @@ def main():
                         type=str,
                         default="not_set",
                         required=False)
+    parser.add_argument("--batch-manifest",
+                        help="Json file listing the definitions batch generates",
+                        dest="batch_manifest",
+                        type=str,
+                        default="not_set",
+                        required=False)
     parser.add_argument("--output-folder",
                         help="Output folder for generated files",
                         dest="output",
@@ -85,6 +302,85 @@ def main():
                         type=str,
                         default="not_set",
                         required=False)
+    parser.add_argument("--naming-cache",
+                        help="Naming cache file, reused while the dictionaries are unchanged",
+                        dest="naming_cache",
+                        type=str,
+                        default="not_set",
+                        required=False)
+    parser.add_argument("--dictionary-snapshot",
+                        help="Compiled dictionary snapshot file, defaults to the dictionary file with a .snapshot "
+                             "extension",
+                        dest="dictionary_snapshot",
+                        type=str,
+                        default="not_set",
+                        required=False)
+    parser.add_argument("--definition-cache",
+                        help="Keep the parsed definition in a cache file next to it, reused while the definition and "
+                             "dictionaries are unchanged",
+                        dest="definition_cache",
+                        action="store_true",
+                        required=False)
+    parser.add_argument("--force",
+                        help="Regenerate every table, not only the ones that changed since the last run",
+                        dest="force",
+                        action="store_true",
+                        required=False)
+    parser.add_argument("--benchmark",
+                        help="Also generate benchmark.py, which times the generated repositories against SQLite",
+                        dest="benchmark",
+                        action="store_true",
+                        required=False)
+    parser.add_argument("--verify-queries",
+                        help="Explain every generated and custom statement in a scratch SQLite database, and warn or "
+                             "fail on table scans and temp b-trees",
+                        dest="verify_queries",
+                        type=str.lower,
+                        choices=["not_set", "warn", "fail"],
+                        default="not_set",
+                        required=False)
+    parser.add_argument("--verify-report",
+                        help="Json file the query plans of --verify-queries are written to",
+                        dest="verify_report",
+                        type=str,
+                        default="not_set",
+                        required=False)
+    parser.add_argument("--write-indexes",
+                        help="Add the keys advise-indexes proposes to the definition file",
+                        dest="write_indexes",
+                        action="store_true",
+                        required=False)
+    parser.add_argument("--rows",
+                        help="Rows generate-data adds to each table - the tables have to be empty",
+                        dest="rows",
+                        type=int,
+                        default=1000,
+                        required=False)
+    parser.add_argument("--lookup-rows",
+                        help="Rows generate-data adds to the tables that are only referenced by lookups",
+                        dest="lookup_rows",
+                        type=int,
+                        default=100,
+                        required=False)
+    parser.add_argument("--seed",
+                        help="Seed of the generate-data values, the same seed gives the same rows",
+                        dest="seed",
+                        type=int,
+                        default=1,
+                        required=False)
+    parser.add_argument("--batch-size",
+                        help="Rows generate-data inserts and commits at a time",
+                        dest="batch_size",
+                        type=int,
+                        default=10000,
+                        required=False)
+    parser.add_argument("--jobs",
+                        help="Number of worker processes generate-dal spreads the tables over or generate-data fills "
+                             "tables with, or the number of jobs batch runs at a time",
+                        dest="jobs",
+                        type=int,
+                        default=1,
+                        required=False)
     parser.add_argument("--language",
                         help="Language",
                         dest="language",
@@ -97,8 +393,39 @@ def main():
                         type=str,
                         default="not_set",
                         required=False)
+    parser.add_argument("--verbose",
+                        help="Echo the generated code to stdout",
+                        dest="verbose",
+                        action="store_true",
+                        required=False)
+
+    parser.add_argument("--profile",
+                        help="Print the wall time, cpu time and peak memory of every phase at the end",
+                        dest="profile",
+                        action="store_true",
+                        required=False)
+    parser.add_argument("--profile-report",
+                        help="Json file the phase timings are written to",
+                        dest="profile_report",
+                        type=str,
+                        default="not_set",
+                        required=False)
+    parser.add_argument("--profile-stats",
+                        help="File a cProfile of the run is written to, for pstats",
+                        dest="profile_stats",
+                        type=str,
+                        default="not_set",
+                        required=False)
 
     args = parser.parse_args()
+    SourceWriter.echo = args.verbose
+    profiler = None
+    if args.profile or args.profile_report != "not_set" or args.profile_stats != "not_set":
+        profiler = PhaseProfiler(use_cprofile=args.profile_stats != "not_set")
+        profiler.start()
+
+    naming_cache = None if args.naming_cache == "not_set" else get_fullname(args.naming_cache)
+    dictionary_snapshot = None if args.dictionary_snapshot == "not_set" else get_fullname(args.dictionary_snapshot)
     if args.operation == "import-db":
         if args.db_connection == "not_set":
             print("Db connection is required")
@@ -117,7 +444,7 @@ def main():
             exit(1)
 
         import_db(args.db_connection, get_fullname(args.definition_file), get_fullname(args.dictionary),
-                  get_fullname(args.big_dictionary))
+                  get_fullname(args.big_dictionary), naming_cache, dictionary_snapshot)
 
     elif args.operation == "generate-dal":
         if args.definition_file == "not_set":
@@ -148,9 +475,22 @@ def main():
             print("Db Type is required")
             exit(1)
 
-        generate_dal(get_fullname(args.definition_file), get_fullname(args.dictionary),
-                     get_fullname(args.big_dictionary), get_fullname(args.output),
-                     get_fullname(args.template), args.language, args.db_type)
+        if args.benchmark and args.db_type != "sqlite":
+            print("The benchmark runs against SQLite, so it needs --db-type sqlite")
+            exit(1)
+
+        if args.verify_report != "not_set" and args.verify_queries == "not_set":
+            print("A verify report needs --verify-queries")
+            exit(1)
+
+        issue_count = generate_dal(get_fullname(args.definition_file), get_fullname(args.dictionary),
+                                   get_fullname(args.big_dictionary), get_fullname(args.output),
+                                   get_fullname(args.template), args.language, args.db_type, naming_cache,
+                                   dictionary_snapshot, args.definition_cache, args.force, args.jobs, args.benchmark,
+                                   args.verify_queries != "not_set",
+                                   None if args.verify_report == "not_set" else get_fullname(args.verify_report))
+        if args.verify_queries == "fail" and issue_count > 0:
+            exit(1)
 
     elif args.operation == "generate-ddl":
         if args.definition_file == "not_set":
@@ -170,7 +510,125 @@ def main():
             exit(1)
 
         generate_ddl(get_fullname(args.definition_file), get_fullname(args.dictionary),
-                     get_fullname(args.big_dictionary), args.db_type)
+                     get_fullname(args.big_dictionary), args.db_type, naming_cache,
+                     dictionary_snapshot, args.definition_cache)
+
+    elif args.operation == "generate-data":
+        if args.db_connection == "not_set":
+            print("Db connection is required")
+            exit(1)
+
+        if args.definition_file == "not_set":
+            print("Definition filename is required")
+            exit(1)
+
+        if args.dictionary == "not_set":
+            print("Dictionary filename is required")
+            exit(1)
+
+        if args.big_dictionary == "not_set":
+            print("Big Word Dictionary filename is required")
+            exit(1)
+
+        if args.rows < 0 or args.lookup_rows < 0:
+            print("Rows can't be negative")
+            exit(1)
+
+        if args.batch_size < 1:
+            print("Batch size must be at least 1")
+            exit(1)
+
+        generate_data(get_fullname(args.definition_file), get_fullname(args.dictionary),
+                      get_fullname(args.big_dictionary), args.db_connection, args.rows, args.lookup_rows, args.seed,
+                      args.batch_size, naming_cache, dictionary_snapshot, args.definition_cache, args.jobs)
+
+    elif args.operation == "advise-indexes":
+        if args.definition_file == "not_set":
+            print("Definition filename is required")
+            exit(1)
+
+        if args.dictionary == "not_set":
+            print("Dictionary filename is required")
+            exit(1)
+
+        if args.big_dictionary == "not_set":
+            print("Big Word Dictionary filename is required")
+            exit(1)
+
+        advise_indexes(get_fullname(args.definition_file), get_fullname(args.dictionary),
+                       get_fullname(args.big_dictionary), args.write_indexes, naming_cache, dictionary_snapshot)
+
+    elif args.operation == "watch":
+        if args.definition_file == "not_set":
+            print("Definition filename is required")
+            exit(1)
+
+        if args.dictionary == "not_set":
+            print("Dictionary filename is required")
+            exit(1)
+
+        if args.big_dictionary == "not_set":
+            print("Big Word Dictionary filename is required")
+            exit(1)
+
+        if args.output == "not_set":
+            print("Output folder is required")
+            exit(1)
+
+        if args.template == "not_set":
+            print("Template folder is required")
+            exit(1)
+
+        if args.language == "not_set":
+            print("Language is required")
+            exit(1)
+
+        if args.db_type == "not_set":
+            print("Db Type is required")
+            exit(1)
+
+        watch(get_fullname(args.definition_file), get_fullname(args.dictionary), get_fullname(args.big_dictionary),
+              get_fullname(args.output), get_fullname(args.template), args.language, args.db_type, naming_cache,
+              dictionary_snapshot, args.jobs)
+
+    elif args.operation == "compile-dictionary":
+        if args.dictionary == "not_set":
+            print("Dictionary filename is required")
+            exit(1)
+
+        if args.big_dictionary == "not_set":
+            print("Big Word Dictionary filename is required")
+            exit(1)
+
+        compile_dictionary(get_fullname(args.dictionary), get_fullname(args.big_dictionary), dictionary_snapshot)
+
+    elif args.operation == "batch":
+        if args.batch_manifest == "not_set":
+            print("Batch manifest is required")
+            exit(1)
+
+        if args.dictionary == "not_set":
+            print("Dictionary filename is required")
+            exit(1)
+
+        if args.big_dictionary == "not_set":
+            print("Big Word Dictionary filename is required")
+            exit(1)
+
+        succeeded = batch(get_fullname(args.batch_manifest), get_fullname(args.dictionary),
+                          get_fullname(args.big_dictionary), naming_cache, dictionary_snapshot, args.definition_cache,
+                          args.force, args.jobs)
+        if not succeeded:
+            exit(1)
+
+    if profiler is not None:
+        profiler.stop()
+        if args.profile:
+            profiler.print_summary()
+        if args.profile_report != "not_set":
+            profiler.write_report(get_fullname(args.profile_report))
+        if args.profile_stats != "not_set":
+            profiler.write_stats(get_fullname(args.profile_stats))
 
 
 if __name__ == '__main__':
@@ -1,13 +1,51 @@
-from typing import List
+import hashlib
+import json
+import os
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Union, Iterable
 
+from automaton import WordAutomaton, MappedWordAutomaton
+from phases import phases
 from serializer import serializer_instance
-from utils import find_first_in, pascal, get_fullname, find_first_in_array
+from snapshot import SnapshotReader, SnapshotWriter, SnapshotException
+from utils import pascal, get_fullname
 
 
 class Name(object):
+    """ A name and the words it is made of - renderings are worked out once and then reused, so a Name
+    handed out by Naming is shared and must be treated as immutable """
+    __slots__ = ("name", "_words", "_renderings")
+
     def __init__(self, name: str = ""):
         self.name = name
-        self.words: List[str] = list()
+        self._words: List[str] = list()
+        # created on the first rendering, most names in a large model are never rendered
+        self._renderings: Union[Dict[tuple, str], None] = None
+
+    @property
+    def words(self) -> List[str]:
+        return self._words
+
+    @words.setter
+    def words(self, value: List[str]):
+        self._words = value
+        self._renderings = None
+
+    def __getstate__(self):
+        # renderings are rebuilt on demand, so only the name and its words are pickled
+        return self.name, self._words
+
+    def __setstate__(self, state):
+        self.name, self._words = state
+        self._renderings = None
+
+    def _store(self, key: tuple, result: str):
+        if self._renderings is None:
+            self._renderings = dict()
+        self._renderings[key] = result
 
     def raw(self, prefix: str = "", suffix: str = ""):
         return prefix + self.name + suffix
@@ -19,20 +57,48 @@ class Name(object):
         return (prefix + self.name + suffix).lower()
 
     def pascal(self, prefix: str = "", suffix: str = ""):
-        result = "".join([pascal(word) for word in ([prefix] + self.words + [suffix]) if word != ""])
+        key = ("pascal", prefix, suffix)
+        result = None if self._renderings is None else self._renderings.get(key)
+        if result is None:
+            if prefix == "" and suffix == "":
+                result = "".join([pascal(word) for word in self._words])
+            else:
+                result = pascal(prefix) + self.pascal() + pascal(suffix)
+            self._store(key, result)
         return result
 
     def camel(self, prefix: str = "", suffix: str = ""):
-        result = prefix + self.words[0].lower() + "".join(
-            [pascal(word) for word in (self.words[1:] + [suffix]) if word != ""])
+        key = ("camel", prefix, suffix)
+        result = None if self._renderings is None else self._renderings.get(key)
+        if result is None:
+            if prefix == "" and suffix == "":
+                result = self._words[0].lower() + "".join([pascal(word) for word in self._words[1:]])
+            else:
+                result = prefix + self.camel() + pascal(suffix)
+            self._store(key, result)
         return result
 
     def snake(self, prefix: str = "", suffix: str = ""):
-        result = "_".join([word.lower() for word in ([prefix] + self.words + [suffix]) if word != ""])
+        key = ("snake", prefix, suffix)
+        result = None if self._renderings is None else self._renderings.get(key)
+        if result is None:
+            if prefix == "" and suffix == "":
+                result = "_".join([word.lower() for word in self._words])
+            else:
+                result = "_".join([word for word in (prefix.lower(), self.snake(), suffix.lower()) if word != ""])
+            self._store(key, result)
         return result
 
     def upper_snake(self, prefix: str = "", suffix: str = ""):
-        result = "_".join([word.upper() for word in ([prefix] + self.words + [suffix]) if word != ""])
+        key = ("upper_snake", prefix, suffix)
+        result = None if self._renderings is None else self._renderings.get(key)
+        if result is None:
+            if prefix == "" and suffix == "":
+                result = "_".join([word.upper() for word in self._words])
+            else:
+                result = "_".join([word for word in (prefix.upper(), self.upper_snake(), suffix.upper())
+                                   if word != ""])
+            self._store(key, result)
         return result
 
     def __str__(self):
@@ -43,61 +109,385 @@ class Name(object):
 
     def map_to_object(self, obj, serializer):
         self.name = obj
+        self._renderings = None
+
+
+serializer_instance.register_object(Name(), "name:words")
+serializer_instance.register_parser(Name, lambda value, naming: naming.string_to_name(value))
+
+
+class MappedRows(object):
+    """ Read only list of int lists, flattened into one snapshot section """
+
+    def __init__(self, section: memoryview):
+        self._section = section
+        self._count = section[0]
+
+    @staticmethod
+    def flatten(rows: List[List[int]]) -> List[int]:
+        # row count, then the start of each row (plus the end of the last one), then the values
+        values: List[int] = [len(rows)]
+        offset = len(rows) + 2
+        for row in rows:
+            values.append(offset)
+            offset += len(row)
+        values.append(offset)
+        for row in rows:
+            values.extend(row)
+        return values
+
+    def __len__(self):
+        return self._count
 
+    def __getitem__(self, index: int) -> memoryview:
+        return self._section[self._section[index + 1]:self._section[index + 2]]
 
-serializer_instance.register_object(Name())
+    def get(self, index: int, default=None):
+        if index < 0 or index >= self._count or self._section[index + 1] == self._section[index + 2]:
+            return default
+        return self[index]
 
 
 class Naming(object):
-    def __init__(self, dictionary: str, big_dictionary: str):
-        dictionary = get_fullname(dictionary)
-        big_dictionary = get_fullname(big_dictionary)
+    __cache_version__ = 2
+    __snapshot_tag__ = b"DALGDICT"
+    __snapshot_version__ = 1
+    __parallel_threshold__ = 5000
 
+    def __init__(self, dictionary: str, big_dictionary: str, cache_file: str = None, cache_size: int = 65536,
+                 snapshot_file: str = None):
+        self.dictionary_file = get_fullname(dictionary)
+        self.big_dictionary_file = get_fullname(big_dictionary)
+        self.dictionary_hash = Naming.hash_files([self.dictionary_file, self.big_dictionary_file])
+        self.snapshot_file = Naming.get_snapshot_filename(self.dictionary_file) if snapshot_file is None \
+            else get_fullname(snapshot_file)
+
+        # the text files are only read if there is no usable snapshot
+        self._dictionary: Union[List[str], None] = None
+        self._big_dictionary: Union[List[List[str]], None] = None
+        self._automaton: Union[WordAutomaton, MappedWordAutomaton, None] = None
+        self._snapshot: Union[SnapshotReader, None] = None
+        with phases.phase("naming_load", "snapshot"):
+            self._load_snapshot()
+
+        # names by raw name, most recently used last - the lock makes one Naming safe to share between threads,
+        # names are split outside it
+        self.cache_file = cache_file
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, Name] = OrderedDict()
+        self._lock = threading.RLock()
+        if cache_file is not None:
+            with phases.phase("naming_load", "cache"):
+                self.load_cache()
+
+    def __getstate__(self):
+        # locks can't be pickled, and a mapped snapshot is mapped again by the copy rather than pickled
+        state = dict(self.__dict__)
+        del state["_lock"]
+        if self._snapshot is not None:
+            for attribute in ("_snapshot", "_automaton", "_word_count", "_big_words", "_big_word_index"):
+                del state[attribute]
+        return state
+
+    def __setstate__(self, state):
+        mapped = "_snapshot" not in state
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+        if mapped:
+            self._snapshot = None
+            self._automaton = None
+            self._load_snapshot()
+
+    @property
+    def dictionary(self) -> List[str]:
+        if self._dictionary is None:
+            self._read_dictionary()
+        return self._dictionary
+
+    @dictionary.setter
+    def dictionary(self, value: List[str]):
+        self._dictionary = value
+
+    @property
+    def big_dictionary(self) -> List[List[str]]:
+        if self._big_dictionary is None:
+            self._read_big_dictionary()
+        return self._big_dictionary
+
+    @big_dictionary.setter
+    def big_dictionary(self, value: List[List[str]]):
+        self._big_dictionary = value
+
+    def _read_dictionary(self):
         # normal words
-        with open(dictionary, 'r') as dictionary_file:
+        with open(self.dictionary_file, 'r') as dictionary_file:
             lines = dictionary_file.readlines()
 
-        self.dictionary: List[str] = list()
+        self._dictionary = list()
         for line in lines:
-            self.dictionary.append(line.replace("\n", ""))
+            self._dictionary.append(line.replace("\n", ""))
 
-        self.dictionary.sort(key=len, reverse=True)
+        self._dictionary.sort(key=len, reverse=True)
 
+    def _read_big_dictionary(self):
         # big words
-        with open(big_dictionary, 'r') as big_dictionary_file:
+        with open(self.big_dictionary_file, 'r') as big_dictionary_file:
             lines = big_dictionary_file.readlines()
 
-        self.big_dictionary: List[List[str]] = []
+        self._big_dictionary = []
 
         for line in lines:
             line = line.replace("\n", "")
             words = line.split(",")
             words = [line.replace(",", "")] + words
-            self.big_dictionary.append(words)
+            self._big_dictionary.append(words)
+
+    @staticmethod
+    def get_snapshot_filename(dictionary: str) -> str:
+        return os.path.splitext(dictionary)[0] + ".snapshot"
+
+    def _load_snapshot(self):
+        """ Uses the compiled snapshot if it was built from the current dictionaries """
+        if not os.path.exists(self.snapshot_file):
+            return
+
+        try:
+            snapshot = SnapshotReader(self.snapshot_file)
+        except (SnapshotException, ValueError, struct.error):
+            return
+
+        if not snapshot.is_valid(Naming.__snapshot_tag__, Naming.__snapshot_version__, self.dictionary_hash) or \
+                len(snapshot.sections) != WordAutomaton.__section_count__ + 3:
+            return
+
+        sections = snapshot.sections
+        self._snapshot = snapshot
+        self._automaton = MappedWordAutomaton(sections[:WordAutomaton.__section_count__])
+        self._word_count = sections[WordAutomaton.__section_count__][0]
+        self._big_words = MappedRows(sections[WordAutomaton.__section_count__ + 1])
+        self._big_word_index = MappedRows(sections[WordAutomaton.__section_count__ + 2])
+
+    def compile_snapshot(self, snapshot_file: str = None):
+        """ Writes the prebuilt word index for the text dictionaries, for later runs to map instead of parse """
+        if snapshot_file is None:
+            snapshot_file = self.snapshot_file
+
+        automaton = self.automaton
+        if not isinstance(automaton, WordAutomaton):
+            automaton = self._build_automaton()
+
+        writer = SnapshotWriter(Naming.__snapshot_tag__, Naming.__snapshot_version__, self.dictionary_hash)
+        automaton.write_sections(writer)
+        writer.add_array([self._word_count])
+        writer.add_array(MappedRows.flatten(self._big_words))
+        writer.add_array(MappedRows.flatten([self._big_word_index.get(word_id, [])
+                                             for word_id in range(len(automaton.words))]))
+        writer.save(snapshot_file)
+
+    @staticmethod
+    def hash_files(filenames: List[str]) -> str:
+        digest = hashlib.sha256()
+        for filename in filenames:
+            with open(filename, 'rb') as input_file:
+                digest.update(input_file.read())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def load_cache(self):
+        """ Loads the on-disk cache - ignored if it was written for different dictionaries """
+        if not os.path.exists(self.cache_file):
+            return
+
+        try:
+            with open(self.cache_file, 'r') as input_file:
+                obj = json.load(input_file)
+        except ValueError:
+            return
+
+        if obj.get("version") != Naming.__cache_version__ or obj.get("dictionary_hash") != self.dictionary_hash:
+            return
+
+        for value, words in obj["words"].items():
+            name = Name(value)
+            name.words = words
+            self._cache[value] = name
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def save_cache(self):
+        if self.cache_file is None:
+            return
+
+        obj = {
+            "version": Naming.__cache_version__,
+            "dictionary_hash": self.dictionary_hash,
+            "words": self._get_cached_words()
+        }
+        with open(self.cache_file, 'w') as output_file:
+            json.dump(obj, output_file)
+            output_file.flush()
+
+    def _get_cached_words(self) -> Dict[str, List[str]]:
+        with self._lock:
+            return {value: name.words for value, name in self._cache.items()}
+
+    @property
+    def automaton(self) -> WordAutomaton:
+        # built on first use, so a run that is fully served from the cache never needs it
+        if self._automaton is None:
+            with self._lock, phases.phase("naming_load", "dictionary"):
+                if self._automaton is None:
+                    self._build_automaton()
+        return self._automaton
+
+    def _build_automaton(self):
+        # word ids below _word_count are the normal words, in dictionary (longest first) order
+        word_ids: Dict[str, int] = dict()
+        for word in self.dictionary:
+            if word not in word_ids:
+                word_ids[word] = len(word_ids)
+        self._word_count = len(word_ids)
+
+        # big words - the whole word, then its parts
+        self._big_words: List[List[int]] = []
+        self._big_word_index: Dict[int, List[int]] = dict()
+        for words in self.big_dictionary:
+            for word in words:
+                if word not in word_ids:
+                    word_ids[word] = len(word_ids)
+            self._big_words.append([word_ids[word] for word in words])
+            self._big_word_index.setdefault(word_ids[words[0]], []).append(len(self._big_words) - 1)
+
+        self._automaton = WordAutomaton(list(word_ids.keys()))
+        return self._automaton
+
+    @staticmethod
+    def clean(name: str) -> str:
+        return name.strip().lower().replace("_", "").replace("-", "")
 
     def string_to_name(self, name: str) -> Name:
-        value = name.strip().lower().replace("_", "").replace("-", "")
-        found: list[str] = [""] * len(value)
+        with self._lock:
+            result = self._cache.get(name)
+            if result is not None:
+                self._cache.move_to_end(name)
+                return result
 
-        # big words
-        pos, words = find_first_in_array(value, self.big_dictionary)
-        while pos > -1:
-            for i in range(len(words)):
-                found[pos + i] = words[i]
-                value = value.replace(words[i], " " * len(words[i]))
+        return self._add_to_cache(name, self._split_words(Naming.clean(name)))
+
+    def _add_to_cache(self, name: str, words: List[str]) -> Name:
+        with self._lock:
+            # another thread may have split the same name meanwhile - everyone gets the first one
+            result = self._cache.get(name)
+            if result is not None:
+                return result
+
+            result = Name(name)
+            result.words = words
+            self._cache[name] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return result
+
+    def add_names(self, names: Iterable[Name]):
+        """ Primes the memo with names that were resolved elsewhere, such as a cached model """
+        with self._lock:
+            for name in names:
+                if name.name not in self._cache:
+                    self._cache[name.name] = name
+                    if len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
 
-            pos, words = find_first_in_array(value, self.big_dictionary)
+    def string_to_names(self, names: Iterable[str], max_workers: int = None) -> List[Name]:
+        """ string_to_name for a whole batch - each distinct name is split once, and big batches are spread over
+        a process pool """
+        names = list(names)
+        resolved: Dict[str, Name] = dict()
+        missing: List[str] = []
+        with self._lock:
+            for name in names:
+                if name in resolved:
+                    continue
+                result = self._cache.get(name)
+                if result is None:
+                    missing.append(name)
+                    resolved[name] = None
+                else:
+                    resolved[name] = result
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+
+        if len(missing) >= Naming.__parallel_threshold__ and max_workers > 1:
+            chunk_size = -(-len(missing) // (max_workers * 4))
+            chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+            with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                                     initargs=(self.dictionary_file, self.big_dictionary_file,
+                                               self.snapshot_file)) as executor:
+                for chunk, chunk_words in zip(chunks, executor.map(_split_names, chunks)):
+                    for name, words in zip(chunk, chunk_words):
+                        resolved[name] = self._add_to_cache(name, words)
+        else:
+            for name in missing:
+                resolved[name] = self.string_to_name(name)
+
+        return [resolved[name] for name in names]
+
+    def _split_words(self, value: str) -> List[str]:
+        # same result as repeatedly taking the first (big) or longest (normal) word still in the value and blanking
+        # it out, but the occurrences all come from a single pass of the automaton
+        words = self.automaton.words
+        matches = self.automaton.find_all(value)
+        found: List[str] = [""] * len(value)
+        blanked = bytearray(len(value))
+
+        # big words
+        big_words = sorted(index for word_id in matches for index in self._big_word_index.get(word_id, ()))
+        for index in big_words:
+            word_ids = self._big_words[index]
+            pos = Naming._find_unblanked(matches[word_ids[0]], len(words[word_ids[0]]), blanked)
+            if pos > -1:
+                for i in range(1, len(word_ids)):
+                    found[pos + i - 1] = words[word_ids[i]]
+                    Naming._blank(matches.get(word_ids[i], []), len(words[word_ids[i]]), blanked)
 
         # normal words
-        while len(value.strip()) > 0:
-            pos, word = find_first_in(value, self.dictionary)
+        for word_id in sorted(word_id for word_id in matches if word_id < self._word_count):
+            pos = Naming._find_unblanked(matches[word_id], len(words[word_id]), blanked)
             if pos > -1:
-                found[pos] = word
-                value = value.replace(word, " " * len(word))
-            else:
-                raise Exception(f"Not found {value}")
+                found[pos] = words[word_id]
+                Naming._blank(matches[word_id], len(words[word_id]), blanked)
 
-        result = Name(name)
-        result.words = [w for w in found if w != ""]
+        remainder = "".join(" " if blanked[i] else value[i] for i in range(len(value)))
+        if len(remainder.strip()) > 0:
+            raise Exception(f"Not found {remainder}")
 
-        return result
+        return [w for w in found if w != ""]
+
+    @staticmethod
+    def _find_unblanked(starts: List[int], length: int, blanked: bytearray) -> int:
+        for start in starts:
+            if blanked.find(1, start, start + length) == -1:
+                return start
+        return -1
+
+    @staticmethod
+    def _blank(starts: List[int], length: int, blanked: bytearray):
+        # like str.replace - left to right, no overlaps
+        end = 0
+        for start in starts:
+            if start >= end and blanked.find(1, start, start + length) == -1:
+                blanked[start:start + length] = b"\x01" * length
+                end = start + length
+
+
+# process pool workers for Naming.string_to_names - each worker loads its own Naming once
+_worker_naming: Union[Naming, None] = None
+
+
+def _init_worker(dictionary: str, big_dictionary: str, snapshot_file: str):
+    global _worker_naming
+    _worker_naming = Naming(dictionary, big_dictionary, snapshot_file=snapshot_file)
+
+
+def _split_names(names: List[str]) -> List[List[str]]:
+    return [_worker_naming._split_words(Naming.clean(name)) for name in names]
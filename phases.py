@@ -0,0 +1,141 @@
+import cProfile
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Union
+
+
+class PhaseListener(object):
+    """ Receives the phases reported to Phases - a phase can contain other phases, and its times include theirs """
+
+    def phase_started(self, name: str, detail: str):
+        pass
+
+    def phase_ended(self, name: str, detail: str, wall_time: float, cpu_time: float):
+        pass
+
+
+class Phases(object):
+    """ Hooks around the phases of a run (naming load, catalog queries, serialization, generation, file io) -
+    without listeners a phase only costs the context manager """
+
+    def __init__(self):
+        self.listeners: List[PhaseListener] = []
+
+    def add_listener(self, listener: PhaseListener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: PhaseListener):
+        self.listeners.remove(listener)
+
+    @contextmanager
+    def phase(self, name: str, detail: str = ""):
+        if len(self.listeners) == 0:
+            yield
+            return
+
+        listeners = list(self.listeners)
+        for listener in listeners:
+            listener.phase_started(name, detail)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            cpu_time = time.process_time() - cpu_start
+            for listener in reversed(listeners):
+                listener.phase_ended(name, detail, wall_time, cpu_time)
+
+
+phases = Phases()
+
+
+class PhaseProfiler(PhaseListener):
+    """ Records wall time, cpu time and peak traced memory of every phase, and optionally a cProfile of the whole
+    run - memory tracing slows the run down, so the times are best compared with other profiled runs. Phases of
+    several threads nest per thread, but tracemalloc has one peak for the process, so a phase's peak memory then
+    includes what the other threads allocated meanwhile, and cProfile only sees the thread that started it """
+
+    def __init__(self, trace_memory: bool = True, use_cprofile: bool = False):
+        self.trace_memory = trace_memory
+        self.entries: List[Dict[str, Union[str, float, int]]] = []
+        self._profile = cProfile.Profile() if use_cprofile else None
+        # peak memory seen so far by each open phase of a thread - tracemalloc has a single peak, reset when a phase
+        # starts
+        self._local = threading.local()
+        self._started_tracing = False
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        phases.add_listener(self)
+        if self._profile is not None:
+            self._profile.enable()
+
+    def stop(self):
+        if self._profile is not None:
+            self._profile.disable()
+        phases.remove_listener(self)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @property
+    def _peaks(self) -> List[int]:
+        peaks = getattr(self._local, "peaks", None)
+        if peaks is None:
+            peaks = self._local.peaks = []
+        return peaks
+
+    def phase_started(self, name: str, detail: str):
+        if not tracemalloc.is_tracing():
+            return
+        peaks = self._peaks
+        if len(peaks) > 0:
+            peaks[-1] = max(peaks[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        peaks.append(0)
+
+    def phase_ended(self, name: str, detail: str, wall_time: float, cpu_time: float):
+        peak_memory = 0
+        peaks = self._peaks
+        if tracemalloc.is_tracing() and len(peaks) > 0:
+            peak_memory = max(peaks.pop(), tracemalloc.get_traced_memory()[1])
+            if len(peaks) > 0:
+                peaks[-1] = max(peaks[-1], peak_memory)
+
+        self.entries.append({"phase": name, "detail": detail, "wall_time": wall_time, "cpu_time": cpu_time,
+                             "peak_memory": peak_memory})
+
+    def get_summary(self) -> Dict[str, Dict[str, Union[float, int]]]:
+        """ Totals per phase, in the order the phases first ended """
+        summary: Dict[str, Dict[str, Union[float, int]]] = dict()
+        for entry in self.entries:
+            totals = summary.get(entry["phase"])
+            if totals is None:
+                totals = {"count": 0, "wall_time": 0.0, "cpu_time": 0.0, "peak_memory": 0}
+                summary[entry["phase"]] = totals
+            totals["count"] += 1
+            totals["wall_time"] += entry["wall_time"]
+            totals["cpu_time"] += entry["cpu_time"]
+            totals["peak_memory"] = max(totals["peak_memory"], entry["peak_memory"])
+        return summary
+
+    def print_summary(self):
+        print(f"{'phase':<24}{'count':>8}{'wall (s)':>12}{'cpu (s)':>12}{'peak (MiB)':>12}")
+        for name, totals in self.get_summary().items():
+            print(f"{name:<24}{totals['count']:>8}{totals['wall_time']:>12.3f}{totals['cpu_time']:>12.3f}"
+                  f"{totals['peak_memory'] / 1024 / 1024:>12.2f}")
+
+    def write_report(self, report_file: str):
+        with open(report_file, 'w') as output_file:
+            json.dump({"summary": self.get_summary(), "phases": self.entries}, output_file, indent="\t")
+
+    def write_stats(self, stats_file: str):
+        if self._profile is None:
+            raise Exception("The profiler was created without cProfile")
+        self._profile.dump_stats(stats_file)
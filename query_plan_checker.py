@@ -0,0 +1,99 @@
+import json
+import re
+import sqlite3
+from typing import Any, Dict, List
+
+from adaptors.sqlite_adaptor import SqliteAdaptor
+from database_objects import Database, Table, KeyType, DataException
+from naming import Naming
+
+# a full pass over a table or index - scans of constant rows and subquery results are fine
+_table_scan = re.compile(r"^SCAN (TABLE )?(?!CONSTANT ROW|SUBQUERY|\()")
+_temp_btree = re.compile(r"USE TEMP B-TREE")
+_parameter = re.compile(r":(\w+)")
+
+
+class QueryPlan(object):
+    """ The plan SQLite picks for one generated or custom statement, and the steps of it that scan a whole table or
+    sort into a temporary b-tree """
+
+    def __init__(self, table_name: str, name: str, query: str):
+        self.table_name = table_name
+        self.name = name
+        self.query = query
+        self.plan: List[str] = []
+        self.issues: List[str] = []
+        # set when SQLite couldn't prepare the statement, so it wasn't checked
+        self.error = ""
+
+    def map_to_dict(self) -> Dict[str, Any]:
+        return {
+            "table": self.table_name,
+            "name": self.name,
+            "query": self.query,
+            "plan": self.plan,
+            "issues": self.issues,
+            "error": self.error
+        }
+
+
+class QueryPlanChecker(object):
+    """ Builds the schema in a scratch SQLite database and explains every statement the repositories run - fetch by
+    id, exists, update, delete, the get_for_ loaders of each foreign key and the custom queries """
+
+    def __init__(self, naming: Naming):
+        self.adaptor = SqliteAdaptor("memory", naming)
+
+    def get_statements(self, table: Table) -> List[QueryPlan]:
+        # the scripts are escaped to sit in python strings
+        statements = [QueryPlan(table.name.raw(), name, script.replace('\\"', '"')) for name, script in [
+            ("fetch_by_id", self.adaptor.generate_fetch_by_id_script(table)),
+            ("item_exists", self.adaptor.generate_item_exists_script(table)),
+            ("update", self.adaptor.generate_update_script(table)),
+            ("delete", self.adaptor.generate_delete_script(table))]] if table.pk is not None else []
+        for foreign_key in table.get_keys(KeyType.ForeignKey):
+            statements.append(QueryPlan(table.name.raw(), f"get_for_{foreign_key.primary_table}",
+                                        self.adaptor.generate_fetch_by_key_script(table, foreign_key)))
+        for custom_query in table.custom_queries:
+            query = custom_query.query.replace("__table_name__", table.name.raw())
+            statements.append(QueryPlan(table.name.raw(), custom_query.name.raw(),
+                                        self.adaptor.replace_parameters(query)))
+        return statements
+
+    def check(self, database: Database) -> List[QueryPlan]:
+        connection = sqlite3.connect(":memory:")
+        try:
+            tables = self.adaptor.get_ordered_table_list(database)
+            for table in tables:
+                try:
+                    connection.executescript(self.adaptor.generate_create_script(table))
+                except sqlite3.Error as ex:
+                    raise DataException(f"Couldn't create {table.name.raw()} to check its query plans: {ex}")
+
+            plans: List[QueryPlan] = []
+            for table in tables:
+                for plan in self.get_statements(table):
+                    self.explain(connection, plan)
+                    plans.append(plan)
+            return plans
+        finally:
+            connection.close()
+
+    @staticmethod
+    def explain(connection: sqlite3.Connection, plan: QueryPlan):
+        # every parameter is bound to null, which doesn't change the plan
+        parameters = {name: None for name in _parameter.findall(plan.query)}
+        try:
+            rows = connection.execute(f"EXPLAIN QUERY PLAN {plan.query}", parameters).fetchall()
+        except (sqlite3.Error, sqlite3.Warning) as ex:
+            plan.error = str(ex)
+            return
+        plan.plan = [row[3] for row in rows]
+        plan.issues = [detail for detail in plan.plan if _table_scan.match(detail) or _temp_btree.search(detail)]
+
+    @staticmethod
+    def write_report(plans: List[QueryPlan], report_file: str):
+        with open(report_file, 'w') as output_file:
+            json.dump({"statements": [plan.map_to_dict() for plan in plans],
+                       "issue_count": len([plan for plan in plans if len(plan.issues) > 0]),
+                       "error_count": len([plan for plan in plans if plan.error != ""])}, output_file, indent="\t")
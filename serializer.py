@@ -1,19 +1,51 @@
 #!/usr/bin/python3
-import inspect
 import json
+import typing
 from enum import Enum
+from typing import Any, Callable, Dict, List
 
 
 class Serializer(json.JSONEncoder):
     classes = dict()
+    parsers: Dict[type, Callable[[Any, Any], Any]] = dict()
+    plans: Dict[type, Callable[[Any, Any], Any]] = dict()
+    slots: Dict[type, List[str]] = dict()
+    __missing__ = object()
 
     def default(self, o):  # pylint: disable=E0202
         if hasattr(o, 'json'):
             return o.json()
         if hasattr(o, '__dict__'):
             return o.__dict__
+        if hasattr(type(o), '__slots__'):
+            return self.get_attributes(o)
         return str(o)
 
+    def get_slots(self, cls) -> List[str]:
+        """ Public slot names of cls and its bases, in declaration order """
+        slots = self.slots.get(cls)
+        if slots is None:
+            slots = []
+            for base in reversed(cls.__mro__):
+                names = base.__dict__.get("__slots__", ())
+                for name in [names] if isinstance(names, str) else names:
+                    if not name.startswith("_") and name not in slots:
+                        slots.append(name)
+            self.slots[cls] = slots
+        return slots
+
+    def get_attributes(self, obj) -> dict:
+        """ Public attributes of a plain or slotted object - unset slots are left out """
+        if hasattr(obj, '__dict__'):
+            return {k: v for (k, v) in obj.__dict__.items() if not k.startswith("_")}
+        missing = Serializer.__missing__
+        attributes = dict()
+        for name in self.get_slots(type(obj)):
+            value = getattr(obj, name, missing)
+            if value is not missing:
+                attributes[name] = value
+        return attributes
+
     @staticmethod
     def get_object_signature(_dict):
         return ':'.join(sorted(_dict.keys()))
@@ -24,21 +56,81 @@ class Serializer(json.JSONEncoder):
 
     def register_object(self, obj, signature=""):
         if signature == "":
-            signature = self.get_object_signature(obj.__dict__)
+            signature = self.get_object_signature(obj.__dict__ if hasattr(obj, '__dict__') else
+                                                  self.get_attributes(obj))
         self.classes[signature] = type(obj)
 
     def register_class(self, cls, signature=""):
+        annotations = cls.__dict__.get("__annotations__", {})
         if signature == "":
-            sig = [s for s in inspect.getmembers(cls) if s[0] == "__annotations__"]
-            signature = self.get_class_signature(sig[0][1])
+            signature = self.get_class_signature(annotations)
         self.classes[signature] = cls
+        if cls not in self.plans:
+            self.plans[cls] = self.compile_plan(cls)
+
+    def register_parser(self, cls, parser: Callable[[Any, Any], Any]):
+        """ parser(value, extra) builds an instance of cls from its serialized value """
+        self.parsers[cls] = parser
+
+    def compile_plan(self, cls) -> Callable[[Any, Any], Any]:
+        """ Builds decode(obj, extra) for cls - straight line code that reads each annotated attribute from its key
+        and converts it with the parser or nested plan for its type, worked out once """
+        namespace = {"cls": cls, "plans": self.plans, "missing": Serializer.__missing__}
+        lines = ["def decode(obj, extra):", "    new_obj = cls()"]
+        for key, hint in typing.get_type_hints(cls).items():
+            if key.startswith("_"):
+                continue
+            expression = self.compile_expression(hint, "value", namespace, 0)
+            lines.append(f"    value = obj.get({key!r}, missing)")
+            lines.append("    if value is not missing:")
+            if expression == "value":
+                lines.append(f"        new_obj.{key} = value")
+            else:
+                lines.append(f"        new_obj.{key} = None if value is None else {expression}")
+        lines.append("    return new_obj")
+
+        exec("\n".join(lines), namespace)
+        return namespace["decode"]
+
+    def compile_expression(self, hint, value: str, namespace: dict, depth: int) -> str:
+        origin = typing.get_origin(hint)
+        if origin is typing.Union:
+            hints = [h for h in typing.get_args(hint) if h is not type(None)]
+            return self.compile_expression(hints[0], value, namespace, depth) if len(hints) == 1 else value
+
+        if origin is list:
+            args = typing.get_args(hint)
+            item = f"item_{depth}"
+            expression = self.compile_expression(args[0], item, namespace, depth + 1) if len(args) > 0 else item
+            if expression == item:
+                return f"list({value})"
+            return f"[None if {item} is None else {expression} for {item} in {value}]"
+
+        if hint in self.parsers:
+            parser = f"parser_{len(namespace)}"
+            namespace[parser] = self.parsers[hint]
+            return f"{parser}({value}, extra)"
+
+        if isinstance(hint, type) and hint.__module__ != "builtins" and not issubclass(hint, Enum):
+            # nested classes may register after this one, so their plan is looked up when decoding
+            nested = f"nested_{len(namespace)}"
+            namespace[nested] = hint
+            return f"plans[{nested}]({value}, extra)"
+
+        return value
+
+    def decode(self, obj, cls, extra=None):
+        """ Compiled counterpart of map_to_object - runs the plan for cls instead of matching signatures """
+        return self.plans[cls](obj, extra)
 
     def serialize(self, obj, pretty: bool = False):
         d = self.map_to_dict(obj)
         return json.dumps(d, cls=Serializer, indent="\t" if pretty else None)
 
-    def de_serialize(self, json_data, extra=None):
+    def de_serialize(self, json_data, extra=None, cls=None):
         obj = json.loads(json_data)
+        if cls is not None and cls in self.plans:
+            return self.decode(obj, cls, extra)
         obj = self.map_to_object(obj, extra=extra)
         return obj
 
@@ -61,8 +153,8 @@ class Serializer(json.JSONEncoder):
                 d = obj.map_to_dict(self)
                 if not isinstance(d, dict):
                     return d
-            elif hasattr(obj, '__dict__'):
-                d = {k: v for (k, v) in obj.__dict__.items() if not k.startswith("_")}
+            elif hasattr(obj, '__dict__') or hasattr(type(obj), '__slots__'):
+                d = self.get_attributes(obj)
             else:
                 return obj
         else:
@@ -95,17 +187,24 @@ class Serializer(json.JSONEncoder):
             if hasattr(new_obj, 'map_to_object'):
                 new_obj.map_to_object(obj, self, extra)
                 must_remap_properties = False
-            else:
+            elif hasattr(new_obj, '__dict__'):
                 for key in new_obj.__dict__.keys():
                     new_obj.__dict__[key] = obj.get(key, "")
+            else:
+                for key in self.get_slots(clas):
+                    setattr(new_obj, key, obj.get(key, ""))
 
             obj = new_obj
 
         if must_remap_properties:
             if isinstance(obj, dict):
                 props = obj
-            else:
+            elif hasattr(obj, '__dict__'):
                 props = obj.__dict__
+            else:
+                for key, value in self.get_attributes(obj).items():
+                    setattr(obj, key, self.map_to_object(value, extra=extra))
+                return obj
 
             for child in props:
                 props[child] = self.map_to_object(props[child], extra=extra)
@@ -0,0 +1,88 @@
+import mmap
+import os
+import struct
+from array import array
+from typing import List
+
+
+class SnapshotException(Exception):
+    pass
+
+
+class SnapshotWriter(object):
+    """ Writes a list of int32 arrays and byte blobs to a file that SnapshotReader can map without parsing """
+    __header__ = struct.Struct("<8sI64sI")
+    __section__ = struct.Struct("<IQQ")
+    __array_section__ = 1
+    __bytes_section__ = 2
+
+    def __init__(self, tag: bytes, version: int, source_hash: str):
+        self.tag = tag
+        self.version = version
+        self.source_hash = source_hash
+        self.sections: List[tuple[int, bytes, int]] = []
+
+    def add_array(self, values: List[int]):
+        data = array("i", values)
+        self.sections.append((SnapshotWriter.__array_section__, data.tobytes(), len(data)))
+
+    def add_bytes(self, data: bytes):
+        self.sections.append((SnapshotWriter.__bytes_section__, data, len(data)))
+
+    def save(self, filename: str):
+        offset = SnapshotWriter.__header__.size + SnapshotWriter.__section__.size * len(self.sections)
+        table: List[bytes] = []
+        body: List[bytes] = []
+        for kind, data, count in self.sections:
+            # keep every section 8 byte aligned so the arrays can be cast in place
+            padding = -offset % 8
+            body.append(b"\0" * padding)
+            offset += padding
+            table.append(SnapshotWriter.__section__.pack(kind, offset, count))
+            body.append(data)
+            offset += len(data)
+
+        # written next to the snapshot and moved over it, so an interrupted save leaves the old one in place
+        temp_file = filename + ".tmp"
+        with open(temp_file, 'wb') as output_file:
+            output_file.write(SnapshotWriter.__header__.pack(self.tag, self.version, self.source_hash.encode("ascii"),
+                                                             len(self.sections)))
+            output_file.write(b"".join(table))
+            output_file.write(b"".join(body))
+        os.replace(temp_file, filename)
+
+
+class SnapshotReader(object):
+    """ Memory maps a file written by SnapshotWriter - sections are views on the map, nothing is copied """
+
+    def __init__(self, filename: str):
+        with open(filename, 'rb') as input_file:
+            self._map = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buffer = memoryview(self._map)
+        header = SnapshotWriter.__header__
+        if len(buffer) < header.size:
+            raise SnapshotException("Snapshot truncated")
+
+        tag, self.version, source_hash, count = header.unpack_from(buffer, 0)
+        self.tag = tag
+        self.source_hash = source_hash.decode("ascii")
+
+        if len(buffer) < header.size + SnapshotWriter.__section__.size * count:
+            raise SnapshotException("Snapshot truncated")
+
+        self.sections: List[memoryview] = []
+        for i in range(count):
+            kind, offset, length = SnapshotWriter.__section__.unpack_from(buffer, header.size +
+                                                                          SnapshotWriter.__section__.size * i)
+            size = length * 4 if kind == SnapshotWriter.__array_section__ else length
+            # checked before slicing, as a cast of a short slice fails with a TypeError
+            if offset + size > len(buffer):
+                raise SnapshotException("Snapshot truncated")
+            if kind == SnapshotWriter.__array_section__:
+                self.sections.append(buffer[offset:offset + size].cast("i"))
+            else:
+                self.sections.append(buffer[offset:offset + size])
+
+    def is_valid(self, tag: bytes, version: int, source_hash: str) -> bool:
+        return self.tag == tag and self.version == version and self.source_hash == source_hash
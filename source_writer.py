@@ -1,22 +1,44 @@
-from typing import TextIO
+import os
+from typing import List
+
+from phases import phases
 
 
 class SourceWriter(object):
+    """ Renders a source file in memory - on close the file is only replaced when its content changed, so unchanged
+    files keep their modification times """
     __indent_level__ = 4
+    # echo every line to stdout as well (--verbose)
+    echo = False
 
-    def __init__(self, file: TextIO):
-        self.file = file
+    def __init__(self, filename: str):
+        self.filename = filename
         self.indent_prefix = ""
+        self._lines: List[str] = []
 
     def __enter__(self):
         return self
 
     def __exit__(self, type, value, traceback):
-        self.close()
+        # a file that failed half way through is left as it was
+        if type is None:
+            self.close()
+
+    def get_text(self) -> str:
+        return "".join(self._lines)
 
     def close(self):
-        self.file.flush()
-        self.file.close()
+        with phases.phase("file_io", self.filename):
+            text = self.get_text()
+            if os.path.exists(self.filename) and os.path.getsize(self.filename) == len(text.encode()):
+                with open(self.filename, 'r') as input_file:
+                    if input_file.read() == text:
+                        return
+
+            temp_file = self.filename + ".tmp"
+            with open(temp_file, 'w') as output_file:
+                output_file.write(text)
+            os.replace(temp_file, self.filename)
 
     def indent(self):
         self.indent_prefix = self.indent_prefix + (" " * self.__indent_level__)
@@ -28,18 +50,20 @@ class SourceWriter(object):
         return self.indent_prefix
 
     def writeln(self, line: str = ""):
-        self.file.write(self.indent_prefix)
-        self.file.write(line)
-        self.file.write("\n")
-
-        print(self.indent_prefix + line)
+        self.writeln_absolute(self.indent_prefix, line)
 
     def writeln_absolute(self, prefix, line: str = ""):
-        self.file.write(prefix)
-        self.file.write(line)
-        self.file.write("\n")
+        self._lines.append(f"{prefix}{line}\n")
+
+        if SourceWriter.echo:
+            print(prefix + line)
+
+    def write(self, text: str):
+        """ Text rendered elsewhere, with its own indents and line ends """
+        self._lines.append(text)
 
-        print(prefix + line)
+        if SourceWriter.echo:
+            print(text, end="")
 
     def writeln_wrap(self, max_length: int, next_line_start: int, line: str):
         # temp_line = line
@@ -0,0 +1,165 @@
+import ast
+import builtins
+import hashlib
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+from database_objects import DataException
+
+_substitution = re.compile(r"{{(.*?)}}")
+_control = re.compile(r"^\s*%")
+_block_start = re.compile(r"^(for|if|elif)\s+(.*):$")
+
+
+class Template(object):
+    """ A line based text template, compiled once into a python function - text lines are copied with their
+    {{ expression }} parts filled in from the context, and lines starting with % are control lines:
+        % for <target> in <expression>:    % if/elif <expression>:    % else:    % end    %# comment
+    Control lines only steer the output and never write anything, so they can be indented freely """
+
+    def __init__(self, text: str, name: str = "<template>"):
+        self.name = name
+        self.text = text
+        self.hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self.parameters: List[str] = []
+        self._render: Callable[[Dict[str, Any]], str] = self._compile(text)
+
+    def __getstate__(self):
+        # the compiled function can't be pickled, so a template is compiled again when it's unpickled
+        return {"text": self.text, "name": self.name}
+
+    def __setstate__(self, state: Dict[str, str]):
+        self.__init__(state["text"], state["name"])
+
+    def render(self, context: Dict[str, Any]) -> str:
+        try:
+            return self._render(context)
+        except KeyError as ex:
+            raise DataException(f"Template {self.name} has no value for {ex}")
+
+    def _error(self, line_number: int, message: str) -> DataException:
+        return DataException(f"Template {self.name} line {line_number}: {message}")
+
+    def _parse(self, line_number: int, source: str, mode: str = "eval") -> ast.AST:
+        try:
+            return ast.parse(source.strip(), mode=mode)
+        except SyntaxError as ex:
+            raise self._error(line_number, f"{ex.msg} in '{source.strip()}'")
+
+    def _compile(self, text: str) -> Callable[[Dict[str, Any]], str]:
+        body: List[str] = []
+        # literal text and expressions waiting to be appended, merged into one extend call
+        pieces: List[str] = []
+        literal: List[str] = []
+        loaded: Set[str] = set()
+        stored: Set[str] = set()
+        # (keyword, line number, has a statement) of every open block
+        blocks: List[List[Any]] = []
+
+        def emit(statement: str):
+            body.append("    " * (len(blocks) + 1) + statement)
+            if len(blocks) > 0:
+                blocks[-1][2] = True
+
+        def flush():
+            if len(literal) > 0:
+                pieces.append(repr("".join(literal)))
+                literal.clear()
+            if len(pieces) > 0:
+                emit(f"_extend(({', '.join(pieces)},))")
+                pieces.clear()
+
+        def add_names(node: ast.AST):
+            for child in ast.walk(node):
+                if isinstance(child, ast.Name):
+                    (stored if isinstance(child.ctx, ast.Store) else loaded).add(child.id)
+
+        for line_number, line in enumerate(text.splitlines(), 1):
+            if not _control.match(line):
+                position = 0
+                for match in _substitution.finditer(line):
+                    literal.append(line[position:match.start()])
+                    before = "".join(literal)
+                    literal.clear()
+                    if before != "":
+                        pieces.append(repr(before))
+                    expression = match.group(1).strip()
+                    add_names(self._parse(line_number, expression))
+                    pieces.append(f"_str({expression})")
+                    position = match.end()
+                literal.append(line[position:] + "\n")
+                continue
+
+            statement = line.strip()[1:].strip()
+            if statement.startswith("#"):
+                continue
+            flush()
+
+            if statement == "end":
+                if len(blocks) == 0:
+                    raise self._error(line_number, "% end without a block")
+                if not blocks[-1][2]:
+                    emit("pass")
+                blocks.pop()
+                continue
+
+            if statement == "else:" or statement.startswith("elif"):
+                if len(blocks) == 0 or blocks[-1][0] not in ("if", "elif"):
+                    raise self._error(line_number, f"% {statement} without % if")
+                if not blocks[-1][2]:
+                    emit("pass")
+                blocks.pop()
+
+            if statement == "else:":
+                emit("else:")
+                blocks.append(["else", line_number, False])
+                continue
+
+            match = _block_start.match(statement)
+            if match is None:
+                raise self._error(line_number, f"unknown control line '% {statement}'")
+            keyword, expression = match.groups()
+            if keyword == "for":
+                node = self._parse(line_number, f"for {expression}: pass", "exec").body[0]
+                add_names(node.target)
+                add_names(node.iter)
+            else:
+                add_names(self._parse(line_number, expression))
+            emit(f"{keyword} {expression.strip()}:")
+            blocks.append([keyword, line_number, False])
+
+        flush()
+        if len(blocks) > 0:
+            raise self._error(blocks[-1][1], f"% {blocks[-1][0]} without % end")
+
+        # every free name is read from the context once, at the start of the render
+        self.parameters = sorted(name for name in loaded - stored if not hasattr(builtins, name))
+        lines = ["def _render(_context):"] + \
+                [f"    {name} = _context[{name!r}]" for name in self.parameters] + \
+                ["    _out = []", "    _extend = _out.extend"] + body + ["    return ''.join(_out)"]
+        namespace: Dict[str, Any] = {"_str": str}
+        exec(compile("\n".join(lines), f"<template {self.name}>", "exec"), namespace)
+        return namespace["_render"]
+
+
+# compiled templates by filename, with the modification time and size they were compiled from
+_template_cache: Dict[str, Tuple[Tuple[int, int], Template]] = dict()
+_template_cache_lock = threading.Lock()
+
+
+def load_template(filename: str) -> Template:
+    """ The compiled template in the file - a template is only compiled again once its file changed """
+    stat = os.stat(filename)
+    state = (stat.st_mtime_ns, stat.st_size)
+    with _template_cache_lock:
+        cached = _template_cache.get(filename)
+    if cached is not None and cached[0] == state:
+        return cached[1]
+
+    with open(filename, 'r') as input_file:
+        template = Template(input_file.read(), os.path.basename(filename))
+    with _template_cache_lock:
+        _template_cache[filename] = (state, template)
+    return template
@@ -0,0 +1,238 @@
+%# crud benchmark of the generated repositories - one module for the whole schema, next to entities and repositories
+""" Times the generated repositories against a local SQLite database - add, get_by_id, exists, update, delete and
+the custom queries of every table, at each concurrency level. Exits with 1 when an operation failed, or when
+throughput dropped below a baseline by more than the threshold """
+import argparse
+import itertools
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from base.repository_base import RepositoryBase
+from base.session import Session, SessionFactory
+% for table in tables:
+from entities.{{table["module"]}} import {{table["class_name"]}}
+% end
+% for table in tables:
+from repositories.{{table["module"]}}_repository import {{table["class_name"]}}Repository
+% end
+
+start_date = datetime(2000, 1, 1)
+picker = random.Random(1)
+
+
+def pick(added: Dict[str, List[Any]], table_name: str, field: str, default: Any) -> Any:
+    """ The field of a row already added to the table, so references point at existing rows """
+    items = added.get(table_name)
+    if not items:
+        return default
+    return getattr(picker.choice(items), field)
+
+
+% for table in tables:
+def make_{{table["module"]}}(i: int, added: Dict[str, List[Any]]) -> {{table["class_name"]}}:
+    return {{table["class_name"]}}({{", ".join(f"{name}={value}" for name, value in table["arguments"])}})
+
+
+% end
+def get_repositories() -> Dict[str, RepositoryBase]:
+    repositories: Dict[str, RepositoryBase] = {
+% for table in tables:
+        "{{table["name"]}}": {{table["class_name"]}}Repository({{", ".join(["None"] * len(table["references"]))}}),
+% end
+    }
+% for table in tables:
+  % for name, table_name in table["references"]:
+    repositories["{{table["name"]}}"].{{name}}_repo = repositories["{{table_name}}"]
+  % end
+% end
+    return repositories
+
+
+class BenchmarkTable(object):
+    def __init__(self, name: str, make: Callable[[int, Dict[str, List[Any]]], Any], get_id: Callable[[Any], tuple],
+                 update: Callable[[Any, int], None], queries: List[Tuple[str, Callable]]):
+        self.name = name
+        self.make = make
+        self.get_id = get_id
+        self.update = update
+        self.queries = queries
+
+
+tables = [
+% for table in tables:
+    BenchmarkTable("{{table["name"]}}", make_{{table["module"]}},
+                   lambda item: ({{"".join(f"item.{name}, " for name in table["id_fields"])}}),
+    % if table["update"] is None:
+                   None,
+    % else:
+                   lambda item, i: setattr(item, "{{table["update"][0]}}", {{table["update"][1]}}),
+    % end
+                   [
+    % for name, arguments in table["queries"]:
+                       ("{{name}}", lambda repository, session, item, i: repository.{{name}}(session{{arguments}})),
+    % end
+                   ]),
+% end
+]
+
+
+def run_stage(connection_string: str, items: List[Any], concurrency: int,
+              operation: Callable[[Session, Any, int], None]) -> Dict[str, Any]:
+    """ Runs the operation once per item, spread over concurrency threads with a session each - every operation is
+    committed on its own, as an application would """
+    def work(chunk: List[Tuple[int, Any]]) -> Tuple[List[float], List[str], List[int]]:
+        latencies: List[float] = []
+        errors: List[str] = []
+        succeeded: List[int] = []
+        with SessionFactory.connect(connection_string) as session:
+            for i, item in chunk:
+                start = time.perf_counter()
+                try:
+                    operation(session, item, i)
+                    session.connection.commit()
+                    succeeded.append(i)
+                except Exception as ex:
+                    session.connection.rollback()
+                    errors.append(f"{type(ex).__name__}: {ex}")
+                latencies.append(time.perf_counter() - start)
+        return latencies, errors, succeeded
+
+    indexed = list(enumerate(items))
+    chunks = [indexed[worker::concurrency] for worker in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(work, chunks))
+    seconds = time.perf_counter() - start
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    errors = [error for result in results for error in result[1]]
+    succeeded = sorted(i for result in results for i in result[2])
+    return {
+        "operations": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if len(errors) > 0 else "",
+        "ops_per_second": len(latencies) / seconds if seconds > 0 else 0.0,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if len(latencies) > 0 else 0.0,
+        "p99_ms": latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] * 1000 if len(latencies) > 0 else 0.0,
+        "succeeded": succeeded
+    }
+
+
+def create_database(filename: str):
+    connection = sqlite3.connect(filename)
+    connection.execute("PRAGMA journal_mode=WAL")
+    for repository in get_repositories().values():
+        connection.executescript(repository.__table__.__create_script__)
+    connection.commit()
+    connection.close()
+
+
+def run(connection_string: str, operations: int, concurrency_levels: List[int]) -> Dict[str, Dict[str, Any]]:
+    repositories = get_repositories()
+    results: Dict[str, Dict[str, Any]] = dict()
+    counter = 0
+    # updates count down, so updated values never clash with added ones in unique keys
+    update_counter = itertools.count(-1, -1)
+
+    def record(key: str, stage: Dict[str, Any]):
+        stage.pop("succeeded")
+        results[key] = stage
+        print(f"{key:<56}{stage['ops_per_second']:>10.0f}/s  p50 {stage['p50_ms']:8.3f}ms  "
+              f"p99 {stage['p99_ms']:8.3f}ms" + (f"  {stage['errors']} errors, first: {stage['first_error']}"
+                                                  if stage["errors"] > 0 else ""))
+
+    for concurrency in concurrency_levels:
+        added: Dict[str, List[Any]] = dict()
+        for table in tables:
+            repository = repositories[table.name]
+            items = [table.make(i, added) for i in range(counter, counter + operations)]
+            counter += operations
+
+            stage = run_stage(connection_string, items, concurrency,
+                              lambda session, item, i: repository.add(session, item))
+            added[table.name] = [items[i] for i in stage["succeeded"]]
+            record(f"{concurrency}/{table.name}/add", stage)
+            if len(added[table.name]) == 0:
+                continue
+            items = [added[table.name][i % len(added[table.name])] for i in range(operations)]
+
+            record(f"{concurrency}/{table.name}/get_by_id",
+                   run_stage(connection_string, items, concurrency,
+                             lambda session, item, i: repository.get_by_id(session, *table.get_id(item))))
+            record(f"{concurrency}/{table.name}/exists",
+                   run_stage(connection_string, items, concurrency,
+                             lambda session, item, i: repository.exists(session, *table.get_id(item))))
+            if table.update is not None:
+                def update(session: Session, item: Any, i: int):
+                    table.update(item, next(update_counter))
+                    repository.update(session, item)
+
+                record(f"{concurrency}/{table.name}/update", run_stage(connection_string, items, concurrency, update))
+            for name, query in table.queries:
+                record(f"{concurrency}/{table.name}/{name}",
+                       run_stage(connection_string, items, concurrency,
+                                 lambda session, item, i: query(repository, session, item, i)))
+
+        # children before the rows they reference
+        for table in reversed(tables):
+            repository = repositories[table.name]
+            if len(added.get(table.name, [])) > 0:
+                record(f"{concurrency}/{table.name}/delete",
+                       run_stage(connection_string, added[table.name], concurrency,
+                                 lambda session, item, i: repository.delete(session, *table.get_id(item))))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the generated repositories against SQLite")
+    parser.add_argument("--operations", dest="operations", type=int, default=200, required=False,
+                        help="Operations per table, operation and concurrency level")
+    parser.add_argument("--concurrency", dest="concurrency", type=str, default="1,4", required=False,
+                        help="Comma separated numbers of threads")
+    parser.add_argument("--seed", dest="seed", type=int, default=1, required=False)
+    parser.add_argument("--output", dest="output", type=str, default="not_set", required=False,
+                        help="Json file the results are written to")
+    parser.add_argument("--baseline", dest="baseline", type=str, default="not_set", required=False,
+                        help="Json results of an earlier run - exits with 1 when throughput regressed")
+    parser.add_argument("--threshold", dest="threshold", type=float, default=0.2, required=False,
+                        help="Fraction throughput may drop below the baseline")
+    args = parser.parse_args()
+    picker.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "benchmark.db")
+        create_database(filename)
+        results = run(f"sqlite://{filename}", args.operations,
+                      [int(level) for level in args.concurrency.split(",") if level != ""])
+
+    if args.output != "not_set":
+        with open(args.output, 'w') as output_file:
+            json.dump({"operations": args.operations, "results": results}, output_file, indent="\t")
+
+    failed = [key for key, stage in results.items() if stage["errors"] > 0]
+    if args.baseline != "not_set":
+        with open(args.baseline, 'r') as input_file:
+            baseline = json.load(input_file)["results"]
+        for key, stage in results.items():
+            base_stage = baseline.get(key)
+            if base_stage is not None and \
+                    stage["ops_per_second"] < base_stage["ops_per_second"] * (1 - args.threshold):
+                print(f"regression {key}: {base_stage['ops_per_second']:.0f}/s -> {stage['ops_per_second']:.0f}/s")
+                failed.append(key)
+
+    if len(failed) > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+%# the entity of a table - blank lines inside the class keep the class indentation
+from datetime import datetime
+from typing import List
+from base.table_base import TableBase
+% for module, class_name in imports:
+from entities.{{module}} import {{class_name}}
+% end
+
+
+class {{entity}}(TableBase):
+    __table_name__ = "{{table_name}}"
+    __drop_script__ = {{drop_script}}
+    __create_script__ = {{create_script}}
+    __table_exists_script__ = {{table_exists_script}}
+    __table_count_script__ = {{table_count_script}}
+    __insert_script__ = {{insert_script}}
+    __update_script__ = {{update_script}}
+    __delete_script__ = {{delete_script}}
+    __fetch_by_id_script__ = {{fetch_by_id_script}}
+    __item_exists_script__ = {{item_exists_script}}
+    
+% for name, python_type, default in fields:
+    {{name}}: {{python_type}} = {{default}}
+% end
+    
+% for name, class_name, key_name in lookups:
+    {{name}}: {{class_name}} #{{key_name}}
+% end
+% for name, class_name, key_name in children:
+    {{name}}: List[{{class_name}}] # {{key_name}}
+% end
+    
+    def __init__({{init_parameters}}):
+% for name, python_type, default in fields:
+        self.{{name}} = {{name}}
+% end
+% for name, class_name, key_name in lookups:
+        self.{{name}} = None
+% end
+% for name, class_name, key_name in children:
+        self.{{name}}: List[{{class_name}}] = list()
+% end
+    
+    def map_row(self, row) -> TableBase:
+% for name, value in row_values:
+        self.{{name}} = {{value}}
+% end
+        return self
+    
+    def get_insert_params(self) -> {}:
+        return {{insert_parameters}}
+    
+    def get_update_params(self) -> {}:
+        return {{update_parameters}}
+    
+# end-autogenerated
+% for line in custom_code:
+{{line}}
+% end
@@ -0,0 +1,82 @@
+%# the repository of a table - blank lines inside the class keep the indentation of the code above them
+from datetime import datetime
+from typing import Optional
+
+from base.table_base import TableBase
+from base.session import Session
+from base.repository_base import RepositoryBase
+from entities.{{entity_module}} import {{entity}}
+% for name, class_name in references:
+from repositories.{{name}}_repository import {{class_name}}Repository
+% end
+
+
+class {{entity}}Repository(RepositoryBase):
+    __table__ = {{entity}}
+% for name, class_name in references:
+    {{name}}_repo: {{class_name}}Repository
+% end
+    
+    def __init__({{init_parameters}}):
+% for name, class_name in references:
+        self.{{name}}_repo = {{name}}_repo
+% end
+% if len(references) == 0:
+        pass
+% end
+        
+    def get_by_id({{id_parameters}}):
+        item: {{entity}} = self._get_by_id(session, {{id_values}})
+% for name, values in lookup_loads:
+        item.{{name}} = self.{{name}}_repo.get_by_id(session, {{values}})
+% end
+% for name, values in child_loads:
+        item.{{name}} = self.{{name}}_repo.get_for_{{entity_module}}(session, {{values}})
+% end
+        return item
+        
+    def exists({{id_parameters}}):
+        return self._item_exists(session, {{id_values}})
+        
+    def delete({{id_parameters}}):
+        self._delete(session, {{id_values}})
+        
+    def add(self, session: Session, item: {{entity}}):
+% if auto_id is not None:
+        {{auto_id}} = self._execute_lastrowid(session, item.__insert_script__, item.get_insert_params())
+        item.{{auto_id}} = {{auto_id}}
+% else:
+        self._execute(session, item.__insert_script__, item.get_insert_params())
+% end
+% for name, assignments in child_adds:
+        for {{name}} in item.{{name}}:
+  % for field, value in assignments:
+            {{name}}.{{field}} = item.{{value}}
+  % end
+            self.{{name}}_repo.add(session, {{name}})
+% end
+    
+% for name, parameters, query_type, query, values in queries:
+    def {{name}}({{parameters}}):
+  % if query_type == QueryType.Execute:
+        self._execute(session, {{query}}, parameters={{values}})
+  % elif query_type == QueryType.FetchScalar:
+        return self._fetch_scalar(session, {{query}}, parameters={{values}})
+  % elif query_type == QueryType.FetchOne:
+        result = self.fetch_one(session, {{query}}, parameters={{values}})
+        return result
+  % else:
+        result = self.fetch(session, {{query}}, parameters={{values}})
+        return result
+  % end
+    
+% end
+% for name, parameters, query, values in parents:
+    def get_for_{{name}}(self, session: Session, {{parameters}}):
+        return self.fetch(session, {{query}}, parameters={{values}})
+    
+% end
+# end-autogenerated
+% for line in custom_code:
+{{line}}
+% end
@@ -1,7 +1,35 @@
 import inspect
+import json
+import os
+import pickle
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
 
-from naming import Naming
+from automaton import MappedWordAutomaton, WordAutomaton
+from batch_manifest import load_batch_manifest
+from data_generator import DataGenerator
+from database_objects import Database, KeyType, FieldType, Table, Field, Key, DataException
+from adaptors.adaptor import Adaptor
+from adaptors.adaptor_factory import AdaptorFactory
+from definition_cache import DefinitionCache
+from definition_stream import DefinitionReader, DefinitionWriter
+from file_watcher import FileWatcher
+from generation_manifest import GenerationManifest
+from generators.generator import default_template_folder
+from generators.python_generator import PythonGenerator
+from index_advisor import IndexAdvisor
+from naming import Naming, Name
+from phases import phases, PhaseProfiler
+from query_plan_checker import QueryPlanChecker
+from serializer import serializer_instance
+from source_writer import SourceWriter
+from template_engine import Template
 
 
 class TestClass:
@@ -44,6 +72,54 @@ class NamingTests(unittest.TestCase):
         self.assertEqual(result.snake(), "scan_interest_rates")
         self.assertEqual(result.upper_snake(), "SCAN_INTEREST_RATES")
 
+    def testseparated_name(self):
+        name_value = "Account_Status"
+        result = self.naming.string_to_name(name_value)
+        self.assertEqual(result.raw(), "Account_Status")
+        self.assertEqual(result.words, ["account", "status"])
+        self.assertEqual(result.snake(), "account_status")
+
+    def testunknown_name(self):
+        with self.assertRaises(Exception):
+            self.naming.string_to_name("zzqx")
+
+    def testaffixes(self):
+        result = self.naming.string_to_name("customer_status")
+        self.assertEqual(result.pascal(suffix="repository"), "CustomerStatusRepository")
+        self.assertEqual(result.camel(suffix="repository"), "customerStatusRepository")
+        self.assertEqual(result.snake(suffix="repository"), "customer_status_repository")
+        self.assertEqual(result.snake(prefix="get"), "get_customer_status")
+        self.assertEqual(result.upper_snake(prefix="get"), "GET_CUSTOMER_STATUS")
+        self.assertIs(self.naming.string_to_name("customer_status"), result)
+
+    def testchanged_words(self):
+        result = Name("customerstatus")
+        result.words = ["customerstatus"]
+        self.assertEqual(result.snake(), "customerstatus")
+        result.words = ["customer", "status"]
+        self.assertEqual(result.snake(), "customer_status")
+
+    def testbatch(self):
+        names = ["currentemployeerecord", "scaninterestrates", "currentemployeerecord", "Account_Status"]
+        result = self.naming.string_to_names(names)
+        self.assertEqual([name.snake() for name in result],
+                         ["current_employee_record", "scan_interest_rates", "current_employee_record",
+                          "account_status"])
+        self.assertIs(result[0], result[2])
+
+    def testparallel_batch(self):
+        names = ["currentemployeerecord", "scaninterestrates", "account_status", "customer_status"]
+        threshold = Naming.__parallel_threshold__
+        Naming.__parallel_threshold__ = 2
+        try:
+            result = self.naming.string_to_names(names, max_workers=2)
+        finally:
+            Naming.__parallel_threshold__ = threshold
+        self.assertEqual([name.words for name in result],
+                         [["current", "employee", "record"], ["scan", "interest", "rates"], ["account", "status"],
+                          ["customer", "status"]])
+        self.assertIs(self.naming.string_to_name("scaninterestrates"), result[1])
+
     def test_types(self):
         a = TestClass("v1")
         b = TestClass("v2")
@@ -58,5 +134,979 @@ class NamingTests(unittest.TestCase):
         sig = inspect.getmembers(a)
 
 
+class NamingCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.folder.name, "naming_cache.json")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def get_naming(self, dictionary: str = "~/internal/src/sboothza/dalgen/dictionary.txt") -> Naming:
+        return Naming(dictionary, "~/internal/src/sboothza/dalgen/bigworddictionary.txt", self.cache_file)
+
+    def test_memo(self):
+        naming = self.get_naming()
+        first = naming.string_to_name("created_date")
+        second = naming.string_to_name("CreatedDate")
+        self.assertEqual(first.words, ["created", "date"])
+        self.assertEqual(second.words, ["created", "date"])
+        self.assertEqual(second.raw(), "CreatedDate")
+
+    def test_disk_cache(self):
+        naming = self.get_naming()
+        naming.string_to_name("scaninterestrates")
+        naming.save_cache()
+
+        naming = self.get_naming()
+        naming.dictionary = []
+        naming.big_dictionary = []
+        self.assertEqual(naming.string_to_name("scaninterestrates").words, ["scan", "interest", "rates"])
+
+    def test_disk_cache_invalidated(self):
+        naming = self.get_naming()
+        naming.string_to_name("scaninterestrates")
+        naming.save_cache()
+
+        dictionary = os.path.join(self.folder.name, "dictionary.txt")
+        with open(dictionary, 'w') as output_file:
+            output_file.write("scan\ninterest\nrates")
+        naming = self.get_naming(dictionary)
+        naming.dictionary = []
+        naming.big_dictionary = []
+        with self.assertRaises(Exception):
+            naming.string_to_name("scaninterestrates")
+
+    def test_shared_between_threads(self):
+        words = ["customer", "account", "order", "created", "date", "balance", "status", "address"]
+        names = [f"{first}_{second}" for first in words for second in words if first != second]
+        serial = {name: self.get_naming().string_to_name(name).words for name in names}
+
+        # a memo smaller than the names, so threads evict each other's entries while they work
+        naming = self.get_naming()
+        naming.cache_size = 16
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(lambda name: (name, naming.string_to_name(name).words), names * 4))
+        self.assertEqual({name: words for name, words in results}, serial)
+        self.assertLessEqual(len(naming._cache), 16)
+
+
+class NamingSnapshotTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.snapshot_file = os.path.join(self.folder.name, "dictionary.snapshot")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def get_naming(self, big_dictionary: str = "~/internal/src/sboothza/dalgen/bigworddictionary.txt") -> Naming:
+        return Naming("~/internal/src/sboothza/dalgen/dictionary.txt", big_dictionary,
+                      snapshot_file=self.snapshot_file)
+
+    def test_snapshot(self):
+        self.get_naming().compile_snapshot()
+
+        naming = self.get_naming()
+        self.assertIsInstance(naming.automaton, MappedWordAutomaton)
+        self.assertEqual(naming.string_to_name("currentemployeerecord").words, ["current", "employee", "record"])
+        self.assertEqual(naming.string_to_name("scaninterestrates").words, ["scan", "interest", "rates"])
+        with self.assertRaises(Exception):
+            naming.string_to_name("zzqx")
+
+    def test_stale_snapshot(self):
+        self.get_naming().compile_snapshot()
+
+        big_dictionary = os.path.join(self.folder.name, "bigworddictionary.txt")
+        with open(big_dictionary, 'w') as output_file:
+            output_file.write("interest,rates")
+        naming = self.get_naming(big_dictionary)
+        self.assertIsInstance(naming.automaton, WordAutomaton)
+        self.assertEqual(naming.string_to_name("interestrates").words, ["interest", "rates"])
+
+    def test_truncated_snapshot(self):
+        self.get_naming().compile_snapshot()
+        with open(self.snapshot_file, 'rb') as input_file:
+            data = input_file.read()
+        self.assertFalse(os.path.exists(self.snapshot_file + ".tmp"))
+
+        for size in (10, 100, len(data) // 3, len(data) // 2, len(data) - 1):
+            with open(self.snapshot_file, 'wb') as output_file:
+                output_file.write(data[:size])
+            naming = self.get_naming()
+            self.assertIsInstance(naming.automaton, WordAutomaton)
+            self.assertEqual(naming.string_to_name("interestrates").words, ["interest", "rates"])
+
+    def test_pickle(self):
+        self.get_naming().compile_snapshot()
+        naming = self.get_naming()
+        naming.string_to_name("currentemployeerecord")
+
+        copy = pickle.loads(pickle.dumps(naming))
+        self.assertIsInstance(copy.automaton, MappedWordAutomaton)
+        self.assertEqual(copy.string_to_name("scaninterestrates").words, ["scan", "interest", "rates"])
+        self.assertEqual(copy.string_to_name("currentemployeerecord").words, ["current", "employee", "record"])
+
+
+definition_text = """{
+    "name": "shop",
+    "tables": [
+        {
+            "name": "customer",
+            "fields": [
+                {"name": "id", "type": "Integer", "size": 4, "scale": 0, "auto_increment": true, "default": null,
+                 "required": true},
+                {"name": "email", "type": "String", "size": 255, "scale": 0, "auto_increment": false,
+                 "default": null, "required": false}
+            ],
+            "pk": {"name": "pk_customer", "fields": ["id"], "key_type": "PrimaryKey", "referenced_table": ""},
+            "keys": [{"name": "ux_customer_email", "fields": ["email"], "key_type": "Unique", "referenced_table": ""}],
+            "custom_queries": [
+                {"name": "get_by_email", "parameters": [{"name": "email", "type": "String"}], "return_type": "None",
+                 "transform": "None", "query_type": "FetchOne",
+                 "query": "select * from __table_name__ where email = ::email::"}
+            ]
+        },
+        {
+            "name": "account",
+            "fields": [
+                {"name": "id", "type": "Integer", "size": 4, "scale": 0, "auto_increment": true, "default": null,
+                 "required": true},
+                {"name": "customer_id", "type": "Integer", "size": 4, "scale": 0, "auto_increment": false,
+                 "default": null, "required": true},
+                {"name": "balance", "type": "Decimal", "size": 10, "scale": 2, "auto_increment": false,
+                 "default": null, "required": false}
+            ],
+            "pk": {"name": "pk_account", "fields": ["id"], "key_type": "PrimaryKey", "referenced_table": ""},
+            "keys": [{"name": "fk_account_customer", "fields": ["customer_id"], "key_type": "ForeignKey",
+                      "primary_table": "customer", "primary_fields": ["id"], "referenced_table": "account"}],
+            "custom_queries": []
+        }
+    ]
+}"""
+
+
+class SerializerTests(unittest.TestCase):
+    def setUp(self):
+        self.naming = Naming("~/internal/src/sboothza/dalgen/dictionary.txt",
+                             "~/internal/src/sboothza/dalgen/bigworddictionary.txt")
+
+    def test_compiled_decoder(self):
+        database = serializer_instance.de_serialize(definition_text, self.naming, Database)
+        self.assertIsInstance(database, Database)
+        self.assertEqual(database.name.raw(), "shop")
+        account = database.get_table("account")
+        self.assertEqual(account.fields[2].type, FieldType.Decimal)
+        self.assertEqual(account.keys[0].key_type, KeyType.ForeignKey)
+        self.assertEqual(account.keys[0].primary_fields, ["id"])
+        self.assertEqual(database.tables[0].custom_queries[0].parameters[0].name.snake(), "email")
+
+    def test_slotted_object(self):
+        field = Field(self.naming.string_to_name("email"), FieldType.String, 255)
+        self.assertFalse(hasattr(field, "__dict__"))
+        self.assertEqual(list(serializer_instance.map_to_dict(field).keys()),
+                         ["name", "type", "size", "scale", "auto_increment", "default", "required"])
+        self.assertEqual(serializer_instance.serialize(field),
+                         '{"name": "email", "type": "String", "size": 255, "scale": 0, "auto_increment": false, '
+                         '"default": null, "required": false}')
+
+    def test_compiled_matches_generic(self):
+        compiled = serializer_instance.de_serialize(definition_text, self.naming, Database)
+        generic = serializer_instance.de_serialize(definition_text, self.naming)
+        self.assertEqual(serializer_instance.serialize(compiled, True), serializer_instance.serialize(generic, True))
+
+
+class SchemaIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.naming = Naming("~/internal/src/sboothza/dalgen/dictionary.txt",
+                             "~/internal/src/sboothza/dalgen/bigworddictionary.txt")
+
+    def test_find_field(self):
+        table = Table(self.naming.string_to_name("customer"))
+        table.fields.append(Field(self.naming.string_to_name("id"), FieldType.Integer))
+        self.assertEqual(table.find_field("ID").name.raw(), "id")
+
+        table.fields.append(Field(self.naming.string_to_name("email"), FieldType.String))
+        self.assertEqual(table.find_field("Email").type, FieldType.String)
+
+        table.fields = [Field(self.naming.string_to_name("name"), FieldType.String)]
+        with self.assertRaises(Exception):
+            table.find_field("email")
+
+    def test_get_keys(self):
+        table = Table(self.naming.string_to_name("account"))
+        self.assertEqual(table.get_keys(KeyType.ForeignKey), [])
+        first = Key(self.naming.string_to_name("fk_account_customer"), KeyType.ForeignKey)
+        lookup = Key(self.naming.string_to_name("ix_account_status"), KeyType.Lookup)
+        second = Key(self.naming.string_to_name("fk_account_status"), KeyType.ForeignKey)
+        table.keys.extend([first, lookup, second])
+        self.assertEqual(table.get_keys(KeyType.ForeignKey), [first, second])
+        self.assertEqual(table.get_keys(KeyType.Lookup), [lookup])
+
+    def test_get_table(self):
+        database = Database(self.naming.string_to_name("shop"))
+        self.assertIsNone(database.get_table("customer"))
+        database.tables.append(Table(self.naming.string_to_name("customer")))
+        self.assertEqual(database.get_table("customer").name.raw(), "customer")
+
+
+class TableOrderTests(unittest.TestCase):
+    @staticmethod
+    def get_database(references: dict) -> Database:
+        database = Database(Name("shop"))
+        for table_name, primary_tables in references.items():
+            table = Table(Name(table_name))
+            for primary_table in primary_tables:
+                fk = Key(Name(f"fk_{table_name}_{primary_table}"), KeyType.ForeignKey, primary_table)
+                fk.referenced_table = table_name
+                table.keys.append(fk)
+            database.tables.append(table)
+        return database
+
+    @staticmethod
+    def get_names(tables) -> list:
+        return [table.name.raw() for table in tables]
+
+    def test_levels(self):
+        database = self.get_database({"invoice": ["account"], "customer": [], "account": ["customer", "status"],
+                                      "status": []})
+        order = Adaptor.get_table_order(database)
+        self.assertEqual([self.get_names(level) for level in order.levels],
+                         [["customer", "status"], ["account"], ["invoice"]])
+        self.assertEqual(order.cycles, [])
+        self.assertEqual(self.get_names(Adaptor.get_ordered_table_list(database)),
+                         ["customer", "status", "account", "invoice"])
+
+    def test_self_reference(self):
+        order = Adaptor.get_table_order(self.get_database({"employee": ["employee"], "payslip": ["employee"]}))
+        self.assertEqual([self.get_names(level) for level in order.levels], [["employee"], ["payslip"]])
+        self.assertEqual(order.deferred_keys, [])
+
+    def test_cycle(self):
+        database = self.get_database({"order": ["customer"], "customer": ["address"], "address": ["customer"],
+                                      "status": []})
+        order = Adaptor.get_table_order(database)
+        self.assertEqual([self.get_names(cycle) for cycle in order.cycles], [["customer", "address"]])
+        self.assertEqual([key.name.raw() for key in order.deferred_keys], ["fk_customer_address"])
+        self.assertEqual([self.get_names(level) for level in order.levels],
+                         [["status"], ["customer"], ["order", "address"]])
+        self.assertEqual(self.get_names(order.get_tables()), ["customer", "order", "address", "status"])
+
+    def test_nested_cycle(self):
+        order = Adaptor.get_table_order(self.get_database({"a": ["b"], "b": ["c"], "c": ["a", "b"]}))
+        self.assertEqual([self.get_names(cycle) for cycle in order.cycles], [["a", "b", "c"]])
+        self.assertEqual(len(order.get_tables()), 3)
+
+    def test_definition_order(self):
+        tables = Adaptor.get_ordered_table_list(self.get_database({"a": ["b"], "b": [], "c": []}))
+        self.assertEqual(self.get_names(tables), ["b", "a", "c"])
+
+    def test_long_chain(self):
+        references = {f"table{i}": [f"table{i + 1}"] for i in range(5000)}
+        references["table5000"] = []
+        tables = Adaptor.get_ordered_table_list(self.get_database(references))
+        self.assertEqual(self.get_names(tables)[:2], ["table5000", "table4999"])
+        self.assertEqual(len(tables), 5001)
+
+
+class TypeRegistryTests(unittest.TestCase):
+    def setUp(self):
+        self.naming = Naming("~/internal/src/sboothza/dalgen/dictionary.txt",
+                             "~/internal/src/sboothza/dalgen/bigworddictionary.txt")
+
+    def test_field_types(self):
+        for field_type in FieldType:
+            self.assertEqual(FieldType.get_fieldtype(str(field_type)), field_type)
+        self.assertEqual(FieldType.get_fieldtype("VARCHAR"), FieldType.String)
+        with self.assertRaises(Exception):
+            FieldType.get_fieldtype("blob")
+
+    def test_key_types(self):
+        for key_type in KeyType:
+            self.assertEqual(KeyType.get_keytype(str(key_type)), key_type)
+        self.assertEqual(KeyType.get_keytype("PRIMARY KEY"), KeyType.PrimaryKey)
+
+    def test_dialects(self):
+        mysql = AdaptorFactory.get_adaptor_for_dbtype("mysql", self.naming)
+        self.assertEqual(mysql.get_field_type(FieldType.Integer, 8), "BIGINT")
+        self.assertEqual(mysql.get_field_type(FieldType.String, 255), "VARCHAR")
+        with self.assertRaises(Exception):
+            mysql.get_field_type(FieldType.Integer, 5)
+        self.assertEqual(mysql.must_remap_field(FieldType.Boolean), (True, FieldType.Integer))
+
+        field = Field()
+        mysql.get_field_type_defaults("decimal", field, 0, 10, 2, None)
+        self.assertEqual((field.type, field.size, field.scale), (FieldType.Decimal, 10, 2))
+
+        pgsql = AdaptorFactory.get_adaptor_for_dbtype("pgsql", self.naming)
+        pgsql.get_field_type_defaults("uuid", field, 0, None, None, None)
+        self.assertEqual((field.type, field.size), (FieldType.String, 36))
+
+        sqlite = AdaptorFactory.get_adaptor_for_dbtype("sqlite", self.naming)
+        self.assertEqual(sqlite.get_field_type(FieldType.Datetime), "REAL")
+        self.assertEqual(sqlite.must_remap_field(FieldType.Datetime), (True, FieldType.Float))
+        self.assertEqual(sqlite.must_remap_field(FieldType.String), (False, FieldType.String))
+        with self.assertRaises(Exception):
+            sqlite.must_remap_field(FieldType.Item)
+
+    def test_remapper(self):
+        self.assertEqual(PythonGenerator.get_remapper(FieldType.Float, FieldType.Datetime, "row[0]"),
+                         "TableBase.float_to_datetime(row[0])")
+        with self.assertRaises(Exception):
+            PythonGenerator.get_remapper(FieldType.String, FieldType.Integer, "row[0]")
+
+
+class MySqlCatalogTests(unittest.TestCase):
+    def test_get_table(self):
+        naming = Naming("~/internal/src/sboothza/dalgen/dictionary.txt",
+                        "~/internal/src/sboothza/dalgen/bigworddictionary.txt")
+        adaptor = AdaptorFactory.get_adaptor_for_dbtype("mysql", naming)
+        # rows as the schema wide catalog queries return them, grouped by table
+        field_rows = adaptor.group_rows([
+            ("account", "id", b"int", None, "auto_increment", "NO", 10, 0, None),
+            ("account", "customer_id", b"int", None, "", "NO", 10, 0, None),
+            ("account", "branch_id", b"int", None, "", "YES", 10, 0, None),
+            ("account", "name", b"varchar", 50, "", "YES", None, None, b"none"),
+            ("customer", "id", b"int", None, "auto_increment", "NO", 10, 0, None)])
+        foreign_key_rows = adaptor.group_rows([
+            ("account", "fk_account_customer", "customer", "customer_id", "id")])
+        index_rows = adaptor.group_rows([
+            ("account", "PRIMARY", "id", "PRIMARY KEY"),
+            ("account", "fk_account_customer", "customer_id", "INDEX"),
+            ("account", "ux_account_name", "branch_id", "UNIQUE"),
+            ("account", "ux_account_name", "name", "UNIQUE")])
+        self.assertEqual(list(field_rows), ["account", "customer"])
+
+        table = adaptor.get_table("account", field_rows["account"], foreign_key_rows["account"],
+                                  index_rows["account"])
+        self.assertEqual([(field.name.raw(), str(field.type), field.size, field.required, field.auto_increment)
+                          for field in table.fields],
+                         [("id", "Integer", 4, True, True), ("customer_id", "Integer", 4, True, False),
+                          ("branch_id", "Integer", 4, False, False), ("name", "String", 50, False, False)])
+        self.assertEqual(table.fields[3].default, "none")
+        self.assertEqual(table.pk.fields, ["id"])
+        self.assertEqual([(key.name.raw(), str(key.key_type), key.fields) for key in table.keys],
+                         [("fk_account_customer", "ForeignKey", ["customer_id"]),
+                          ("fk_account_customer", "Index", ["customer_id"]),
+                          ("ux_account_name", "Unique", ["branch_id", "name"])])
+        self.assertEqual((table.keys[0].primary_table, table.keys[0].primary_fields), ("customer", ["id"]))
+
+
+class DefinitionStreamTests(unittest.TestCase):
+    def setUp(self):
+        self.naming = Naming("~/internal/src/sboothza/dalgen/dictionary.txt",
+                             "~/internal/src/sboothza/dalgen/bigworddictionary.txt")
+        self.folder = tempfile.TemporaryDirectory()
+        self.definition_file = os.path.join(self.folder.name, "definition.json")
+        self.database = serializer_instance.de_serialize(definition_text, self.naming, Database)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_writer(self):
+        with DefinitionWriter(self.definition_file, self.database.name) as writer:
+            for table in self.database.tables:
+                writer.write_table(table)
+        with open(self.definition_file, 'r') as input_file:
+            self.assertEqual(input_file.read(), serializer_instance.serialize(self.database, True))
+
+    def test_empty_writer(self):
+        with DefinitionWriter(self.definition_file, self.database.name):
+            pass
+        with open(self.definition_file, 'r') as input_file:
+            self.assertEqual(input_file.read(), serializer_instance.serialize(Database(self.database.name), True))
+
+    def test_failed_writer(self):
+        with open(self.definition_file, 'w') as output_file:
+            output_file.write(definition_text)
+        with self.assertRaises(ConnectionError):
+            with DefinitionWriter(self.definition_file, self.database.name) as writer:
+                writer.write_table(self.database.tables[0])
+                raise ConnectionError()
+        # the definition is left as it was, and the partial file is gone
+        with open(self.definition_file, 'r') as input_file:
+            self.assertEqual(input_file.read(), definition_text)
+        self.assertEqual(os.listdir(self.folder.name), ["definition.json"])
+
+    def test_reader(self):
+        with open(self.definition_file, 'w') as output_file:
+            output_file.write(definition_text)
+
+        chunk_size = DefinitionReader.__chunk_size__
+        DefinitionReader.__chunk_size__ = 7
+        try:
+            with DefinitionReader(self.definition_file, self.naming) as reader:
+                tables = list(reader)
+        finally:
+            DefinitionReader.__chunk_size__ = chunk_size
+
+        self.assertEqual(reader.name.raw(), "shop")
+        self.assertEqual([serializer_instance.serialize(table) for table in tables],
+                         [serializer_instance.serialize(table) for table in self.database.tables])
+
+
+class DefinitionCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.naming = Naming("~/internal/src/sboothza/dalgen/dictionary.txt",
+                             "~/internal/src/sboothza/dalgen/bigworddictionary.txt")
+        self.folder = tempfile.TemporaryDirectory()
+        self.definition_file = os.path.join(self.folder.name, "definition.json")
+        with open(self.definition_file, 'w') as output_file:
+            output_file.write(definition_text)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_cache(self):
+        database = Adaptor.import_definition(self.definition_file, self.naming, True)
+        self.assertTrue(os.path.exists(DefinitionCache.get_cache_filename(self.definition_file)))
+
+        cached = DefinitionCache(self.definition_file, self.naming).load()
+        self.assertIsNotNone(cached)
+        self.assertEqual(serializer_instance.serialize(cached), serializer_instance.serialize(database))
+        self.assertEqual(cached.get_table("account").name.words, ["account"])
+        self.assertIs(cached.get_table("customer").foreign_keys[0], cached.get_table("account").keys[0])
+
+    def test_stale_cache(self):
+        Adaptor.import_definition(self.definition_file, self.naming, True)
+        with open(self.definition_file, 'w') as output_file:
+            output_file.write(definition_text.replace("\"shop\"", "\"store\""))
+
+        self.assertIsNone(DefinitionCache(self.definition_file, self.naming).load())
+        self.assertEqual(Adaptor.import_definition(self.definition_file, self.naming, True).name.raw(), "store")
+
+    def test_incompatible_cache(self):
+        cache = DefinitionCache(self.definition_file, self.naming)
+        for broken in (ValueError, TypeError):
+            # a model that no longer matches the pickled one fails while it is rebuilt
+            with open(cache.cache_file, 'wb') as output_file:
+                pickle.dump((DefinitionCache.__cache_version__, cache.source_hash, cache.dictionary_hash),
+                            output_file)
+                pickle.dump(BrokenPickle(broken), output_file)
+            self.assertIsNone(cache.load())
+
+
+class BrokenPickle:
+    def __init__(self, error: type):
+        self.error = error
+
+    def __reduce__(self):
+        return (int, ("not a number",)) if self.error is ValueError else (int, (None,))
+
+
+class GenerationManifestTests(unittest.TestCase):
+    def setUp(self):
+        self.naming = Naming("~/internal/src/sboothza/dalgen/dictionary.txt",
+                             "~/internal/src/sboothza/dalgen/bigworddictionary.txt")
+        self.folder = tempfile.TemporaryDirectory()
+        self.generator = PythonGenerator(self.naming)
+        self.adaptor = AdaptorFactory.get_adaptor_for_dbtype("sqlite", self.naming)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def load(self, text: str) -> Database:
+        definition_file = os.path.join(self.folder.name, "definition.json")
+        with open(definition_file, 'w') as output_file:
+            output_file.write(text)
+        return Adaptor.import_definition(definition_file, self.naming)
+
+    def test_changed_tables(self):
+        database = self.load(definition_text)
+        manifest = self.generator.get_manifest(database, self.folder.name, self.adaptor, self.naming)
+        self.assertFalse(manifest.is_current("customer"))
+        manifest.save()
+
+        manifest = self.generator.get_manifest(database, self.folder.name, self.adaptor, self.naming)
+        self.assertTrue(manifest.is_current("customer"))
+        self.assertTrue(manifest.is_current("account"))
+
+        # a change to customer also changes account, which references it
+        database = self.load(definition_text.replace("\"size\": 255", "\"size\": 128"))
+        manifest = self.generator.get_manifest(database, self.folder.name, self.adaptor, self.naming)
+        self.assertFalse(manifest.is_current("customer"))
+        self.assertFalse(manifest.is_current("account"))
+
+    def test_missing_output(self):
+        database = self.load(definition_text)
+        entity_folder = os.path.join(self.folder.name, "entities")
+        repository_folder = os.path.join(self.folder.name, "repositories")
+        manifest = self.generator.get_manifest(database, self.folder.name, self.adaptor, self.naming)
+        self.generator.generate_entities(database, entity_folder, self.adaptor, self.naming)
+        self.generator.generate_repositories(database, repository_folder, self.adaptor, self.naming)
+        manifest.save()
+
+        manifest = self.generator.get_manifest(database, self.folder.name, self.adaptor, self.naming)
+        self.assertEqual(self.generator.get_changed_tables(database, manifest, entity_folder, repository_folder), [])
+        os.remove(os.path.join(entity_folder, "account.py"))
+        self.assertEqual([table.name.raw() for table in self.generator.get_changed_tables(
+            database, manifest, entity_folder, repository_folder)], ["account"])
+
+        manifest = GenerationManifest(self.folder.name, "other settings")
+        manifest.load()
+        manifest.tables = self.generator.get_table_hashes(database)
+        self.assertFalse(manifest.is_current("customer"))
+
+
+class ParallelGenerationTests(unittest.TestCase):
+    def setUp(self):
+        self.naming = Naming("~/internal/src/sboothza/dalgen/dictionary.txt",
+                             "~/internal/src/sboothza/dalgen/bigworddictionary.txt")
+        self.folder = tempfile.TemporaryDirectory()
+        self.generator = PythonGenerator(self.naming)
+        self.adaptor = AdaptorFactory.get_adaptor_for_dbtype("sqlite", self.naming)
+        definition_file = os.path.join(self.folder.name, "definition.json")
+        with open(definition_file, 'w') as output_file:
+            output_file.write(definition_text)
+        self.database = Adaptor.import_definition(definition_file, self.naming)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def read_folder(self, folder: str) -> Dict[str, str]:
+        result: Dict[str, str] = dict()
+        for sub_folder in ("entities", "repositories"):
+            for filename in sorted(os.listdir(os.path.join(folder, sub_folder))):
+                with open(os.path.join(folder, sub_folder, filename), 'r') as input_file:
+                    result[os.path.join(sub_folder, filename)] = input_file.read()
+        return result
+
+    def test_parallel_generation(self):
+        database = self.database
+        serial_folder = os.path.join(self.folder.name, "serial")
+        parallel_folder = os.path.join(self.folder.name, "parallel")
+        for folder, jobs in ((serial_folder, 1), (parallel_folder, 2)):
+            self.generator.generate_tables(database, os.path.join(folder, "entities"),
+                                           os.path.join(folder, "repositories"), self.adaptor, self.naming, jobs=jobs)
+        self.assertEqual(self.read_folder(serial_folder), self.read_folder(parallel_folder))
+
+        # custom code after the marker survives regeneration by a worker
+        with open(os.path.join(parallel_folder, "entities", "account.py"), 'a') as output_file:
+            output_file.write("# custom code\n")
+        self.generator.generate_tables(database, os.path.join(parallel_folder, "entities"),
+                                       os.path.join(parallel_folder, "repositories"), self.adaptor, self.naming,
+                                       jobs=2)
+        with open(os.path.join(parallel_folder, "entities", "account.py"), 'r') as input_file:
+            self.assertTrue(input_file.read().endswith("# end-autogenerated\n# custom code\n"))
+
+
+class GeneratedCodeTests(unittest.TestCase):
+    def setUp(self):
+        self.naming = Naming("~/internal/src/sboothza/dalgen/dictionary.txt",
+                             "~/internal/src/sboothza/dalgen/bigworddictionary.txt")
+        self.folder = tempfile.TemporaryDirectory()
+        self.generator = PythonGenerator(self.naming)
+        self.adaptor = AdaptorFactory.get_adaptor_for_dbtype("sqlite", self.naming)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_benchmark(self):
+        definition_file = os.path.join(self.folder.name, "definition.json")
+        with open(definition_file, 'w') as output_file:
+            output_file.write(definition_text)
+        database = Adaptor.import_definition(definition_file, self.naming)
+        output_folder = os.path.join(self.folder.name, "dal")
+        self.generator.generate_tables(database, os.path.join(output_folder, "entities"),
+                                       os.path.join(output_folder, "repositories"), self.adaptor, self.naming)
+        self.generator.copy_templates(default_template_folder, output_folder)
+        self.generator.generate_benchmark(database, output_folder, self.adaptor, self.naming)
+
+        # every operation of the generated repositories runs against sqlite without errors
+        result = subprocess.run([sys.executable, os.path.join(output_folder, "benchmark.py"), "--operations", "5",
+                                 "--concurrency", "1,2"], capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        self.assertIn("2/account/get_by_id", result.stdout)
+
+    def test_connection_string_repository(self):
+        definition_file = os.path.join(self.folder.name, "definition.json")
+        with open(definition_file, 'w') as output_file:
+            output_file.write(definition_text)
+        database = Adaptor.import_definition(definition_file, self.naming)
+        output_folder = os.path.join(self.folder.name, "dal")
+        self.generator.generate_tables(database, os.path.join(output_folder, "entities"),
+                                       os.path.join(output_folder, "repositories"), self.adaptor, self.naming)
+        self.generator.copy_templates(default_template_folder, output_folder)
+
+        filename = os.path.join(self.folder.name, "old.db")
+        connection = sqlite3.connect(filename)
+        connection.executescript(self.adaptor.generate_create_script(database.get_table("customer")))
+        connection.close()
+
+        # a repository written against the connection string API, without sessions
+        script = os.path.join(output_folder, "old_api.py")
+        with open(script, 'w') as output_file:
+            output_file.write("from base.repository_base import RepositoryBase\n"
+                              "from entities.customer import Customer\n\n\n"
+                              "class CustomerRepository(RepositoryBase):\n"
+                              "    __table_definition__ = Customer\n\n\n"
+                              f"repository = CustomerRepository({json.dumps('sqlite://' + filename)})\n"
+                              "assert repository.schema_exists()\n"
+                              "assert repository.count() == 0\n"
+                              "with repository.get_session() as session:\n"
+                              "    print(repository.count(session))\n")
+        result = subprocess.run([sys.executable, script], capture_output=True, text=True, cwd=output_folder)
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        self.assertEqual(result.stdout, "0\n")
+
+    def test_benchmark_parameters(self):
+        obj = json.loads(definition_text)
+        # min_balance isn't a field of account, so the benchmark passes it a sample value
+        obj["tables"][1]["custom_queries"].append(
+            {"name": "get_by_balance", "parameters": [{"name": "min_balance", "type": "Decimal"}],
+             "return_type": "None", "transform": "None", "query_type": "FetchAll",
+             "query": "select * from __table_name__ where balance > ::min_balance::"})
+        definition_file = os.path.join(self.folder.name, "definition.json")
+        with open(definition_file, 'w') as output_file:
+            json.dump(obj, output_file)
+        database = Adaptor.import_definition(definition_file, self.naming)
+        context = self.generator.get_benchmark_context(database, self.adaptor, self.naming)
+        account = [table for table in context["tables"] if table["name"] == "account"][0]
+        self.assertEqual(account["queries"], [("get_by_balance", ", i + 0.5")])
+
+
+class DataGeneratorTests(unittest.TestCase):
+    def setUp(self):
+        self.naming = Naming("~/internal/src/sboothza/dalgen/dictionary.txt",
+                             "~/internal/src/sboothza/dalgen/bigworddictionary.txt")
+        self.folder = tempfile.TemporaryDirectory()
+        definition_file = os.path.join(self.folder.name, "definition.json")
+        with open(definition_file, 'w') as output_file:
+            output_file.write(definition_text)
+        self.filename = os.path.join(self.folder.name, "data.db")
+        self.adaptor = AdaptorFactory.get_adaptor_for_connection_string(f"sqlite://{self.filename}", self.naming)
+        self.database = Adaptor.import_definition(definition_file, self.naming)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_reproducible(self):
+        generator = DataGenerator(self.database, self.adaptor, 50, 10, seed=3, batch_size=7)
+        rows = [row for batch in generator.generate_rows("account") for row in batch]
+        self.assertEqual(len(rows), 50)
+        self.assertEqual(rows, [row for batch in DataGenerator(self.database, self.adaptor, 50, 10, seed=3,
+                                                               batch_size=50).generate_rows("account")
+                                for row in batch])
+        self.assertNotEqual(rows, [row for batch in DataGenerator(self.database, self.adaptor, 50, 10, seed=4)
+                                   .generate_rows("account") for row in batch])
+
+    def test_fill_tables(self):
+        connection = sqlite3.connect(self.filename)
+        for table in self.database.tables:
+            connection.executescript(self.adaptor.generate_create_script(table))
+        connection.close()
+
+        results = DataGenerator(self.database, self.adaptor, 500, 10, batch_size=100).fill_tables(jobs=2)
+        self.assertEqual([(name, rows) for name, rows, _ in results], [("customer", 500), ("account", 500)])
+        connection = sqlite3.connect(self.filename)
+        try:
+            self.assertEqual(connection.execute("select count(distinct email) from customer").fetchone()[0], 500)
+            self.assertEqual(connection.execute("select count(*) from account where customer_id is null or "
+                                                "customer_id not in (select id from customer)").fetchone()[0], 0)
+            self.assertEqual(connection.execute("PRAGMA foreign_key_check").fetchall(), [])
+        finally:
+            connection.close()
+
+    def test_refill(self):
+        connection = sqlite3.connect(self.filename)
+        for table in self.database.tables:
+            connection.executescript(self.adaptor.generate_create_script(table))
+        connection.close()
+
+        DataGenerator(self.database, self.adaptor, 20, 10).fill_tables()
+        with self.assertRaises(DataException):
+            DataGenerator(self.database, self.adaptor, 20, 10).fill_tables()
+
+    def test_journal_mode(self):
+        connection = sqlite3.connect(self.filename)
+        for table in self.database.tables:
+            connection.executescript(self.adaptor.generate_create_script(table))
+        connection.close()
+
+        DataGenerator(self.database, self.adaptor, 50, 10).fill_tables()
+        connection = sqlite3.connect(self.filename)
+        try:
+            self.assertEqual(connection.execute("PRAGMA journal_mode").fetchone()[0], "delete")
+        finally:
+            connection.close()
+
+    def test_lookup_defined_later(self):
+        obj = json.loads(definition_text)
+        customer = obj["tables"][0]
+        customer["fields"].append({"name": "status_id", "type": "Integer", "size": 4, "scale": 0,
+                                   "auto_increment": False, "default": None, "required": True})
+        customer["keys"].append({"name": "fk_customer_status", "fields": ["status_id"], "key_type": "Lookup",
+                                 "primary_table": "customer_status", "primary_fields": ["id"],
+                                 "referenced_table": "customer"})
+        obj["tables"].append({"name": "customer_status", "fields": [
+            {"name": "id", "type": "Integer", "size": 4, "scale": 0, "auto_increment": True, "default": None,
+             "required": True}],
+            "pk": {"name": "pk_customer_status", "fields": ["id"], "key_type": "PrimaryKey", "referenced_table": ""},
+            "keys": [], "custom_queries": []})
+        definition_file = os.path.join(self.folder.name, "lookup.json")
+        with open(definition_file, 'w') as output_file:
+            json.dump(obj, output_file)
+        database = Adaptor.import_definition(definition_file, self.naming)
+
+        generator = DataGenerator(database, self.adaptor, 20, 5)
+        self.assertEqual([table.name.raw() for table in generator.tables], ["customer_status", "customer", "account"])
+        self.assertEqual(generator.plans["customer"].dependencies, {"customer_status"})
+        statuses = {row[-1] for batch in generator.generate_rows("customer") for row in batch}
+        self.assertTrue(statuses.issubset(range(1, 6)) and len(statuses) > 0)
+
+    def test_cycle(self):
+        obj = json.loads(definition_text)
+        customer = obj["tables"][0]
+        customer["fields"].append({"name": "account_id", "type": "Integer", "size": 4, "scale": 0,
+                                   "auto_increment": False, "default": None, "required": True})
+        customer["keys"].append({"name": "fk_customer_account", "fields": ["account_id"], "key_type": "ForeignKey",
+                                 "primary_table": "account", "primary_fields": ["id"], "referenced_table": "customer"})
+        definition_file = os.path.join(self.folder.name, "cycle.json")
+        for required in (True, False):
+            customer["fields"][-1]["required"] = required
+            with open(definition_file, 'w') as output_file:
+                json.dump(obj, output_file)
+            database = Adaptor.import_definition(definition_file, self.naming)
+            if required:
+                # customer is filled first, so there is no account for it to point at yet
+                with self.assertRaises(DataException):
+                    DataGenerator(database, self.adaptor, 10, 10)
+            else:
+                rows = [row for batch in DataGenerator(database, self.adaptor, 10, 10).generate_rows("customer")
+                        for row in batch]
+                self.assertEqual({row[-1] for row in rows}, {None})
+
+
+class QueryPlanTests(unittest.TestCase):
+    def test_check(self):
+        naming = Naming("~/internal/src/sboothza/dalgen/dictionary.txt",
+                        "~/internal/src/sboothza/dalgen/bigworddictionary.txt")
+        with tempfile.TemporaryDirectory() as folder:
+            definition_file = os.path.join(folder, "definition.json")
+            with open(definition_file, 'w') as output_file:
+                output_file.write(definition_text)
+            database = Adaptor.import_definition(definition_file, naming)
+            plans = {f"{plan.table_name}.{plan.name}": plan for plan in QueryPlanChecker(naming).check(database)}
+
+            self.assertEqual(plans["customer.fetch_by_id"].issues, [])
+            self.assertEqual(plans["customer.get_by_email"].issues, [])
+            # the foreign key of account has no index
+            self.assertEqual(plans["account.get_for_customer"].issues, ["SCAN account"])
+
+            report_file = os.path.join(folder, "report.json")
+            QueryPlanChecker.write_report(list(plans.values()), report_file)
+            with open(report_file, 'r') as input_file:
+                self.assertEqual(json.load(input_file)["issue_count"], 1)
+
+
+class IndexAdvisorTests(unittest.TestCase):
+    def setUp(self):
+        self.naming = Naming("~/internal/src/sboothza/dalgen/dictionary.txt",
+                             "~/internal/src/sboothza/dalgen/bigworddictionary.txt")
+
+    def test_query_columns(self):
+        table = Table(Name("payment"))
+        table.fields = [Field(Name(name), FieldType.Integer) for name in ("id", "account_id", "amount", "paid")]
+        columns = IndexAdvisor.get_query_columns(table, "select * from payment where account_id = ::account_id:: "
+                                                        "and p.\"amount\" > ::amount:: order by paid desc")
+        self.assertEqual((columns.equality, columns.order, columns.ranges), (["account_id"], ["paid"], ["amount"]))
+        self.assertIsNone(IndexAdvisor.get_query_columns(table, "select * from payment where id = 1 or paid = 2"))
+
+    def test_advise(self):
+        with tempfile.TemporaryDirectory() as folder:
+            definition_file = os.path.join(folder, "definition.json")
+            obj = json.loads(definition_text)
+            # fetching one account of a customer doesn't make customer_id unique
+            obj["tables"][1]["custom_queries"].append(
+                {"name": "get_first_for_customer", "parameters": [{"name": "customer_id", "type": "Integer"}],
+                 "return_type": "None", "transform": "None", "query_type": "FetchOne",
+                 "query": "select * from __table_name__ where customer_id = ::customer_id::"})
+            with open(definition_file, 'w') as output_file:
+                json.dump(obj, output_file)
+            database = Adaptor.import_definition(definition_file, self.naming)
+            advisor = IndexAdvisor(self.naming)
+            # get_by_email is served by the unique key on email, the foreign key of account has no index
+            proposals = advisor.advise(database)
+            self.assertEqual([(proposal.table.name.raw(), str(proposal.key.key_type), proposal.key.fields)
+                              for proposal in proposals], [("account", "Index", ["customer_id"])])
+            self.assertEqual(proposals[0].reasons, ["foreign key fk_account_customer", "query get_first_for_customer"])
+            self.assertEqual(proposals[0].key.referenced_table, "account")
+
+            IndexAdvisor.apply(proposals)
+            Adaptor.generate_schema_definition(database, definition_file)
+            database = Adaptor.import_definition(definition_file, self.naming)
+            self.assertEqual(advisor.advise(database), [])
+            self.assertIn("ix_account_customer_id",
+                          AdaptorFactory.get_adaptor_for_dbtype("sqlite", self.naming).generate_create_script(
+                              database.get_table("account")))
+
+
+class SourceWriterTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.folder.name, "source.py")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write(self, body: str):
+        with SourceWriter(self.filename) as writer:
+            writer.writeln("class Source:")
+            writer.indent()
+            writer.writeln(body)
+
+    def test_write_if_changed(self):
+        self.write("pass")
+        with open(self.filename, 'r') as input_file:
+            self.assertEqual(input_file.read(), "class Source:\n    pass\n")
+
+        os.utime(self.filename, (0, 0))
+        self.write("pass")
+        self.assertEqual(os.path.getmtime(self.filename), 0)
+
+        self.write("value = 1")
+        self.assertNotEqual(os.path.getmtime(self.filename), 0)
+        self.assertEqual(os.listdir(self.folder.name), ["source.py"])
+
+    def test_failed_write(self):
+        self.write("pass")
+        with self.assertRaises(ValueError):
+            with SourceWriter(self.filename) as writer:
+                writer.writeln("partial")
+                raise ValueError()
+        with open(self.filename, 'r') as input_file:
+            self.assertEqual(input_file.read(), "class Source:\n    pass\n")
+
+
+class FileWatcherTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.folder.name, "definition.json")
+        self.template_folder = os.path.join(self.folder.name, "templates")
+        os.makedirs(self.template_folder)
+        with open(self.filename, 'w') as output_file:
+            output_file.write("{}")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_changes(self):
+        watcher = FileWatcher([self.filename, self.template_folder])
+        self.assertEqual(watcher.get_changes(), [])
+
+        with open(self.filename, 'w') as output_file:
+            output_file.write("{\"name\": \"shop\"}")
+        self.assertEqual(watcher.get_changes(), [self.filename])
+        self.assertEqual(watcher.get_changes(), [])
+
+        with open(os.path.join(self.template_folder, "table_base.py"), 'w') as output_file:
+            output_file.write("")
+        self.assertEqual(watcher.wait_for_changes(), [self.template_folder])
+
+        os.remove(self.filename)
+        self.assertEqual(watcher.get_changes(), [self.filename])
+
+
+class TemplateTests(unittest.TestCase):
+    def test_render(self):
+        template = Template("class {{name}}:\n"
+                            "% for field, default in fields:\n"
+                            "    % if default is None:\n"
+                            "    {{field}} = None\n"
+                            "    % else:\n"
+                            "    {{field}} = {{default}}\n"
+                            "    % end\n"
+                            "% end\n"
+                            "%# not written\n"
+                            "# end", "test.tpl")
+        self.assertEqual(template.parameters, ["fields", "name"])
+        self.assertEqual(template.render({"name": "Account", "fields": [("id", 0), ("email", None)]}),
+                         "class Account:\n    id = 0\n    email = None\n# end\n")
+        self.assertEqual(template.render({"name": "Empty", "fields": []}), "class Empty:\n# end\n")
+
+        with self.assertRaises(DataException):
+            template.render({"name": "Account"})
+
+    def test_errors(self):
+        for text in ["% for x in items:\n{{x}}", "% end", "% else:", "{{x y}}", "% while True:\n% end"]:
+            with self.assertRaises(DataException):
+                Template(text)
+
+
+class PhaseTests(unittest.TestCase):
+    def test_profiler(self):
+        naming = Naming("~/internal/src/sboothza/dalgen/dictionary.txt",
+                        "~/internal/src/sboothza/dalgen/bigworddictionary.txt")
+        with tempfile.TemporaryDirectory() as folder:
+            definition_file = os.path.join(folder, "definition.json")
+            with open(definition_file, 'w') as output_file:
+                output_file.write(definition_text)
+
+            profiler = PhaseProfiler()
+            profiler.start()
+            try:
+                with phases.phase("outer"):
+                    Adaptor.import_definition(definition_file, naming)
+                    data = [0] * 100000
+            finally:
+                profiler.stop()
+
+        self.assertEqual(len(phases.listeners), 0)
+        summary = profiler.get_summary()
+        # the dictionary is loaded on first use, inside the first table's deserialization
+        self.assertEqual(list(summary.keys()), ["naming_load", "deserialization", "foreign_keys", "outer"])
+        self.assertEqual(summary["deserialization"]["count"], 2)
+        self.assertGreaterEqual(summary["outer"]["wall_time"], summary["deserialization"]["wall_time"])
+        self.assertGreaterEqual(summary["outer"]["peak_memory"], len(data) * 8)
+        self.assertEqual([entry["detail"] for entry in profiler.entries][-1], "")
+
+    def test_threads(self):
+        barrier = threading.Barrier(2)
+
+        def run(name: str):
+            # both threads have their outer phase open while the other's phases start and end
+            with phases.phase("outer", name):
+                barrier.wait()
+                with phases.phase("inner", name):
+                    data = [0] * 100000
+                barrier.wait()
+            return len(data)
+
+        profiler = PhaseProfiler()
+        profiler.start()
+        try:
+            with ThreadPoolExecutor(2) as executor:
+                list(executor.map(run, ["first", "second"]))
+        finally:
+            profiler.stop()
+
+        entries = {(entry["phase"], entry["detail"]): entry["peak_memory"] for entry in profiler.entries}
+        self.assertEqual(len(entries), 4)
+        for name in ("first", "second"):
+            self.assertGreaterEqual(entries[("outer", name)], entries[("inner", name)])
+
+
+class BatchManifestTests(unittest.TestCase):
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as folder:
+            manifest_file = os.path.join(folder, "batch.json")
+            with open(manifest_file, 'w') as output_file:
+                output_file.write('{"jobs": [{"definition_file": "billing/definition.json", '
+                                  '"output_folder": "billing", "db_type": "mysql", "language": "python"}, '
+                                  '{"name": "shop", "definition_file": "shop.json", "output_folder": "/tmp/shop", '
+                                  '"db_type": "sqlite", "language": "python", "ddl_file": "shop.sql"}]}')
+            jobs = load_batch_manifest(manifest_file)
+
+            self.assertEqual([job.name for job in jobs], ["billing/definition.json", "shop"])
+            self.assertEqual(jobs[0].definition_file, os.path.join(folder, "billing", "definition.json"))
+            self.assertEqual(jobs[0].ddl_file, os.path.join(folder, "billing", "schema.sql"))
+            self.assertEqual(jobs[1].output_folder, "/tmp/shop")
+            self.assertEqual(jobs[1].ddl_file, os.path.join(folder, "shop.sql"))
+
+            with open(manifest_file, 'w') as output_file:
+                output_file.write('{"jobs": [{"definition_file": "shop.json"}]}')
+            with self.assertRaises(DataException):
+                load_batch_manifest(manifest_file)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,64 @@
+from typing import Any, Dict, Union, Tuple
+
+
+class Dialect(object):
+    """ Type tables of one database or language, declared as dictionaries and looked up in one step -
+    parse: native name -> (field type, size), where size is a number, None, or the name of the column attribute
+           it is taken from ("length" or "precision")
+    render: (field type, size) -> native name, size None matching any size
+    remap: field type -> field type it is stored as, when the dialect has no native equivalent
+    convert: (from field type, to field type) -> conversion function """
+    __slots__ = ("name", "_parse", "_render", "_remap", "_convert", "_sized")
+
+    def __init__(self, name: str, parse: Dict[str, Tuple[Any, Union[int, str, None]]] = None,
+                 render: Dict[Tuple[Any, Union[int, None]], str] = None, remap: Dict[Any, Any] = None,
+                 convert: Dict[Tuple[Any, Any], str] = None):
+        self.name = name
+        self._parse = {native.lower(): value for native, value in (parse or {}).items()}
+        self._render = dict(render or {})
+        self._sized = {field_type for field_type, size in self._render if size is not None}
+        self._convert = dict(convert or {})
+
+        # (must remap, stored type) for every type the dialect can render, worked out once
+        remap = remap or {}
+        self._remap = {field_type: (field_type in remap, remap.get(field_type, field_type))
+                       for field_type, size in self._render}
+
+    def parse(self, native: str) -> Union[Tuple[Any, Union[int, str, None]], None]:
+        return self._parse.get(native.lower())
+
+    def render(self, field_type, size: int = None) -> Union[str, None]:
+        result = self._render.get((field_type, size))
+        if result is None:
+            result = self._render.get((field_type, None))
+        return result
+
+    def is_sized(self, field_type) -> bool:
+        """ True when the native name depends on the size of the field """
+        return field_type in self._sized
+
+    def remap(self, field_type) -> Union[Tuple[bool, Any], None]:
+        return self._remap.get(field_type)
+
+    def convert(self, from_field_type, to_field_type) -> Union[str, None]:
+        return self._convert.get((from_field_type, to_field_type))
+
+
+class TypeRegistry(object):
+    """ Every dialect's type tables, registered next to the code that owns the dialect """
+
+    def __init__(self):
+        self.dialects: Dict[str, Dialect] = dict()
+
+    def register_dialect(self, name: str, parse: Dict[str, Tuple[Any, Union[int, str, None]]] = None,
+                         render: Dict[Tuple[Any, Union[int, None]], str] = None, remap: Dict[Any, Any] = None,
+                         convert: Dict[Tuple[Any, Any], str] = None) -> Dialect:
+        dialect = Dialect(name, parse, render, remap, convert)
+        self.dialects[name] = dialect
+        return dialect
+
+    def get_dialect(self, name: str) -> Dialect:
+        return self.dialects[name]
+
+
+type_registry = TypeRegistry()